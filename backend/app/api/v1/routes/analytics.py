@@ -1,6 +1,6 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query
 
-from app.schemas.analytics import FileAnalytics
+from app.schemas.analytics import FileAnalytics, FileDailyAnalytics
 from app.services.analytics_service import AnalyticsService
 
 router = APIRouter(prefix="/analytics")
@@ -12,3 +12,12 @@ async def file_analytics(
     service: AnalyticsService = Depends(AnalyticsService.from_depends),
 ) -> FileAnalytics:
     return await service.get_file_analytics(slug)
+
+
+@router.get("/files/{slug}/daily", response_model=FileDailyAnalytics)
+async def file_daily_analytics(
+    slug: str,
+    days: int = Query(default=30, ge=1, le=365),
+    service: AnalyticsService = Depends(AnalyticsService.from_depends),
+) -> FileDailyAnalytics:
+    return await service.get_daily_downloads(slug, days)
@@ -1,5 +1,5 @@
 from fastapi import APIRouter, Depends, Request
-from fastapi.responses import RedirectResponse
+from fastapi.responses import Response
 
 from app.middleware.rate_limit import limiter
 from app.config.settings import settings
@@ -8,13 +8,12 @@ from app.services.download_service import DownloadService
 router = APIRouter(prefix="/download")
 
 
-@router.get("/{slug}")
+@router.api_route("/{slug}", methods=["GET", "HEAD"])
 @limiter.limit(settings.rate_limit_download_per_minute)
 async def download(
     request: Request,
     slug: str,
     service: DownloadService = Depends(DownloadService.from_depends),
-) -> RedirectResponse:
+) -> Response:
     _ = request
-    url = await service.create_download_redirect(slug)
-    return RedirectResponse(url=url, status_code=302)
+    return await service.create_download_response(slug)
@@ -1,11 +1,18 @@
-from fastapi import APIRouter, Depends, Request
+from collections.abc import AsyncIterator
+
+from fastapi import APIRouter, Depends, Query, Request, Response
 from fastapi import HTTPException
 from urllib.parse import urlparse
 
 from app.middleware.rate_limit import limiter
-from app.schemas.file import FileCreateResponse
-from app.services.upload_service import UploadService
+from app.schemas.file import BatchUploadResponse, FileCreateResponse
+from app.schemas.upload_session import UploadSessionCreate, UploadSessionStatus
+from app.services.upload_admission import upload_admission
+from app.services.upload_service import UPLOAD_CHUNK_SIZE, UploadService
+from app.services.upload_session_service import UploadSessionService
 from app.config.settings import settings
+from app.utils.ip import client_ip_hash
+from app.utils.multipart import MultipartUploadReader
 from app.utils.turnstile import get_request_ip, verify_turnstile
 
 router = APIRouter(prefix="/uploads")
@@ -18,33 +25,119 @@ async def upload_file(
     request: Request,
     service: UploadService = Depends(UploadService.from_depends),
 ) -> FileCreateResponse:
-    # IMPORTANT:
-    # Starlette's multipart parser has a per-part size limit (default is small).
-    # For real uploads (~100MB), parsing can fail before we reach UploadService.
-    # Parse the form here with an explicit max_part_size.
-    try:
-        form = await request.form(max_part_size=settings.max_upload_bytes)
-    except Exception as e:
-        # Convert parser errors into a consistent client error.
-        raise HTTPException(status_code=413, detail=str(e) or "Upload too large")
-
-    upload = form.get("upload")
-    captcha_token = form.get("captcha_token")
-    if not hasattr(upload, "read"):
-        # Match FastAPI's typical validation behavior.
-        raise HTTPException(status_code=422, detail="Field 'upload' is required")
-    if captcha_token is not None and not isinstance(captcha_token, str):
-        captcha_token = str(captcha_token)
+    # Admission runs before the body is read: a full server turns the upload away (503 +
+    # Retry-After) instead of spooling it.
+    async with upload_admission.admit(client_ip_hash(request), upload_admission.reservation(request)):
+        # Single pass over the body: fields sent before the file (the frontend puts captcha_token
+        # first) are checked before any file bytes are read, and the file part is streamed into
+        # UploadService instead of being spooled by Starlette's form parser first.
+        reader = MultipartUploadReader(request, file_field="upload", max_file_bytes=settings.max_upload_bytes)
+        if not await reader.read_until_file():
+            # Match FastAPI's typical validation behavior.
+            raise HTTPException(status_code=422, detail="Field 'upload' is required")
+
+        if settings.turnstile_enabled:
+            # The token has to come before the file so bots are turned away before any bytes are stored.
+            if "captcha_token" not in reader.fields:
+                raise HTTPException(status_code=400, detail="Missing captcha_token")
+            await _verify_captcha(request, reader.fields["captcha_token"])
+
+        return await service.handle_upload_stream(reader.filename, reader.file_chunks(UPLOAD_CHUNK_SIZE))
 
+
+@router.post("/batch", response_model=BatchUploadResponse)
+@limiter.limit(settings.rate_limit_upload_3_per_hour)
+@limiter.limit(settings.rate_limit_upload_10_per_day)
+async def upload_batch(
+    request: Request,
+    service: UploadService = Depends(UploadService.from_depends),
+) -> BatchUploadResponse:
+    # Several "upload" parts in one body (e.g. a server's whole pack set): one captcha, one rate-limit
+    # hit and one admission slot sized for the batch. Results are reported per file.
+    reservation = upload_admission.reservation(request, max_files=settings.upload_batch_max_files)
+    async with upload_admission.admit(client_ip_hash(request), reservation):
+        # The whole body is held to the reservation, parts past UPLOAD_BATCH_MAX_FILES included
+        # (a chunked body has no Content-Length to size it by).
+        reader = MultipartUploadReader(
+            request,
+            file_field="upload",
+            max_file_bytes=settings.max_upload_bytes,
+            max_total_bytes=reservation,
+        )
+        has_file = await reader.read_until_file()
+        if settings.turnstile_enabled:
+            # As for single uploads, the token has to come before the first file.
+            await _verify_captcha(request, reader.fields.get("captcha_token", ""))
+        if not has_file:
+            raise HTTPException(status_code=422, detail="Field 'upload' is required")
+
+        async def files() -> AsyncIterator[tuple[str | None, AsyncIterator[bytes]]]:
+            more = True
+            while more:
+                yield reader.filename, reader.file_chunks(UPLOAD_CHUNK_SIZE)
+                more = await reader.read_until_file()
+
+        return await service.handle_batch(files())
+
+
+@router.post("/sessions", response_model=UploadSessionStatus, status_code=201)
+@limiter.limit(settings.rate_limit_upload_3_per_hour)
+@limiter.limit(settings.rate_limit_upload_10_per_day)
+async def create_upload_session(
+    request: Request,
+    body: UploadSessionCreate,
+    service: UploadSessionService = Depends(UploadSessionService.from_depends),
+) -> UploadSessionStatus:
     if settings.turnstile_enabled:
-        try:
-            ip = get_request_ip(dict(request.headers), request.client.host if request.client else None)
-            origin = request.headers.get("origin") or ""
-            origin_host = urlparse(origin).hostname if origin else None
-            await verify_turnstile(captcha_token or "", ip, origin_host)
-        except ValueError as e:
-            raise HTTPException(status_code=400, detail=str(e))
-
-    return await service.handle_upload(
-        upload=upload,
-    )
+        await _verify_captcha(request, body.captcha_token or "")
+    return await service.create(body.filename, body.size)
+
+
+@router.get("/sessions/{session_id}", response_model=UploadSessionStatus)
+async def get_upload_session(
+    session_id: str,
+    service: UploadSessionService = Depends(UploadSessionService.from_depends),
+) -> UploadSessionStatus:
+    return await service.status(session_id)
+
+
+@router.put("/sessions/{session_id}", response_model=UploadSessionStatus)
+@limiter.limit(settings.rate_limit_upload_chunk_per_minute)
+async def put_upload_chunk(
+    request: Request,
+    session_id: str,
+    offset: int = Query(ge=0),
+    service: UploadSessionService = Depends(UploadSessionService.from_depends),
+) -> UploadSessionStatus:
+    # The chunk is buffered in memory (at most one multipart part), so it goes through admission too.
+    async with upload_admission.admit(client_ip_hash(request), upload_admission.reservation(request)):
+        return await service.put_chunk(session_id, offset, request.stream())
+
+
+@router.post("/sessions/{session_id}/finalize", response_model=FileCreateResponse)
+@limiter.limit(settings.rate_limit_upload_finalize_per_hour)
+async def finalize_upload_session(
+    request: Request,
+    session_id: str,
+    service: UploadSessionService = Depends(UploadSessionService.from_depends),
+) -> FileCreateResponse:
+    return await service.finalize(session_id)
+
+
+@router.delete("/sessions/{session_id}", status_code=204)
+async def cancel_upload_session(
+    session_id: str,
+    service: UploadSessionService = Depends(UploadSessionService.from_depends),
+) -> Response:
+    await service.cancel(session_id)
+    return Response(status_code=204)
+
+
+async def _verify_captcha(request: Request, captcha_token: str) -> None:
+    try:
+        ip = get_request_ip(dict(request.headers), request.client.host if request.client else None)
+        origin = request.headers.get("origin") or ""
+        origin_host = urlparse(origin).hostname if origin else None
+        await verify_turnstile(captcha_token, ip, origin_host)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
@@ -55,15 +55,126 @@ class Settings(BaseSettings):
         v = (self.cors_origin_regex or "").strip()
         return v or None
 
+    def auto_migrate_enabled(self) -> bool:
+        if self.db_auto_migrate is not None:
+            return self.db_auto_migrate
+        return (self.backend_env or "").lower() != "prod"
+
     database_url: str = Field(default="sqlite+aiosqlite:///./app.db", alias="DATABASE_URL")
+    # Apply pending migrations at startup. Unset means on outside prod; in prod run
+    # `python -m app.db.migrate upgrade` as a deploy step and startup only checks the version.
+    db_auto_migrate: bool | None = Field(default=None, alias="DB_AUTO_MIGRATE")
+    # Connection pool for server databases (PostgreSQL). Pre-ping costs a round trip per
+    # checkout; recycling connections is usually enough to avoid stale ones.
+    db_pool_size: int = Field(default=10, alias="DB_POOL_SIZE")
+    db_max_overflow: int = Field(default=20, alias="DB_MAX_OVERFLOW")
+    db_pool_recycle_seconds: int = Field(default=1800, alias="DB_POOL_RECYCLE_SECONDS")
+    db_pool_timeout_seconds: float = Field(default=30.0, alias="DB_POOL_TIMEOUT_SECONDS")
+    db_pool_pre_ping: bool = Field(default=False, alias="DB_POOL_PRE_PING")
+    # SQLite profile, applied to every new connection.
+    sqlite_journal_mode: str = Field(default="WAL", alias="SQLITE_JOURNAL_MODE")
+    sqlite_synchronous: str = Field(default="NORMAL", alias="SQLITE_SYNCHRONOUS")
+    sqlite_busy_timeout_ms: int = Field(default=5000, alias="SQLITE_BUSY_TIMEOUT_MS")
+    sqlite_mmap_size_bytes: int = Field(default=268435456, alias="SQLITE_MMAP_SIZE_BYTES")
+    sqlite_pool_size: int = Field(default=5, alias="SQLITE_POOL_SIZE")
 
     max_upload_bytes: int = Field(default=104857600, alias="MAX_UPLOAD_BYTES")
+    # Stream uploads straight into an S3 multipart upload (requires S3_UPLOAD_MODE=multipart)
+    # instead of spooling them to .temp_uploads first. Only the zip tail is kept in memory.
+    upload_streaming_enabled: bool = Field(default=False, alias="UPLOAD_STREAMING_ENABLED")
+    upload_zip_tail_bytes: int = Field(default=8388608, alias="UPLOAD_ZIP_TAIL_BYTES")
+    # Upload admission (0 = unlimited): concurrent uploads, per client IP, and the temp-disk bytes
+    # they may hold (Content-Length, or MAX_UPLOAD_BYTES if unknown). Requests that don't fit wait
+    # up to UPLOAD_ADMISSION_WAIT_SECONDS, then get 503 with Retry-After.
+    upload_max_concurrent: int = Field(default=4, alias="UPLOAD_MAX_CONCURRENT")
+    upload_max_concurrent_per_ip: int = Field(default=2, alias="UPLOAD_MAX_CONCURRENT_PER_IP")
+    upload_temp_budget_bytes: int = Field(default=536870912, alias="UPLOAD_TEMP_BUDGET_BYTES")
+    upload_admission_wait_seconds: float = Field(default=10.0, alias="UPLOAD_ADMISSION_WAIT_SECONDS")
+    upload_retry_after_seconds: int = Field(default=30, alias="UPLOAD_RETRY_AFTER_SECONDS")
+    # Resumable upload sessions (/api/v1/uploads/sessions): abandoned after this long without a chunk.
+    upload_session_ttl_seconds: int = Field(default=86400, alias="UPLOAD_SESSION_TTL_SECONDS")
+    upload_session_max_per_ip: int = Field(default=3, alias="UPLOAD_SESSION_MAX_PER_IP")
+    # Batch uploads (/api/v1/uploads/batch): files per request, and how many are validated and
+    # written to S3 at once while the rest of the body is still being read.
+    upload_batch_max_files: int = Field(default=8, alias="UPLOAD_BATCH_MAX_FILES")
+    upload_batch_concurrency: int = Field(default=2, alias="UPLOAD_BATCH_CONCURRENCY")
+    # Read-through cache of file metadata by slug (404s are cached too, with a shorter TTL).
+    # FILE_CACHE_REDIS_URL adds a shared second tier for multi-worker deployments.
+    file_cache_enabled: bool = Field(default=True, alias="FILE_CACHE_ENABLED")
+    file_cache_max_entries: int = Field(default=10000, alias="FILE_CACHE_MAX_ENTRIES")
+    file_cache_ttl_seconds: float = Field(default=30.0, alias="FILE_CACHE_TTL_SECONDS")
+    file_cache_negative_ttl_seconds: float = Field(default=10.0, alias="FILE_CACHE_NEGATIVE_TTL_SECONDS")
+    file_cache_redis_url: str | None = Field(default=None, alias="FILE_CACHE_REDIS_URL")
+    file_cache_redis_ttl_seconds: int = Field(default=300, alias="FILE_CACHE_REDIS_TTL_SECONDS")
+
+    # Content-addressed storage: identical uploads (same SHA-1) share one S3 object with a
+    # reference count, so re-uploads skip the PUT and the object is deleted with its last file.
+    storage_dedup_enabled: bool = Field(default=True, alias="STORAGE_DEDUP_ENABLED")
+
+    # Zip validation limits (central directory scan; rejects zip bombs before anything is extracted).
+    zip_max_entries: int = Field(default=100000, alias="ZIP_MAX_ENTRIES")
+    zip_max_uncompressed_bytes: int = Field(default=1073741824, alias="ZIP_MAX_UNCOMPRESSED_BYTES")
+    zip_max_compression_ratio: int = Field(default=200, alias="ZIP_MAX_COMPRESSION_RATIO")
+
+    # Worker pool for CPU-bound upload work (SHA-1, zip inspection).
+    # Kind: "thread" (default) or "process"; 0 workers means min(4, CPU count).
+    cpu_executor_kind: str = Field(default="thread", alias="CPU_EXECUTOR_KIND")
+    cpu_executor_workers: int = Field(default=0, alias="CPU_EXECUTOR_WORKERS")
+    cpu_executor_max_concurrency: int = Field(default=0, alias="CPU_EXECUTOR_MAX_CONCURRENCY")
+
     ip_hash_secret: str = Field(default="dev-secret-change-me", alias="IP_HASH_SECRET")
+    # /metrics requires "Authorization: Bearer <METRICS_TOKEN>" when set (the bundled proxies also
+    # block it from the public host; scrape the backend container directly).
+    metrics_token: str = Field(default="", alias="METRICS_TOKEN")
 
     file_expire_days: int = Field(default=3, alias="FILE_EXPIRE_DAYS")
+    # Sliding expiration moves expire_at in steps of this size, so a file is rewritten at most once
+    # per step however often it is downloaded. 0 = exact (every download rewrites expire_at).
+    file_expire_granularity_seconds: int = Field(default=3600, alias="FILE_EXPIRE_GRANULARITY_SECONDS")
     download_log_retention_days: int = Field(default=90, alias="DOWNLOAD_LOG_RETENTION_DAYS")
+    # Per-day download rollups (analytics history) outlive the raw log.
+    download_rollup_retention_days: int = Field(default=400, alias="DOWNLOAD_ROLLUP_RETENTION_DAYS")
+    # Old download rows are deleted in primary-key chunks, one commit each, pausing between chunks
+    # so writers (SQLite lock, Postgres WAL) are not starved.
+    download_prune_chunk_rows: int = Field(default=10000, alias="DOWNLOAD_PRUNE_CHUNK_ROWS")
+    download_prune_pause_seconds: float = Field(default=0.1, alias="DOWNLOAD_PRUNE_PAUSE_SECONDS")
+    # "daily" (PostgreSQL only): create `downloads` partitioned by day so retention drops whole
+    # partitions. Only applies when the table is first created.
+    download_partitioning: str = Field(default="none", alias="DOWNLOAD_PARTITIONING")
+    download_partition_precreate_days: int = Field(default=3, alias="DOWNLOAD_PARTITION_PRECREATE_DAYS")
+
+    # Write-behind download accounting: buffer counter updates and download log rows in memory
+    # and flush them in batches instead of committing on every /download/{slug}.
+    download_write_behind_enabled: bool = Field(default=False, alias="DOWNLOAD_WRITE_BEHIND_ENABLED")
+    download_flush_interval_seconds: float = Field(default=2.0, alias="DOWNLOAD_FLUSH_INTERVAL_SECONDS")
+    download_flush_max_events: int = Field(default=500, alias="DOWNLOAD_FLUSH_MAX_EVENTS")
+    download_buffer_max_events: int = Field(default=50000, alias="DOWNLOAD_BUFFER_MAX_EVENTS")
+    # Unique-downloader sketches are updated in memory and merged into the DB on this interval
+    # (sooner once this many file/day sketches are pending), on both download paths.
+    download_sketch_flush_seconds: float = Field(default=30.0, alias="DOWNLOAD_SKETCH_FLUSH_SECONDS")
+    download_sketch_buffer_max_keys: int = Field(default=2000, alias="DOWNLOAD_SKETCH_BUFFER_MAX_KEYS")
+    # "redirect": 302 to a presigned S3 URL. "proxy": stream the object through the backend with
+    # ETag (SHA-1), conditional GET, Range and Cache-Control, so clients and CDNs can cache the
+    # stable /download/{slug} URL. Keep max-age below FILE_EXPIRE_DAYS: revalidations count as
+    # downloads and keep the file alive.
+    download_mode: str = Field(default="redirect", alias="DOWNLOAD_MODE")
+    download_cache_control: str = Field(default="public, max-age=86400", alias="DOWNLOAD_CACHE_CONTROL")
+    download_proxy_chunk_bytes: int = Field(default=262144, alias="DOWNLOAD_PROXY_CHUNK_BYTES")
+    # Proxy mode only: keep the hottest objects on local disk (keyed by SHA-1) so repeat downloads
+    # don't pay S3 egress. Eviction uses hit counts that halve every HALF_LIFE seconds of disuse.
+    download_disk_cache_enabled: bool = Field(default=False, alias="DOWNLOAD_DISK_CACHE_ENABLED")
+    download_disk_cache_dir: str | None = Field(default=None, alias="DOWNLOAD_DISK_CACHE_DIR")
+    download_disk_cache_max_bytes: int = Field(default=2147483648, alias="DOWNLOAD_DISK_CACHE_MAX_BYTES")
+    download_disk_cache_half_life_seconds: float = Field(default=86400.0, alias="DOWNLOAD_DISK_CACHE_HALF_LIFE_SECONDS")
 
     enable_scheduler: bool = Field(default=False, alias="ENABLE_SCHEDULER")
+    # Expired-file cleanup: rows are paged CLEANUP_BATCH_SIZE at a time (one commit per batch);
+    # their objects go out after the commit in 1000-key DeleteObjects calls, CLEANUP_DELETE_CONCURRENCY
+    # at once across batches (the next batches' rows are deleted meanwhile). Keys still failing after
+    # CLEANUP_DELETE_MAX_ATTEMPTS are retried by the next run.
+    cleanup_batch_size: int = Field(default=1000, alias="CLEANUP_BATCH_SIZE")
+    cleanup_delete_concurrency: int = Field(default=4, alias="CLEANUP_DELETE_CONCURRENCY")
+    cleanup_delete_max_attempts: int = Field(default=3, alias="CLEANUP_DELETE_MAX_ATTEMPTS")
 
     # S3
     s3_endpoint_url: AnyUrl | None = Field(default=None, alias="S3_ENDPOINT_URL")
@@ -78,18 +189,53 @@ class Settings(BaseSettings):
     s3_access_key_id: str = Field(default="minio", alias="S3_ACCESS_KEY_ID")
     s3_secret_access_key: str = Field(default="minio123456", alias="S3_SECRET_ACCESS_KEY")
     s3_presign_ttl_seconds: int = Field(default=600, alias="S3_PRESIGN_TTL_SECONDS")
+    # Presigned URLs are reused per S3 key until fewer than MARGIN seconds of validity remain.
+    # Set S3_PRESIGN_CACHE_MAX_ENTRIES=0 to sign on every request.
+    s3_presign_cache_margin_seconds: int = Field(default=300, alias="S3_PRESIGN_CACHE_MARGIN_SECONDS")
+    s3_presign_cache_max_entries: int = Field(default=1024, alias="S3_PRESIGN_CACHE_MAX_ENTRIES")
+    # Upload mode: "put" (single PutObject, default) or "multipart" (concurrent parts with per-part retry).
+    # Keep "put" for S3-compatible providers whose multipart support is broken.
+    s3_upload_mode: str = Field(default="put", alias="S3_UPLOAD_MODE")
+    s3_multipart_part_size_bytes: int = Field(default=8388608, alias="S3_MULTIPART_PART_SIZE_BYTES")
+    s3_multipart_concurrency: int = Field(default=4, alias="S3_MULTIPART_CONCURRENCY")
+    s3_multipart_max_attempts: int = Field(default=3, alias="S3_MULTIPART_MAX_ATTEMPTS")
+    # Upper bound on pooled HTTP connections held by the shared S3 client.
+    s3_max_pool_connections: int = Field(default=20, alias="S3_MAX_POOL_CONNECTIONS")
 
     # Rate limits (SlowAPI format)
     rate_limit_upload_3_per_hour: str = Field(default="3/hour", alias="RATE_LIMIT_UPLOAD_3_PER_HOUR")
     rate_limit_upload_10_per_day: str = Field(default="10/day", alias="RATE_LIMIT_UPLOAD_10_PER_DAY")
     rate_limit_download_per_minute: str = Field(default="30/minute", alias="RATE_LIMIT_DOWNLOAD_PER_MINUTE")
+    # Resumable uploads: chunk PUTs (one S3 UploadPart each) and finalize calls (CompleteMultipartUpload,
+    # maybe a full re-hash from S3) per IP. A 100MB upload is about 13 chunks of 8MB.
+    rate_limit_upload_chunk_per_minute: str = Field(default="60/minute", alias="RATE_LIMIT_UPLOAD_CHUNK_PER_MINUTE")
+    rate_limit_upload_finalize_per_hour: str = Field(default="10/hour", alias="RATE_LIMIT_UPLOAD_FINALIZE_PER_HOUR")
+    # Shared counters for all workers/containers; unset keeps per-process memory counters.
     rate_limit_redis_url: str | None = Field(default=None, alias="RATE_LIMIT_REDIS_URL")
+    # Share of a limit a worker may reserve in one round trip while the client is well under it.
+    # 0 = every request goes to the shared counter.
+    rate_limit_lease_fraction: float = Field(default=0.1, alias="RATE_LIMIT_LEASE_FRACTION")
+    # Processes sharing the counters (workers x containers). Limits smaller than 2 x workers x lease
+    # are not leased, which bounds how early a client can be refused (see LeasedFixedWindowRateLimiter).
+    rate_limit_workers: int = Field(default=1, alias="RATE_LIMIT_WORKERS")
 
     # Cloudflare Turnstile
     turnstile_enabled: bool = Field(default=False, alias="TURNSTILE_ENABLED")
     turnstile_secret_key: str | None = Field(default=None, alias="TURNSTILE_SECRET_KEY")
     # If set, Turnstile verify must return this hostname (e.g. minecrox.ktoxz.id.vn)
     turnstile_expected_hostname: str | None = Field(default=None, alias="TURNSTILE_EXPECTED_HOSTNAME")
+    turnstile_timeout_seconds: float = Field(default=5.0, alias="TURNSTILE_TIMEOUT_SECONDS")
+    # A rejected (token, ip) is not re-sent to siteverify within this window. Successes are never
+    # reused: tokens are single-use.
+    turnstile_cache_ttl_seconds: float = Field(default=30.0, alias="TURNSTILE_CACHE_TTL_SECONDS")
+    # Circuit breaker: after N consecutive siteverify errors/timeouts, skip it for RESET seconds.
+    # FAIL_OPEN decides whether requests pass (true) or get a 400 (false) while it is unavailable.
+    turnstile_breaker_threshold: int = Field(default=5, alias="TURNSTILE_BREAKER_THRESHOLD")
+    turnstile_breaker_reset_seconds: float = Field(default=30.0, alias="TURNSTILE_BREAKER_RESET_SECONDS")
+    turnstile_fail_open: bool = Field(default=False, alias="TURNSTILE_FAIL_OPEN")
+    # Load testing only: answer siteverify locally (tokens starting with "fail" are rejected).
+    turnstile_stub_enabled: bool = Field(default=False, alias="TURNSTILE_STUB_ENABLED")
+    turnstile_stub_latency_ms: int = Field(default=0, alias="TURNSTILE_STUB_LATENCY_MS")
 
 
 settings = Settings()  # type: ignore[call-arg]
@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+from typing import Any
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from app.config.settings import settings
+
+
+def create_engine(database_url: str) -> AsyncEngine:
+    """Build the async engine with per-backend tuning.
+
+    SQLite: WAL journal (readers don't block the writer), synchronous=NORMAL
+    (durable at checkpoints; safe with WAL), a busy timeout instead of an
+    immediate "database is locked", and memory-mapped reads. File databases
+    keep a small connection pool so pragmas run once per connection, not per
+    session. Other backends get a sized, recycled pool; pre-ping is opt-in
+    because it costs a round trip per checkout.
+    """
+
+    url = make_url(database_url)
+    if url.get_backend_name() == "sqlite":
+        return _create_sqlite_engine(database_url, in_memory=url.database in (None, "", ":memory:"))
+
+    return create_async_engine(
+        database_url,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_recycle=settings.db_pool_recycle_seconds,
+        pool_timeout=settings.db_pool_timeout_seconds,
+        pool_pre_ping=settings.db_pool_pre_ping,
+    )
+
+
+def _create_sqlite_engine(database_url: str, in_memory: bool) -> AsyncEngine:
+    kwargs: dict[str, Any] = {
+        # Python-level lock wait; busy_timeout below covers the SQLite side.
+        "connect_args": {"timeout": settings.sqlite_busy_timeout_ms / 1000},
+    }
+    if not in_memory:
+        kwargs.update(
+            poolclass=AsyncAdaptedQueuePool,
+            pool_size=settings.sqlite_pool_size,
+            max_overflow=0,
+            pool_timeout=settings.db_pool_timeout_seconds,
+        )
+    engine = create_async_engine(database_url, **kwargs)
+    pragmas = sqlite_pragmas(in_memory)
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def _set_pragmas(dbapi_connection, _record) -> None:  # noqa: ANN001
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+
+    return engine
+
+
+def sqlite_pragmas(in_memory: bool = False) -> list[str]:
+    pragmas = [
+        f"PRAGMA busy_timeout={int(settings.sqlite_busy_timeout_ms)}",
+        f"PRAGMA synchronous={settings.sqlite_synchronous}",
+    ]
+    if not in_memory:
+        # WAL and mmap only apply to file databases.
+        pragmas.insert(0, f"PRAGMA journal_mode={settings.sqlite_journal_mode}")
+        pragmas.append(f"PRAGMA mmap_size={int(settings.sqlite_mmap_size_bytes)}")
+    return pragmas
@@ -0,0 +1,150 @@
+"""Schema migrations (Alembic).
+
+    python -m app.db.migrate upgrade [REVISION]    # default: head
+    python -m app.db.migrate downgrade REVISION
+    python -m app.db.migrate current
+    python -m app.db.migrate history
+    python -m app.db.migrate revision -m "add foo" [--autogenerate]
+    python -m app.db.migrate backfill-rollups [--before YYYY-MM-DD]
+
+Run `upgrade` once per deploy, before starting the workers; startup only
+checks that the database is at the latest revision (see ensure_schema).
+`backfill-rollups` is a one-shot data step that seeds the daily download
+rollups from the raw log for days before rollups were recorded.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import os
+from collections.abc import Callable
+from datetime import date
+from typing import Any
+
+from alembic import command
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from sqlalchemy import inspect
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.config.settings import settings
+from app.db import partitions
+
+logger = logging.getLogger(__name__)
+
+BASELINE_REVISION = "0001"
+_SCRIPT_LOCATION = os.path.join(os.path.dirname(__file__), "migrations")
+
+
+def alembic_config(connection: Connection | None = None) -> Config:
+    cfg = Config()
+    cfg.set_main_option("script_location", _SCRIPT_LOCATION)
+    cfg.attributes["connection"] = connection
+    return cfg
+
+
+def head_revisions() -> set[str]:
+    return set(ScriptDirectory.from_config(alembic_config()).get_heads())
+
+
+def current_revisions(connection: Connection) -> set[str]:
+    return set(MigrationContext.configure(connection).get_current_heads())
+
+
+def upgrade_sync(connection: Connection, revision: str = "head") -> None:
+    cfg = alembic_config(connection)
+    if not current_revisions(connection) and inspect(connection).has_table("files"):
+        # Database created by the old create_all startup: adopt it at the baseline.
+        logger.info("migrate: stamping unversioned database at %s", BASELINE_REVISION)
+        command.stamp(cfg, BASELINE_REVISION)
+    command.upgrade(cfg, revision)
+    partitions.ensure_upcoming_partitions(connection)
+
+
+async def ensure_schema(engine: AsyncEngine) -> None:
+    """Startup check: one query against alembic_version.
+
+    Upgrades in place when DB_AUTO_MIGRATE is on (the default outside prod);
+    otherwise refuses to start on an outdated schema.
+    """
+
+    heads = head_revisions()
+    async with engine.connect() as conn:
+        current = await conn.run_sync(current_revisions)
+    if current == heads:
+        return
+    if not settings.auto_migrate_enabled():
+        raise RuntimeError(
+            f"Database schema is at {sorted(current) or 'no revision'}, expected {sorted(heads)}; "
+            "run `python -m app.db.migrate upgrade`"
+        )
+    async with engine.begin() as conn:
+        await conn.run_sync(upgrade_sync)
+
+
+async def _run(fn: Callable[[Connection], Any]) -> None:
+    from app.db.engine import create_engine
+
+    engine = create_engine(settings.database_url)
+    try:
+        async with engine.begin() as conn:
+            await conn.run_sync(fn)
+    finally:
+        await engine.dispose()
+
+
+async def _backfill_rollups(before: date | None) -> None:
+    from sqlalchemy.ext.asyncio import AsyncSession
+
+    from app.db.engine import create_engine
+    from app.services.maintenance_service import MaintenanceService
+    from app.storage.s3_storage import S3Storage
+
+    engine = create_engine(settings.database_url)
+    try:
+        async with AsyncSession(engine, expire_on_commit=False) as session:
+            created = await MaintenanceService(session=session, storage=S3Storage()).backfill_download_rollups(before)
+        logger.info("backfill: %s daily rows created", created)
+    finally:
+        await engine.dispose()
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.db.migrate")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    up = sub.add_parser("upgrade")
+    up.add_argument("revision", nargs="?", default="head")
+    down = sub.add_parser("downgrade")
+    down.add_argument("revision")
+    sub.add_parser("current")
+    sub.add_parser("history")
+    rev = sub.add_parser("revision")
+    rev.add_argument("-m", "--message", required=True)
+    rev.add_argument("--autogenerate", action="store_true")
+    backfill = sub.add_parser("backfill-rollups")
+    backfill.add_argument("--before", type=date.fromisoformat, default=None)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    if args.cmd == "upgrade":
+        asyncio.run(_run(lambda c: upgrade_sync(c, args.revision)))
+    elif args.cmd == "downgrade":
+        asyncio.run(_run(lambda c: command.downgrade(alembic_config(c), args.revision)))
+    elif args.cmd == "current":
+        asyncio.run(_run(lambda c: command.current(alembic_config(c), verbose=True)))
+    elif args.cmd == "history":
+        command.history(alembic_config(), verbose=True)
+    elif args.cmd == "revision":
+        asyncio.run(
+            _run(lambda c: command.revision(alembic_config(c), message=args.message, autogenerate=args.autogenerate))
+        )
+    elif args.cmd == "backfill-rollups":
+        asyncio.run(_backfill_rollups(args.before))
+
+
+if __name__ == "__main__":
+    main()
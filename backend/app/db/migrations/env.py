@@ -0,0 +1,33 @@
+from __future__ import annotations
+
+from alembic import context
+
+from app.db.base import Base
+from app.models import (  # noqa: F401
+    blob,
+    download,
+    download_daily,
+    download_sketch,
+    file,
+    pending_object_delete,
+    report,
+    upload_session,
+)
+
+config = context.config
+target_metadata = Base.metadata
+
+# Migrations always run on a connection handed over by app.db.migrate, which
+# owns the (async) engine; see migrate.py for the CLI.
+connection = config.attributes.get("connection")
+if connection is None:
+    raise RuntimeError("Run migrations through `python -m app.db.migrate`")
+
+context.configure(
+    connection=connection,
+    target_metadata=target_metadata,
+    # SQLite can't ALTER most things in place; batch mode recreates the table.
+    render_as_batch=connection.dialect.name == "sqlite",
+)
+with context.begin_transaction():
+    context.run_migrations()
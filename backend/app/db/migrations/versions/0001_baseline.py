@@ -0,0 +1,75 @@
+"""Baseline schema: files, downloads, reports.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+"""
+
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+from app.db import partitions
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "files",
+        sa.Column("id", sa.String(36), primary_key=True),
+        sa.Column("filename", sa.String(255), nullable=False),
+        sa.Column("slug", sa.String(255), nullable=False),
+        sa.Column("file_type", sa.String(32), nullable=False),
+        sa.Column("minecraft_version", sa.String(64), nullable=True),
+        sa.Column("loader", sa.String(64), nullable=True),
+        sa.Column("description", sa.Text(), nullable=True),
+        sa.Column("tags", sa.Text(), nullable=True),
+        sa.Column("file_size", sa.Integer(), nullable=False),
+        sa.Column("s3_key", sa.String(1024), nullable=False),
+        sa.Column("sha1_hash", sa.String(40), nullable=False),
+        sa.Column("download_count", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("last_download", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("expire_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("uploader_ip_hash", sa.String(64), nullable=False),
+        sa.Column("delete_token_hash", sa.String(64), nullable=False),
+    )
+    op.create_index("ix_files_slug", "files", ["slug"], unique=True)
+    op.create_index("ix_files_uploader_ip_hash", "files", ["uploader_ip_hash"])
+
+    bind = op.get_bind()
+    if partitions.partitioning_enabled(bind.dialect.name):
+        partitions.create_partitioned_table(bind)
+    else:
+        op.create_table(
+            "downloads",
+            sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+            sa.Column("file_id", sa.String(36), sa.ForeignKey("files.id", ondelete="CASCADE"), nullable=False),
+            sa.Column("ip_hash", sa.String(64), nullable=False),
+            sa.Column("timestamp", sa.DateTime(timezone=True), nullable=False),
+        )
+    op.create_index("ix_downloads_file_id", "downloads", ["file_id"])
+    op.create_index("ix_downloads_ip_hash", "downloads", ["ip_hash"])
+
+    op.create_table(
+        "reports",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column("slug", sa.String(255), nullable=False),
+        sa.Column("reason", sa.Text(), nullable=False),
+        sa.Column("email", sa.String(320), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("ip_hash", sa.String(64), nullable=False),
+    )
+    op.create_index("ix_reports_slug", "reports", ["slug"])
+    op.create_index("ix_reports_ip_hash", "reports", ["ip_hash"])
+
+
+def downgrade() -> None:
+    op.drop_table("reports")
+    op.drop_table("downloads")
+    op.drop_table("files")
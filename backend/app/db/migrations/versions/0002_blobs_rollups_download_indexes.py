@@ -0,0 +1,71 @@
+"""Blobs, daily download rollups and sketches, download time indexes.
+
+Databases that ran the create_all-based startup may already have some of
+these objects, so each one is only created when missing.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    tables = set(inspector.get_table_names())
+
+    if "blobs" not in tables:
+        op.create_table(
+            "blobs",
+            sa.Column("sha1_hash", sa.String(40), primary_key=True),
+            sa.Column("s3_key", sa.String(1024), nullable=False),
+            sa.Column("file_size", sa.Integer(), nullable=False),
+            sa.Column("ref_count", sa.Integer(), nullable=False),
+            sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        )
+
+    if "download_daily" not in tables:
+        op.create_table(
+            "download_daily",
+            sa.Column("file_id", sa.String(36), sa.ForeignKey("files.id", ondelete="CASCADE"), primary_key=True),
+            sa.Column("day", sa.Date(), primary_key=True),
+            sa.Column("count", sa.Integer(), nullable=False),
+            sa.Column("unique_ip_hashes", sa.Integer(), nullable=False),
+        )
+        op.create_index("ix_download_daily_day", "download_daily", ["day"])
+
+    if "download_sketches" not in tables:
+        op.create_table(
+            "download_sketches",
+            sa.Column("file_id", sa.String(36), sa.ForeignKey("files.id", ondelete="CASCADE"), primary_key=True),
+            sa.Column("day", sa.Date(), primary_key=True),
+            sa.Column("sketch", sa.LargeBinary(), nullable=False),
+        )
+        op.create_index("ix_download_sketches_day", "download_sketches", ["day"])
+
+    indexes = {ix["name"] for ix in inspector.get_indexes("downloads")}
+    if "ix_downloads_file_id_timestamp" not in indexes:
+        op.create_index("ix_downloads_file_id_timestamp", "downloads", ["file_id", "timestamp"])
+    if "ix_downloads_timestamp" not in indexes:
+        op.create_index("ix_downloads_timestamp", "downloads", ["timestamp"])
+    # Covered by the composite index's leading column.
+    if "ix_downloads_file_id" in indexes:
+        op.drop_index("ix_downloads_file_id", table_name="downloads")
+
+
+def downgrade() -> None:
+    op.create_index("ix_downloads_file_id", "downloads", ["file_id"])
+    op.drop_index("ix_downloads_timestamp", table_name="downloads")
+    op.drop_index("ix_downloads_file_id_timestamp", table_name="downloads")
+    op.drop_table("download_sketches")
+    op.drop_table("download_daily")
+    op.drop_table("blobs")
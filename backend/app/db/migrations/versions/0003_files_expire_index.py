@@ -0,0 +1,23 @@
+"""Index files by (expire_at, id) for the expiry cleanup.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+"""
+
+from __future__ import annotations
+
+from alembic import op
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_files_expire_at_id", "files", ["expire_at", "id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_files_expire_at_id", table_name="files")
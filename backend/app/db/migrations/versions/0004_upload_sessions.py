@@ -0,0 +1,40 @@
+"""Resumable upload sessions.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+"""
+
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "upload_sessions",
+        sa.Column("id", sa.String(36), primary_key=True),
+        sa.Column("file_id", sa.String(36), nullable=False),
+        sa.Column("filename", sa.String(255), nullable=False),
+        sa.Column("s3_key", sa.String(1024), nullable=False),
+        sa.Column("upload_id", sa.String(1024), nullable=False),
+        sa.Column("total_size", sa.Integer(), nullable=False),
+        sa.Column("chunk_size", sa.Integer(), nullable=False),
+        sa.Column("received_bytes", sa.Integer(), nullable=False),
+        sa.Column("part_etags", sa.Text(), nullable=False),
+        sa.Column("uploader_ip_hash", sa.String(64), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("expire_at", sa.DateTime(timezone=True), nullable=False),
+    )
+    op.create_index("ix_upload_sessions_uploader_ip_hash", "upload_sessions", ["uploader_ip_hash"])
+    op.create_index("ix_upload_sessions_expire_at", "upload_sessions", ["expire_at"])
+
+
+def downgrade() -> None:
+    op.drop_table("upload_sessions")
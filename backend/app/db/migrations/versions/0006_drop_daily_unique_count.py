@@ -0,0 +1,26 @@
+"""Drop download_daily.unique_ip_hashes (per-day uniques come from the sketches).
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18
+"""
+
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("download_daily") as batch:
+        batch.drop_column("unique_ip_hashes")
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("download_daily") as batch:
+        batch.add_column(sa.Column("unique_ip_hashes", sa.Integer(), nullable=False, server_default="0"))
@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import logging
+from datetime import UTC, date, datetime, timedelta
+
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.engine import Connection
+
+from app.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Day-partitioned download log (DOWNLOAD_PARTITIONING=daily, PostgreSQL only): retention drops
+# whole days instead of deleting rows. Other databases keep the plain table and chunked pruning.
+_PARENT = "downloads"
+_PARTITION_PREFIX = "downloads_p"
+_DEFAULT_PARTITION = "downloads_default"
+
+
+def partitioning_enabled(dialect_name: str) -> bool:
+    return settings.download_partitioning == "daily" and dialect_name == "postgresql"
+
+
+def partition_name(day: date) -> str:
+    return f"{_PARTITION_PREFIX}{day:%Y%m%d}"
+
+
+def partition_day(name: str) -> date | None:
+    if not name.startswith(_PARTITION_PREFIX):
+        return None
+    try:
+        return datetime.strptime(name[len(_PARTITION_PREFIX) :], "%Y%m%d").date()
+    except ValueError:
+        return None
+
+
+def create_partitioned_table(conn: Connection) -> None:
+    """Create `downloads` as a range-partitioned table if it doesn't exist yet.
+
+    Used by the baseline migration in place of the plain table. The primary
+    key has to include the partition column; the ORM keeps mapping `id`
+    alone, which stays unique through its sequence. An existing unpartitioned
+    table is left alone (converting it is a manual migration).
+    """
+
+    conn.execute(
+        text(
+            f"""
+            CREATE TABLE IF NOT EXISTS {_PARENT} (
+                id BIGSERIAL NOT NULL,
+                file_id VARCHAR(36) NOT NULL REFERENCES files (id) ON DELETE CASCADE,
+                ip_hash VARCHAR(64) NOT NULL,
+                timestamp TIMESTAMP WITH TIME ZONE NOT NULL,
+                PRIMARY KEY (id, timestamp)
+            ) PARTITION BY RANGE (timestamp)
+            """
+        )
+    )
+    if not is_partitioned(conn):
+        logger.warning("DOWNLOAD_PARTITIONING=daily but %s is not partitioned; using row pruning", _PARENT)
+        return
+    # Catches rows outside the pre-created days (e.g. clock skew) instead of failing the insert.
+    conn.execute(text(f"CREATE TABLE IF NOT EXISTS {_DEFAULT_PARTITION} PARTITION OF {_PARENT} DEFAULT"))
+    ensure_partitions(conn)
+
+
+def is_partitioned(conn: Connection) -> bool:
+    result = conn.execute(
+        text(
+            "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+            "WHERE c.relname = :name"
+        ),
+        {"name": _PARENT},
+    )
+    return result.first() is not None
+
+
+def ensure_partitions(conn: Connection, today: date | None = None) -> None:
+    """Create partitions for today and the next DOWNLOAD_PARTITION_PRECREATE_DAYS days."""
+
+    today = today or datetime.now(UTC).date()
+    for offset in range(max(0, settings.download_partition_precreate_days) + 1):
+        day = today + timedelta(days=offset)
+        start = datetime(day.year, day.month, day.day, tzinfo=UTC)
+        # A day whose rows already went to the default partition can't get its own partition
+        # any more; its rows stay there and are removed by the chunked row prune instead.
+        try:
+            with conn.begin_nested():
+                conn.execute(
+                    text(
+                        f"CREATE TABLE IF NOT EXISTS {partition_name(day)} PARTITION OF {_PARENT} "
+                        f"FOR VALUES FROM ('{start.isoformat()}') TO ('{(start + timedelta(days=1)).isoformat()}')"
+                    )
+                )
+        except DBAPIError:
+            logger.warning(
+                "cannot create %s: %s already holds rows for that day", partition_name(day), _DEFAULT_PARTITION
+            )
+
+
+def ensure_upcoming_partitions(conn: Connection) -> None:
+    """Run at startup and after migrations, so partitions exist even without the scheduler."""
+
+    if partitioning_enabled(conn.dialect.name) and is_partitioned(conn):
+        ensure_partitions(conn)
+
+
+def drop_partitions_before(conn: Connection, cutoff: datetime) -> int:
+    """Drop day partitions that end at or before `cutoff`; returns how many were dropped."""
+
+    result = conn.execute(
+        text(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = :name"
+        ),
+        {"name": _PARENT},
+    )
+    dropped = 0
+    for (name,) in result.all():
+        day = partition_day(name)
+        if day is None or day + timedelta(days=1) > cutoff.date():
+            continue
+        conn.execute(text(f"DROP TABLE IF EXISTS {name}"))
+        dropped += 1
+    return dropped
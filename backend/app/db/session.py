@@ -1,18 +1,22 @@
 from __future__ import annotations
 
-from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+import logging
+
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
 
 from app.config.settings import settings
-from app.db.base import Base
+from app.db.engine import create_engine
 
 engine: AsyncEngine | None = None
 SessionLocal: async_sessionmaker[AsyncSession] | None = None
 
+logger = logging.getLogger(__name__)
+
 
 def init_engine() -> None:
     global engine, SessionLocal
     if engine is None:
-        engine = create_async_engine(settings.database_url, pool_pre_ping=True)
+        engine = create_engine(settings.database_url)
         SessionLocal = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
 
 
@@ -21,15 +25,26 @@ async def reset_engine(database_url: str) -> None:
     if engine is not None:
         await engine.dispose()
     settings.database_url = database_url
-    engine = create_async_engine(settings.database_url, pool_pre_ping=True)
+    engine = create_engine(settings.database_url)
     SessionLocal = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
 
 
 async def init_db() -> None:
     init_engine()
-    # Ensure models are imported before create_all.
-    from app.models import download, file, report  # noqa: F401
+    from app.db import migrate
 
     assert engine is not None
+    # The schema is owned by the migrations in app/db/migrations.
+    await migrate.ensure_schema(engine)
+
+    from app.db import partitions
+
     async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+        if partitions.partitioning_enabled(conn.dialect.name):
+            # The hourly prune job keeps creating days ahead; without it, only startups do.
+            if not settings.enable_scheduler:
+                logger.warning(
+                    "DOWNLOAD_PARTITIONING=daily without ENABLE_SCHEDULER: partitions are only created at "
+                    "startup, up to DOWNLOAD_PARTITION_PRECREATE_DAYS ahead"
+                )
+            await conn.run_sync(partitions.ensure_upcoming_partitions)
@@ -6,9 +6,16 @@ from app.api.router import api_router
 from app.api.public import router as public_router
 from app.config.settings import settings
 from app.db.session import init_db
+from app.middleware.metrics import init_metrics
 from app.middleware.rate_limit import init_rate_limiter
+from app.repositories.file_cache import file_cache
+from app.services.download_recorder import download_recorder
+from app.services.sketch_buffer import sketch_buffer
+from app.storage.s3_client import s3_clients
 from app.storage.s3_storage import S3Storage
+from app.utils.executor import cpu_executor
 from app.utils.scheduler import start_scheduler
+from app.utils.turnstile import turnstile_verifier
 
 
 def create_app() -> FastAPI:
@@ -39,6 +46,7 @@ def create_app() -> FastAPI:
         return {"status": "ok"}
 
     init_rate_limiter(app)
+    init_metrics(app)
 
     # Add CORS last so it wraps responses from all other middleware.
     cors_origin_regex = settings.cors_origin_regex_value()
@@ -57,8 +65,13 @@ def create_app() -> FastAPI:
     @app.on_event("startup")
     async def _startup() -> None:
         await init_db()
+        cpu_executor.start()
+        if download_recorder.enabled:
+            download_recorder.start()
+        sketch_buffer.start()
         if settings.s3_endpoint_url is not None:
             try:
+                await s3_clients.start()
                 await S3Storage().ensure_bucket()
             except Exception:
                 # Non-fatal: production buckets usually exist already.
@@ -66,6 +79,15 @@ def create_app() -> FastAPI:
 
             start_scheduler()
 
+    @app.on_event("shutdown")
+    async def _shutdown() -> None:
+        await download_recorder.stop()
+        await sketch_buffer.stop()
+        await cpu_executor.close()
+        await file_cache.close()
+        await turnstile_verifier.close()
+        await s3_clients.close()
+
     return app
 
 
@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+import hmac
+import time
+
+from fastapi import FastAPI, HTTPException, Request, Response
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config.settings import settings
+from app.utils.metrics import HTTP_REQUEST_SECONDS
+
+
+class MetricsMiddleware:
+    """Records per-route latency histograms.
+
+    Labels use the route template (e.g. /download/{slug}), never the raw path,
+    so label cardinality stays bounded; unmatched paths share one label.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = 500
+
+        async def _send(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, _send)
+        finally:
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or "unmatched"
+            HTTP_REQUEST_SECONDS.labels(scope["method"], route_path, str(status)).observe(
+                time.perf_counter() - start
+            )
+
+
+def init_metrics(app: FastAPI) -> None:
+    @app.get("/metrics", include_in_schema=False)
+    async def _metrics(request: Request) -> Response:
+        # Pool, cache, admission and temp-disk stats are internal.
+        if settings.metrics_token:
+            supplied = request.headers.get("authorization", "")
+            if not hmac.compare_digest(supplied.encode(), f"Bearer {settings.metrics_token}".encode()):
+                raise HTTPException(status_code=401, detail="Unauthorized", headers={"WWW-Authenticate": "Bearer"})
+        return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+    app.add_middleware(MetricsMiddleware)
@@ -1,20 +1,139 @@
 from __future__ import annotations
 
+import threading
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+
 from fastapi import FastAPI
-from slowapi import Limiter
+from limits import RateLimitItem
+from limits.storage import RedisStorage, Storage
+from limits.strategies import FixedWindowRateLimiter
+from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
 from slowapi.middleware import SlowAPIMiddleware
-from slowapi.util import get_remote_address
 
+from app.config.settings import settings
+from app.utils.ip import client_ip_hash
+from app.utils.metrics import RATE_LIMIT_CHECKS
 
-limiter = Limiter(key_func=get_remote_address)
+# Sweep expired leases once the table grows past this many keys.
+_MAX_LEASES = 10000
 
 
-def init_rate_limiter(app: FastAPI) -> None:
-    app.state.limiter = limiter
+@dataclass(slots=True)
+class _Lease:
+    next: int  # shared-counter position the next local hit takes
+    last: int  # last position reserved by this process
+    window_end: float
+
+
+class LeasedFixedWindowRateLimiter(FixedWindowRateLimiter):
+    """Fixed-window limiter that reserves tokens from the shared counter in small leases.
+
+    While a key is clearly under its limit (at most half used, as far as this
+    process last saw), a hit reserves up to RATE_LIMIT_LEASE_FRACTION of the
+    limit with one INCRBY and the following hits in the same window are served
+    from the lease without a round trip. Near the limit each hit goes to the
+    shared counter.
+
+    Reserved tokens count against every worker, so the limit is not exceeded;
+    the trade-off is the other way round. Tokens left unused in one worker's
+    lease still count when the client's next requests land on other workers,
+    so a client can be refused up to RATE_LIMIT_WORKERS x (lease - 1) hits
+    early in a window. Limits below 2 x RATE_LIMIT_WORKERS x lease (the upload
+    limits, for instance) are therefore never leased and are counted exactly.
+    """
+
+    def __init__(self, storage: Storage, clock: Callable[[], float] = time.time) -> None:
+        super().__init__(storage)
+        self._clock = clock
+        self._leases: dict[str, _Lease] = {}
+        self._lock = threading.Lock()
+
+    def hit(self, item: RateLimitItem, *identifiers: str, cost: int = 1) -> bool:
+        key = item.key_for(*identifiers)
+        now = self._clock()
+        with self._lock:
+            lease = self._leases.get(key)
+            if lease is not None and now >= lease.window_end:
+                lease = None
+            if lease is not None and lease.next + cost - 1 <= lease.last:
+                position = lease.next + cost - 1
+                lease.next += cost
+                RATE_LIMIT_CHECKS.labels("local").inc()
+                return position <= item.amount
+        known = lease.last if lease is not None else 0
+
+        size = cost + self._extra_tokens(item, known, cost)
+        count, window_end = self._reserve(key, item.get_expiry(), size)
+        RATE_LIMIT_CHECKS.labels("shared").inc()
+        position = count - size + cost
+        with self._lock:
+            if position < count:
+                self._leases[key] = _Lease(next=position + 1, last=count, window_end=window_end)
+            else:
+                self._leases.pop(key, None)
+            if len(self._leases) > _MAX_LEASES:
+                self._sweep(now)
+        return position <= item.amount
+
+    def clear_leases(self) -> None:
+        with self._lock:
+            self._leases.clear()
+
+    @staticmethod
+    def _extra_tokens(item: RateLimitItem, known: int, cost: int) -> int:
+        lease = int(item.amount * settings.rate_limit_lease_fraction)
+        if lease <= cost or known * 2 > item.amount:
+            return 0
+        # Keep what other workers' leases can strand at no more than half the limit.
+        if item.amount < 2 * max(1, settings.rate_limit_workers) * lease:
+            return 0
+        return lease - cost
 
-    @app.exception_handler(RateLimitExceeded)
-    async def _rate_limit_handler(request, exc):
-        return limiter._rate_limit_exceeded_handler(request, exc)
+    def _reserve(self, key: str, expiry: int, amount: int) -> tuple[int, float]:
+        """Increment the shared counter; returns the new count and when its window ends."""
 
+        storage = self.storage
+        if isinstance(storage, RedisStorage):
+            # One round trip: the INCRBY+EXPIRE script and the remaining TTL.
+            pipe = storage.get_connection().pipeline(transaction=False)
+            storage.lua_incr_expire([storage.prefixed_key(key)], [expiry, amount], client=pipe)
+            pipe.pttl(storage.prefixed_key(key))
+            count, ttl_ms = pipe.execute()
+            return int(count), self._clock() + max(int(ttl_ms), 0) / 1000
+        count = storage.incr(key, expiry, amount=amount)
+        return count, storage.get_expiry(key)
+
+    def _sweep(self, now: float) -> None:
+        for key in [k for k, lease in self._leases.items() if lease.window_end <= now]:
+            del self._leases[key]
+
+
+class SharedLimiter(Limiter):
+    """slowapi Limiter on the shared counter store (RATE_LIMIT_REDIS_URL, else in-process memory)."""
+
+    def __init__(self, **kwargs) -> None:  # noqa: ANN003
+        super().__init__(**kwargs)
+        self._limiter = LeasedFixedWindowRateLimiter(self._storage)
+
+    def reset(self) -> None:
+        super().reset()
+        self._limiter.clear_leases()
+
+
+# Keyed on the same client identity as the download log (X-Forwarded-For aware), so every worker and
+# container counts a client once. If Redis goes away each process falls back to its own memory limits.
+limiter = SharedLimiter(
+    key_func=client_ip_hash,
+    storage_uri=settings.rate_limit_redis_url or "memory://",
+    in_memory_fallback_enabled=bool(settings.rate_limit_redis_url),
+    key_prefix="minecrox",
+)
+
+
+def init_rate_limiter(app: FastAPI) -> None:
+    app.state.limiter = limiter
+    app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
     app.add_middleware(SlowAPIMiddleware)
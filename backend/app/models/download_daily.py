@@ -0,0 +1,24 @@
+from __future__ import annotations
+
+from datetime import date
+
+from sqlalchemy import Date, ForeignKey, Integer, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base import Base
+
+
+class DownloadDaily(Base):
+    """Per-file, per-UTC-day download totals, maintained as downloads are recorded.
+
+    Unique downloaders per day come from the matching DownloadSketch, so recording a
+    download never has to look at the raw log.
+    """
+
+    __tablename__ = "download_daily"
+
+    file_id: Mapped[str] = mapped_column(
+        String(36), ForeignKey("files.id", ondelete="CASCADE"), primary_key=True
+    )
+    day: Mapped[date] = mapped_column(Date, primary_key=True, index=True)
+    count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
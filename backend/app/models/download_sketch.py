@@ -0,0 +1,20 @@
+from __future__ import annotations
+
+from datetime import date
+
+from sqlalchemy import Date, ForeignKey, LargeBinary, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base import Base
+
+
+class DownloadSketch(Base):
+    """Per-file, per-UTC-day HyperLogLog sketch of downloader IP hashes (see app.utils.hll)."""
+
+    __tablename__ = "download_sketches"
+
+    file_id: Mapped[str] = mapped_column(
+        String(36), ForeignKey("files.id", ondelete="CASCADE"), primary_key=True
+    )
+    day: Mapped[date] = mapped_column(Date, primary_key=True, index=True)
+    sketch: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
@@ -0,0 +1,22 @@
+from __future__ import annotations
+
+from datetime import datetime
+
+from sqlalchemy import DateTime, Integer, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base import Base
+
+
+class PendingObjectDelete(Base):
+    """An S3 object no row references any more, queued until its delete succeeds.
+
+    Queued in the same transaction that drops the last reference, so the
+    database can commit before talking to S3 without leaking objects.
+    """
+
+    __tablename__ = "pending_object_deletes"
+
+    s3_key: Mapped[str] = mapped_column(String(1024), primary_key=True)
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
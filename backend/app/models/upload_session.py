@@ -0,0 +1,32 @@
+from __future__ import annotations
+
+import uuid
+from datetime import datetime
+
+from sqlalchemy import DateTime, Integer, String, Text
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base import Base
+
+
+class UploadSession(Base):
+    """A resumable upload in progress: an open S3 multipart upload, one part per chunk."""
+
+    __tablename__ = "upload_sessions"
+
+    # Also the client's handle for the session, so it has to stay unguessable.
+    id: Mapped[str] = mapped_column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    file_id: Mapped[str] = mapped_column(String(36), nullable=False)
+    filename: Mapped[str] = mapped_column(String(255), nullable=False)
+    s3_key: Mapped[str] = mapped_column(String(1024), nullable=False)
+    upload_id: Mapped[str] = mapped_column(String(1024), nullable=False)
+
+    total_size: Mapped[int] = mapped_column(Integer, nullable=False)
+    chunk_size: Mapped[int] = mapped_column(Integer, nullable=False)
+    received_bytes: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    # JSON list of part ETags; part N is at index N - 1.
+    part_etags: Mapped[str] = mapped_column(Text, nullable=False, default="[]")
+
+    uploader_ip_hash: Mapped[str] = mapped_column(String(64), nullable=False, index=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    expire_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, index=True)
@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.blob import Blob
+
+
+class BlobRepository:
+    def __init__(self, session: AsyncSession) -> None:
+        self._session = session
+
+    async def get(self, sha1_hash: str) -> Blob | None:
+        result = await self._session.execute(select(Blob).where(Blob.sha1_hash == sha1_hash))
+        return result.scalar_one_or_none()
+
+    async def add(self, blob: Blob) -> Blob:
+        self._session.add(blob)
+        await self._session.flush()
+        return blob
+
+    async def acquire(self, sha1_hash: str) -> Blob | None:
+        """Add a reference to an existing blob; returns None if there is none."""
+
+        result = await self._session.execute(
+            update(Blob).where(Blob.sha1_hash == sha1_hash).values(ref_count=Blob.ref_count + 1)
+        )
+        if not result.rowcount:
+            return None
+        blob = await self.get(sha1_hash)
+        if blob is not None:
+            await self._session.refresh(blob)
+        return blob
+
+    async def release(self, sha1_hash: str, s3_key: str) -> bool:
+        """Drop one reference held by a file stored at `s3_key`.
+
+        Returns True when the S3 object is no longer referenced and should be
+        deleted. Files that predate content addressing own their object outright.
+        """
+
+        blob = await self.get(sha1_hash)
+        if blob is None or blob.s3_key != s3_key:
+            return True
+
+        await self._session.execute(
+            update(Blob).where(Blob.sha1_hash == sha1_hash).values(ref_count=Blob.ref_count - 1)
+        )
+        await self._session.refresh(blob)
+        if blob.ref_count > 0:
+            return False
+
+        await self._session.execute(delete(Blob).where(Blob.sha1_hash == sha1_hash))
+        return True
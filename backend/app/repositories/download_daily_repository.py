@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+from datetime import UTC, date, datetime, time, timedelta
+from typing import Any
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.download import Download
+from app.models.download_daily import DownloadDaily
+from app.models.download_sketch import DownloadSketch
+from app.utils.hll import HyperLogLog
+
+
+def day_bounds(day: date) -> tuple[datetime, datetime]:
+    start = datetime.combine(day, time.min, tzinfo=UTC)
+    return start, start + timedelta(days=1)
+
+
+class DownloadDailyRepository:
+    def __init__(self, session: AsyncSession) -> None:
+        self._session = session
+
+    async def increment(self, file_id: str, day: date, count: int) -> None:
+        """Upsert the (file_id, day) row, adding to its counter."""
+
+        stmt = await self._dialect_insert(DownloadDaily)
+        if stmt is None:
+            await self._increment_portable(file_id, day, count)
+            return
+
+        stmt = stmt.values(file_id=file_id, day=day, count=count)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[DownloadDaily.file_id, DownloadDaily.day],
+            set_={"count": DownloadDaily.count + stmt.excluded.count},
+        )
+        await self._session.execute(stmt)
+
+    async def _dialect_insert(self, model: type) -> Any | None:
+        # INSERT .. ON CONFLICT is dialect-specific; None means fall back to read-modify-write.
+        conn = await self._session.connection()
+        if conn.dialect.name == "postgresql":
+            return postgresql.insert(model)
+        if conn.dialect.name == "sqlite":
+            return sqlite.insert(model)
+        return None
+
+    async def _increment_portable(self, file_id: str, day: date, count: int) -> None:
+        row = await self._session.get(DownloadDaily, (file_id, day))
+        if row is None:
+            self._session.add(DownloadDaily(file_id=file_id, day=day, count=count))
+        else:
+            row.count += count
+        await self._session.flush()
+
+    async def merge_sketch(self, file_id: str, day: date, sketch: HyperLogLog) -> None:
+        """Fold `sketch` into the stored (file_id, day) sketch (register-wise max, so repeating it is harmless)."""
+
+        stmt = await self._dialect_insert(DownloadSketch)
+        if stmt is not None:
+            result = await self._session.execute(
+                stmt.values(file_id=file_id, day=day, sketch=sketch.to_bytes()).on_conflict_do_nothing()
+            )
+            if result.rowcount:
+                return
+        # Row lock (PostgreSQL) so concurrent flushes from other workers don't overwrite each other.
+        row = await self._session.get(
+            DownloadSketch, (file_id, day), with_for_update=True, populate_existing=True
+        )
+        if row is None:
+            self._session.add(DownloadSketch(file_id=file_id, day=day, sketch=sketch.to_bytes()))
+            await self._session.flush()
+            return
+        stored = HyperLogLog.from_bytes(row.sketch)
+        before = bytes(stored.registers)
+        stored.merge(sketch)
+        # Mostly repeat downloaders: skip the write when no register went up.
+        if stored.registers != before:
+            row.sketch = stored.to_bytes()
+            await self._session.flush()
+
+    async def unique_estimates(self, file_id: str, first_day: date, last_day: date) -> tuple[dict[date, int], int]:
+        """Approximate distinct downloaders per day and over the whole inclusive day range."""
+
+        result = await self._session.execute(
+            select(DownloadSketch.day, DownloadSketch.sketch).where(
+                DownloadSketch.file_id == file_id,
+                DownloadSketch.day >= first_day,
+                DownloadSketch.day <= last_day,
+            )
+        )
+        per_day: dict[date, int] = {}
+        merged = HyperLogLog()
+        for day, data in result.all():
+            sketch = HyperLogLog.from_bytes(data)
+            per_day[day] = sketch.estimate()
+            merged.merge(sketch)
+        return per_day, merged.estimate()
+
+    async def get(self, file_id: str, day: date) -> DownloadDaily | None:
+        result = await self._session.execute(
+            select(DownloadDaily).where(DownloadDaily.file_id == file_id, DownloadDaily.day == day)
+        )
+        return result.scalar_one_or_none()
+
+    async def series(self, file_id: str, first_day: date, last_day: date) -> list[DownloadDaily]:
+        result = await self._session.execute(
+            select(DownloadDaily)
+            .where(
+                DownloadDaily.file_id == file_id,
+                DownloadDaily.day >= first_day,
+                DownloadDaily.day <= last_day,
+            )
+            .order_by(DownloadDaily.day)
+        )
+        return list(result.scalars().all())
+
+    async def first_log_day(self) -> date | None:
+        result = await self._session.execute(select(func.min(Download.timestamp)))
+        first = result.scalar_one_or_none()
+        if first is None:
+            return None
+        # SQLite hands back naive datetimes; timestamps are stored in UTC.
+        return (first if first.tzinfo is None else first.astimezone(UTC)).date()
+
+    async def backfill_day(self, day: date) -> int:
+        """Rebuild one day's rollups from the raw log; returns the counter rows created.
+
+        Counter rows are only inserted where the day has none yet, so days
+        already counted by live downloads are never double-counted. Sketches
+        are merged (idempotent), streaming the day's distinct IP hashes instead
+        of loading them.
+        """
+
+        start, end = day_bounds(day)
+        in_day = (Download.timestamp >= start, Download.timestamp < end)
+        result = await self._session.execute(
+            select(Download.file_id, func.count()).where(*in_day).group_by(Download.file_id)
+        )
+        created = 0
+        for file_id, count in result.all():
+            created += await self._insert_missing(file_id, day, int(count))
+
+        sketches: dict[str, HyperLogLog] = {}
+        stream = await self._session.stream(select(Download.file_id, Download.ip_hash).where(*in_day).distinct())
+        async for file_id, ip_hash in stream:
+            sketches.setdefault(file_id, HyperLogLog()).add(ip_hash)
+        for file_id, sketch in sketches.items():
+            await self.merge_sketch(file_id, day, sketch)
+        return created
+
+    async def _insert_missing(self, file_id: str, day: date, count: int) -> int:
+        stmt = await self._dialect_insert(DownloadDaily)
+        if stmt is not None:
+            result = await self._session.execute(
+                stmt.values(file_id=file_id, day=day, count=count).on_conflict_do_nothing()
+            )
+            return int(result.rowcount or 0)
+        if await self._session.get(DownloadDaily, (file_id, day)) is not None:
+            return 0
+        self._session.add(DownloadDaily(file_id=file_id, day=day, count=count))
+        await self._session.flush()
+        return 1
@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+import json
+import logging
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from datetime import datetime
+from typing import Any
+
+from sqlalchemy import DateTime
+
+from app.config.settings import settings
+from app.models.file import File
+
+logger = logging.getLogger(__name__)
+
+_COLUMNS = list(File.__table__.columns)
+_DATETIME_COLUMNS = {c.key for c in _COLUMNS if isinstance(c.type, DateTime)}
+_REDIS_PREFIX = "minecrox:file:"
+
+
+def file_to_payload(file: File) -> dict[str, Any]:
+    return {c.key: getattr(file, c.key) for c in _COLUMNS}
+
+
+def payload_to_file(payload: dict[str, Any]) -> File:
+    # Transient, session-less copy: fine for reads, never add it to a session.
+    return File(**payload)
+
+
+def _encode(payload: dict[str, Any] | None) -> str:
+    if payload is None:
+        return "null"
+    return json.dumps(
+        {k: (v.isoformat() if isinstance(v, datetime) else v) for k, v in payload.items()},
+        separators=(",", ":"),
+    )
+
+
+def _decode(raw: str | bytes) -> dict[str, Any] | None:
+    data = json.loads(raw)
+    if data is None:
+        return None
+    for key in _DATETIME_COLUMNS:
+        if data.get(key) is not None:
+            data[key] = datetime.fromisoformat(data[key])
+    return data
+
+
+class FileSlugCache:
+    """Read-through cache of File metadata by slug.
+
+    Tier 1 is an in-process LRU with a short TTL; misses (unknown slugs) are
+    cached too, with their own shorter TTL, because bots probe random slugs.
+    Tier 2 (FILE_CACHE_REDIS_URL, optional) is shared by all workers and is
+    invalidated together with tier 1. Other workers' tier 1 entries can stay
+    stale for at most FILE_CACHE_TTL_SECONDS.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic) -> None:
+        self._clock = clock
+        self._entries: OrderedDict[str, tuple[float, dict[str, Any] | None]] = OrderedDict()
+        self._redis: Any | None = None
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.redis_hits = 0
+
+    @property
+    def enabled(self) -> bool:
+        return settings.file_cache_enabled and settings.file_cache_max_entries > 0
+
+    def _redis_client(self) -> Any | None:
+        if not settings.file_cache_redis_url:
+            return None
+        if self._redis is None:
+            import redis.asyncio as redis_asyncio
+
+            self._redis = redis_asyncio.from_url(settings.file_cache_redis_url)
+        return self._redis
+
+    async def get(self, slug: str) -> tuple[bool, dict[str, Any] | None]:
+        """Return (found, payload); a found None payload means the slug is known not to exist."""
+
+        if not self.enabled:
+            return False, None
+
+        now = self._clock()
+        entry = self._entries.get(slug)
+        if entry is not None:
+            expires_at, payload = entry
+            if expires_at > now:
+                self._entries.move_to_end(slug)
+                if payload is None:
+                    self.negative_hits += 1
+                else:
+                    self.hits += 1
+                return True, payload
+            del self._entries[slug]
+
+        client = self._redis_client()
+        if client is not None:
+            try:
+                raw = await client.get(_REDIS_PREFIX + slug)
+            except Exception:
+                logger.warning("file cache: redis get failed", exc_info=True)
+                raw = None
+            if raw is not None:
+                payload = _decode(raw)
+                self.redis_hits += 1
+                self._store_local(slug, payload)
+                return True, payload
+
+        self.misses += 1
+        return False, None
+
+    async def set(self, slug: str, payload: dict[str, Any] | None) -> None:
+        if not self.enabled:
+            return
+        self._store_local(slug, payload)
+        client = self._redis_client()
+        if client is not None:
+            if payload is not None:
+                ttl = settings.file_cache_redis_ttl_seconds
+            else:
+                ttl = settings.file_cache_negative_ttl_seconds
+            try:
+                await client.set(_REDIS_PREFIX + slug, _encode(payload), ex=max(1, int(ttl)))
+            except Exception:
+                logger.warning("file cache: redis set failed", exc_info=True)
+
+    async def invalidate(self, *slugs: str) -> None:
+        if not slugs:
+            return
+        for slug in slugs:
+            self._entries.pop(slug, None)
+        client = self._redis_client()
+        if client is not None:
+            try:
+                await client.delete(*(_REDIS_PREFIX + s for s in slugs))
+            except Exception:
+                logger.warning("file cache: redis delete failed", exc_info=True)
+
+    def _store_local(self, slug: str, payload: dict[str, Any] | None) -> None:
+        ttl = settings.file_cache_ttl_seconds if payload is not None else settings.file_cache_negative_ttl_seconds
+        self._entries[slug] = (self._clock() + ttl, payload)
+        self._entries.move_to_end(slug)
+        while len(self._entries) > settings.file_cache_max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    async def close(self) -> None:
+        client, self._redis = self._redis, None
+        if client is not None:
+            await client.aclose()
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+        }
+
+
+file_cache = FileSlugCache()
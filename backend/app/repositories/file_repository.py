@@ -4,6 +4,7 @@ from sqlalchemy import func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.file import File
+from app.repositories.file_cache import file_cache, file_to_payload, payload_to_file
 
 
 class FileRepository:
@@ -14,6 +15,21 @@ class FileRepository:
         result = await self._session.execute(select(File).where(File.slug == slug))
         return result.scalar_one_or_none()
 
+    async def get_by_slug_cached(self, slug: str) -> File | None:
+        """Read-only lookup through the slug cache.
+
+        A cache hit is a transient copy that is not attached to the session, so
+        use get_by_slug() for anything that modifies or deletes the row.
+        """
+
+        found, payload = await file_cache.get(slug)
+        if found:
+            return payload_to_file(payload) if payload is not None else None
+
+        file = await self.get_by_slug(slug)
+        await file_cache.set(slug, file_to_payload(file) if file is not None else None)
+        return file
+
     async def count_by_uploader_ip_hash(self, uploader_ip_hash: str) -> int:
         result = await self._session.execute(
             select(func.count()).select_from(File).where(File.uploader_ip_hash == uploader_ip_hash)
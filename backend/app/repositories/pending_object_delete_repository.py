@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+from datetime import datetime
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.pending_object_delete import PendingObjectDelete
+
+
+class PendingObjectDeleteRepository:
+    def __init__(self, session: AsyncSession) -> None:
+        self._session = session
+
+    async def enqueue(self, s3_keys: list[str], now: datetime) -> None:
+        if not s3_keys:
+            return
+        result = await self._session.execute(
+            select(PendingObjectDelete.s3_key).where(PendingObjectDelete.s3_key.in_(s3_keys))
+        )
+        queued = set(result.scalars().all())
+        self._session.add_all(
+            PendingObjectDelete(s3_key=key, attempts=0, created_at=now) for key in dict.fromkeys(s3_keys)
+            if key not in queued
+        )
+        await self._session.flush()
+
+    async def page(self, after: str | None, limit: int) -> list[str]:
+        stmt = select(PendingObjectDelete.s3_key)
+        if after is not None:
+            stmt = stmt.where(PendingObjectDelete.s3_key > after)
+        result = await self._session.execute(stmt.order_by(PendingObjectDelete.s3_key).limit(limit))
+        return list(result.scalars().all())
+
+    async def remove(self, s3_keys: list[str]) -> None:
+        if s3_keys:
+            await self._session.execute(delete(PendingObjectDelete).where(PendingObjectDelete.s3_key.in_(s3_keys)))
+
+    async def mark_failed(self, s3_keys: list[str]) -> None:
+        if s3_keys:
+            await self._session.execute(
+                update(PendingObjectDelete)
+                .where(PendingObjectDelete.s3_key.in_(s3_keys))
+                .values(attempts=PendingObjectDelete.attempts + 1)
+            )
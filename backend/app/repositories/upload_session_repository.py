@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+import json
+from datetime import datetime
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.upload_session import UploadSession
+
+
+class UploadSessionRepository:
+    def __init__(self, session: AsyncSession) -> None:
+        self._session = session
+
+    async def get_active(self, session_id: str, now: datetime) -> UploadSession | None:
+        result = await self._session.execute(
+            select(UploadSession).where(UploadSession.id == session_id, UploadSession.expire_at > now)
+        )
+        return result.scalar_one_or_none()
+
+    async def count_active_by_uploader_ip_hash(self, uploader_ip_hash: str, now: datetime) -> int:
+        result = await self._session.execute(
+            select(func.count())
+            .select_from(UploadSession)
+            .where(UploadSession.uploader_ip_hash == uploader_ip_hash, UploadSession.expire_at > now)
+        )
+        return int(result.scalar_one())
+
+    async def add(self, upload: UploadSession) -> UploadSession:
+        self._session.add(upload)
+        await self._session.flush()
+        return upload
+
+    async def advance(
+        self, session_id: str, offset: int, received_bytes: int, etags: list[str], expire_at: datetime
+    ) -> bool:
+        """Record a chunk, but only if nobody else moved the session past `offset` meanwhile."""
+
+        result = await self._session.execute(
+            update(UploadSession)
+            .where(UploadSession.id == session_id, UploadSession.received_bytes == offset)
+            .values(received_bytes=received_bytes, part_etags=json.dumps(etags), expire_at=expire_at)
+        )
+        return bool(result.rowcount)
+
+    async def claim(self, session_id: str, total_size: int, now: datetime) -> bool:
+        """Take a complete session for finalizing by deleting its row; only one caller gets True."""
+
+        result = await self._session.execute(
+            delete(UploadSession).where(
+                UploadSession.id == session_id,
+                UploadSession.received_bytes == total_size,
+                UploadSession.expire_at > now,
+            )
+            # The caller is done with the loaded row; don't evaluate the filter against it in Python.
+            .execution_options(synchronize_session=False)
+        )
+        return bool(result.rowcount)
+
+    async def expired(self, now: datetime, limit: int) -> list[UploadSession]:
+        result = await self._session.execute(
+            select(UploadSession).where(UploadSession.expire_at <= now).order_by(UploadSession.expire_at).limit(limit)
+        )
+        return list(result.scalars().all())
+
+    async def delete(self, session_ids: list[str]) -> None:
+        if session_ids:
+            await self._session.execute(delete(UploadSession).where(UploadSession.id.in_(session_ids)))
+
+
+def part_etags(upload: UploadSession) -> list[str]:
+    return json.loads(upload.part_etags or "[]")
@@ -11,3 +11,17 @@ class FileAnalytics(BaseModel):
     last_download: datetime | None
     today_downloads: int
     today: date
+
+
+class DailyDownloads(BaseModel):
+    day: date
+    downloads: int
+    # HyperLogLog estimate, like unique_visitors_estimate.
+    unique_visitors: int
+
+
+class FileDailyAnalytics(BaseModel):
+    slug: str
+    days: list[DailyDownloads]
+    # Distinct downloaders over the whole window (HyperLogLog estimate, ~2% error).
+    unique_visitors_estimate: int
@@ -19,6 +19,17 @@ class FileCreateResponse(BaseModel):
     resource_pack: ResourcePackGeneratorInfo | None = None
 
 
+class BatchUploadItem(BaseModel):
+    filename: str | None
+    status_code: int
+    file: FileCreateResponse | None = None
+    error: str | None = None
+
+
+class BatchUploadResponse(BaseModel):
+    results: list[BatchUploadItem]
+
+
 class FilePublic(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
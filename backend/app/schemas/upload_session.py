@@ -0,0 +1,21 @@
+from __future__ import annotations
+
+from datetime import datetime
+
+from pydantic import BaseModel, Field
+
+
+class UploadSessionCreate(BaseModel):
+    filename: str
+    size: int = Field(gt=0)
+    captcha_token: str | None = None
+
+
+class UploadSessionStatus(BaseModel):
+    id: str
+    filename: str
+    total_size: int
+    # Every chunk but the last must be exactly this size; chunk N starts at (N - 1) * chunk_size.
+    chunk_size: int
+    received_bytes: int
+    expire_at: datetime
@@ -1,14 +1,14 @@
 from __future__ import annotations
 
-from datetime import UTC, date, datetime, timedelta
+from datetime import UTC, datetime, timedelta
 
 from fastapi import Depends, HTTPException
-from sqlalchemy import func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.models.download import Download
+from app.models.file import File
+from app.repositories.download_daily_repository import DownloadDailyRepository
 from app.repositories.file_repository import FileRepository
-from app.schemas.analytics import FileAnalytics
+from app.schemas.analytics import DailyDownloads, FileAnalytics, FileDailyAnalytics
 from app.services.deps import get_session
 
 
@@ -16,31 +16,50 @@ class AnalyticsService:
     def __init__(self, session: AsyncSession) -> None:
         self._session = session
         self._files = FileRepository(session)
+        self._rollups = DownloadDailyRepository(session)
 
     @staticmethod
     def from_depends(session: AsyncSession = Depends(get_session)) -> "AnalyticsService":
         return AnalyticsService(session)
 
-    async def get_file_analytics(self, slug: str) -> FileAnalytics:
-        file = await self._files.get_by_slug(slug)
+    async def _get_file(self, slug: str) -> File:
+        file = await self._files.get_by_slug_cached(slug)
         if file is None:
             raise HTTPException(status_code=404, detail="File not found")
+        return file
 
-        today = date.today()
-        start = datetime.now(UTC).replace(hour=0, minute=0, second=0, microsecond=0)
+    async def get_file_analytics(self, slug: str) -> FileAnalytics:
+        file = await self._get_file(slug)
 
-        result = await self._session.execute(
-            select(func.count()).select_from(Download).where(
-                Download.file_id == file.id,
-                Download.timestamp >= start,
-            )
-        )
-        today_downloads = int(result.scalar_one())
+        # Days are UTC, matching how the rollups are keyed.
+        today = datetime.now(UTC).date()
+        rollup = await self._rollups.get(file.id, today)
 
         return FileAnalytics(
             slug=file.slug,
             download_count=file.download_count,
             last_download=file.last_download,
-            today_downloads=today_downloads,
+            today_downloads=rollup.count if rollup is not None else 0,
             today=today,
         )
+
+    async def get_daily_downloads(self, slug: str, days: int) -> FileDailyAnalytics:
+        file = await self._get_file(slug)
+
+        last_day = datetime.now(UTC).date()
+        first_day = last_day - timedelta(days=days - 1)
+        rows = {r.day: r for r in await self._rollups.series(file.id, first_day, last_day)}
+        daily_unique, unique = await self._rollups.unique_estimates(file.id, first_day, last_day)
+
+        series = []
+        for offset in range(days):
+            day = first_day + timedelta(days=offset)
+            row = rows.get(day)
+            series.append(
+                DailyDownloads(
+                    day=day,
+                    downloads=row.count if row is not None else 0,
+                    unique_visitors=daily_unique.get(day, 0),
+                )
+            )
+        return FileDailyAnalytics(slug=file.slug, days=series, unique_visitors_estimate=unique)
@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from dataclasses import dataclass
+from datetime import UTC, date, datetime
+
+from sqlalchemy import case, insert, update
+
+from app.config.settings import settings
+from app.db import session as db_session
+from app.models.download import Download
+from app.models.file import File
+from app.repositories.download_daily_repository import DownloadDailyRepository
+from app.repositories.file_cache import file_cache
+from app.services.sketch_buffer import sketch_buffer
+from app.utils.expiry import sliding_expire_at
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(slots=True)
+class DownloadEvent:
+    file_id: str
+    slug: str
+    ip_hash: str
+    timestamp: datetime
+
+
+class DownloadRecorder:
+    """Write-behind buffer for download counters and download log rows.
+
+    The download route only appends an event in memory. A background task
+    flushes the buffer when it reaches DOWNLOAD_FLUSH_MAX_EVENTS or every
+    DOWNLOAD_FLUSH_INTERVAL_SECONDS: counter increments are coalesced into one
+    UPDATE per file and the log rows go out as a single bulk INSERT, all in one
+    commit. Anything still buffered is flushed on shutdown.
+    """
+
+    def __init__(self) -> None:
+        self._events: list[DownloadEvent] = []
+        self._flush_lock: asyncio.Lock | None = None
+        self._wakeup: asyncio.Event | None = None
+        self._task: asyncio.Task[None] | None = None
+
+    @property
+    def enabled(self) -> bool:
+        return settings.download_write_behind_enabled
+
+    @property
+    def pending(self) -> int:
+        return len(self._events)
+
+    def record(self, file_id: str, slug: str, ip_hash: str, timestamp: datetime) -> None:
+        self._events.append(DownloadEvent(file_id=file_id, slug=slug, ip_hash=ip_hash, timestamp=timestamp))
+        if len(self._events) >= settings.download_flush_max_events and self._wakeup is not None:
+            self._wakeup.set()
+
+    def start(self) -> None:
+        if self._task is not None:
+            return
+        self._flush_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        task = self._task
+        self._task = None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        await self.flush()
+        self._wakeup = None
+        self._flush_lock = None
+
+    async def _run(self) -> None:
+        assert self._wakeup is not None
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=settings.download_flush_interval_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("download flush failed")
+
+    async def flush(self) -> int:
+        if self._flush_lock is None:
+            return await self._flush()
+        async with self._flush_lock:
+            return await self._flush()
+
+    async def _flush(self) -> int:
+        events, self._events = self._events, []
+        if not events:
+            return 0
+
+        counts: dict[str, int] = {}
+        last_seen: dict[str, datetime] = {}
+        for e in events:
+            counts[e.file_id] = counts.get(e.file_id, 0) + 1
+            if e.file_id not in last_seen or e.timestamp > last_seen[e.file_id]:
+                last_seen[e.file_id] = e.timestamp
+
+        db_session.init_engine()
+        assert db_session.SessionLocal is not None
+        try:
+            async with db_session.SessionLocal() as session:
+                live: set[str] = set()
+                for file_id, count in counts.items():
+                    last = last_seen[file_id]
+                    expire_at = sliding_expire_at(last)
+                    result = await session.execute(
+                        update(File)
+                        .where(File.id == file_id)
+                        .values(
+                            download_count=File.download_count + count,
+                            last_download=last,
+                            # Sliding expiration, bucketed (see sliding_expire_at): an unchanged expire_at
+                            # keeps the expiry index out of the update.
+                            expire_at=case((File.expire_at < expire_at, expire_at), else_=File.expire_at),
+                        )
+                    )
+                    if result.rowcount:
+                        live.add(file_id)
+
+                # Files deleted since the event was buffered just drop their log rows.
+                live_events = [e for e in events if e.file_id in live]
+                await self._update_rollups(DownloadDailyRepository(session), live_events)
+                rows = [{"file_id": e.file_id, "ip_hash": e.ip_hash, "timestamp": e.timestamp} for e in live_events]
+                if rows:
+                    await session.execute(insert(Download), rows)
+                await session.commit()
+        except Exception:
+            self._requeue(events)
+            raise
+
+        # Counters changed: drop the cached copies.
+        await file_cache.invalidate(*{e.slug for e in events if e.file_id in live})
+        return len(events)
+
+    async def _update_rollups(self, rollups: DownloadDailyRepository, events: list[DownloadEvent]) -> None:
+        groups: dict[tuple[str, date], list[DownloadEvent]] = {}
+        for e in events:
+            groups.setdefault((e.file_id, e.timestamp.astimezone(UTC).date()), []).append(e)
+        for (file_id, day), group in groups.items():
+            await rollups.increment(file_id, day, count=len(group))
+            sketch_buffer.add(file_id, day, (e.ip_hash for e in group))
+
+    def _requeue(self, events: list[DownloadEvent]) -> None:
+        # Keep failed events for the next flush, but never let a dead DB grow the buffer unbounded.
+        merged = events + self._events
+        overflow = len(merged) - settings.download_buffer_max_events
+        if overflow > 0:
+            logger.warning("download buffer full: dropping %s events", overflow)
+            merged = merged[overflow:]
+        self._events = merged
+
+
+download_recorder = DownloadRecorder()
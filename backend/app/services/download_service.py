@@ -1,24 +1,37 @@
 from __future__ import annotations
 
-from datetime import UTC, datetime, timedelta
+import logging
+from datetime import UTC, datetime
 
 from fastapi import Depends, HTTPException, Request
+from fastapi.responses import RedirectResponse, Response, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.config.settings import settings
 from app.models.download import Download
+from app.models.file import File
+from app.repositories.download_daily_repository import DownloadDailyRepository
 from app.repositories.download_repository import DownloadRepository
+from app.repositories.file_cache import file_cache
 from app.repositories.file_repository import FileRepository
 from app.services.deps import get_session
-from app.storage.s3_storage import S3Storage
+from app.services.download_recorder import download_recorder
+from app.services.sketch_buffer import sketch_buffer
+from app.storage.object_cache import object_cache
+from app.storage.s3_storage import S3Storage, content_disposition
+from app.utils.expiry import as_utc, sliding_expire_at
+from app.utils.http import etag_matches, parse_range
 from app.utils.ip import client_ip_hash
 
+logger = logging.getLogger(__name__)
+
 
 class DownloadService:
     def __init__(self, session: AsyncSession, storage: S3Storage, request: Request) -> None:
         self._session = session
         self._files = FileRepository(session)
         self._downloads = DownloadRepository(session)
+        self._rollups = DownloadDailyRepository(session)
         self._storage = storage
         self._request = request
 
@@ -30,20 +43,123 @@ class DownloadService:
     ) -> "DownloadService":
         return DownloadService(session=session, storage=storage, request=request)
 
+    async def create_download_response(self, slug: str) -> Response:
+        if settings.download_mode == "proxy":
+            return await self._proxy_response(slug)
+        if self._request.method == "HEAD":
+            # Probes (link previews, CDN checks) don't count as downloads.
+            file = await self._get_cached_or_404(slug)
+            url = self._storage.create_presigned_download_url(file.s3_key, file.filename)
+        else:
+            url = await self.create_download_redirect(slug)
+        return RedirectResponse(url=url, status_code=302)
+
     async def create_download_redirect(self, slug: str) -> str:
+        file = await self._count_download(slug)
+        return self._storage.create_presigned_download_url(file.s3_key, file.filename)
+
+    async def _count_download(self, slug: str) -> File:
+        now = datetime.now(UTC)
+        ip_hash = client_ip_hash(self._request)
+
+        if download_recorder.enabled:
+            # Write-behind: the counter update and log row are flushed in batches off the request path,
+            # so the lookup can be served from the slug cache.
+            cached = await self._get_cached_or_404(slug)
+            download_recorder.record(file_id=cached.id, slug=cached.slug, ip_hash=ip_hash, timestamp=now)
+            return cached
+
         file = await self._files.get_by_slug(slug)
         if file is None:
             raise HTTPException(status_code=404, detail="File not found")
 
-        now = datetime.now(UTC)
         file.download_count += 1
         file.last_download = now
-        # Sliding expiration: keep file alive if accessed within FILE_EXPIRE_DAYS.
-        file.expire_at = now + timedelta(days=settings.file_expire_days)
+        # Sliding expiration: keep file alive if accessed within FILE_EXPIRE_DAYS. Only moves once per
+        # granularity bucket, leaving the indexed column alone for the other downloads.
+        expire_at = sliding_expire_at(now)
+        if as_utc(file.expire_at) < expire_at:
+            file.expire_at = expire_at
 
-        ip_hash = client_ip_hash(self._request)
+        day = now.date()
+        await self._rollups.increment(file.id, day, count=1)
         await self._downloads.add(Download(file_id=file.id, ip_hash=ip_hash, timestamp=now))
 
         await self._session.commit()
+        sketch_buffer.add(file.id, day, [ip_hash])
+        await file_cache.invalidate(slug)
+        return file
+
+    async def _get_cached_or_404(self, slug: str) -> File:
+        file = await self._files.get_by_slug_cached(slug)
+        if file is None:
+            raise HTTPException(status_code=404, detail="File not found")
+        return file
+
+    async def _proxy_response(self, slug: str) -> Response:
+        """Serve the object through the backend so the stable URL is cacheable.
+
+        Only full GETs, revalidations (304) and ranges starting at byte 0 count as
+        a download; resumed or parallel range fetches of the same pack don't.
+        """
+
+        file = await self._get_cached_or_404(slug)
+        method = self._request.method
+        req_headers = self._request.headers
+        etag = f'"{file.sha1_hash}"'
+        headers = {
+            "ETag": etag,
+            "Cache-Control": settings.download_cache_control,
+            "Accept-Ranges": "bytes",
+        }
+
+        if etag_matches(req_headers.get("if-none-match"), etag):
+            if method == "GET":
+                await self._count_download(slug)
+            return Response(status_code=304, headers=headers)
+
+        size = file.file_size
+        headers["Content-Type"] = "application/zip"
+        headers["Content-Disposition"] = content_disposition(file.filename)
+
+        byte_range = None
+        if_range = req_headers.get("if-range")
+        if if_range is None or if_range.strip() == etag:
+            byte_range = parse_range(req_headers.get("range"), size)
+
+        if byte_range is None:
+            status, start, end = 200, 0, size - 1
+        else:
+            status, (start, end) = 206, byte_range
+            headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+        headers["Content-Length"] = str(max(0, end - start + 1))
+
+        if method == "HEAD":
+            return Response(status_code=status, headers=headers)
+
+        if start == 0:
+            await self._count_download(slug)
+
+        if size == 0:
+            return Response(status_code=status, headers=headers)
+
+        if object_cache.enabled:
+            # Not zero-copy: FileResponse reads in chunks as well under uvicorn (no sendfile or
+            # pathsend), and streaming from the handle open_range already opened keeps an
+            # eviction by another worker from breaking the response.
+            cached = await object_cache.open_range(file.sha1_hash, start, end, settings.download_proxy_chunk_bytes)
+            if cached is not None:
+                return StreamingResponse(cached, status_code=status, headers=headers)
+
+        try:
+            stream = await self._storage.open_object(
+                file.s3_key, start=start if byte_range is not None else None, end=end
+            )
+        except Exception:
+            logger.exception("download proxy: failed to open %s", file.s3_key)
+            raise HTTPException(status_code=502, detail="Storage unavailable")
 
-        return self._storage.create_presigned_download_url(file.s3_key)
+        chunks = stream.iter_chunks(settings.download_proxy_chunk_bytes)
+        if byte_range is None and object_cache.should_fill(file.sha1_hash, size):
+            chunks = object_cache.fill(file.sha1_hash, size, chunks)
+        return StreamingResponse(chunks, status_code=status, headers=headers)
@@ -2,20 +2,30 @@ from __future__ import annotations
 
 import hashlib
 import hmac
+import logging
+from datetime import UTC, datetime
 
 from fastapi import Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.repositories.blob_repository import BlobRepository
+from app.repositories.file_cache import file_cache
 from app.repositories.file_repository import FileRepository
+from app.repositories.pending_object_delete_repository import PendingObjectDeleteRepository
 from app.schemas.file import FilePublic
 from app.services.deps import get_session
+from app.storage.object_cache import object_cache
 from app.storage.s3_storage import S3Storage
 from app.config.settings import settings
 
+logger = logging.getLogger(__name__)
+
 
 class FileService:
     def __init__(self, session: AsyncSession, storage: S3Storage) -> None:
         self._repo = FileRepository(session)
+        self._blobs = BlobRepository(session)
+        self._pending_deletes = PendingObjectDeleteRepository(session)
         self._session = session
         self._storage = storage
 
@@ -27,7 +37,7 @@ class FileService:
         return FileService(session, storage)
 
     async def get_public_by_slug(self, slug: str) -> FilePublic:
-        file = await self._repo.get_by_slug(slug)
+        file = await self._repo.get_by_slug_cached(slug)
         if file is None:
             raise HTTPException(status_code=404, detail="File not found")
         return FilePublic.model_validate(file)
@@ -46,6 +56,21 @@ class FileService:
         if token_hash != file.delete_token_hash:
             raise HTTPException(status_code=403, detail="Invalid delete token")
 
-        await self._storage.delete_object(file.s3_key)
+        sha1_hash, s3_key = file.sha1_hash, file.s3_key
+        unreferenced = await self._blobs.release(sha1_hash, s3_key)
         await self._repo.delete(file)
+        if unreferenced:
+            # Queued with the row delete; the commit comes before the S3 round trip so the write
+            # lock isn't held across it, and maintenance retries the object if the delete fails.
+            await self._pending_deletes.enqueue([s3_key], datetime.now(UTC))
         await self._session.commit()
+        await file_cache.invalidate(slug)
+        if unreferenced:
+            object_cache.discard(sha1_hash)
+            try:
+                await self._storage.delete_object(s3_key)
+            except Exception:
+                logger.exception("delete: failed to delete object %s, left for maintenance", s3_key)
+                return
+            await self._pending_deletes.remove([s3_key])
+            await self._session.commit()
@@ -1,36 +1,305 @@
 from __future__ import annotations
 
-from datetime import UTC, datetime, timedelta
+import asyncio
+import logging
+import time
+from collections import deque
+from collections.abc import Awaitable, Callable
+from datetime import UTC, date, datetime, timedelta
 
-from sqlalchemy import delete, select
+from sqlalchemy import delete, func, select, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.config.settings import settings
+from app.db import partitions
 from app.models.download import Download
+from app.models.download_daily import DownloadDaily
+from app.models.download_sketch import DownloadSketch
 from app.models.file import File
-from app.storage.s3_storage import S3Storage
+from app.repositories.blob_repository import BlobRepository
+from app.repositories.download_daily_repository import DownloadDailyRepository
+from app.repositories.file_cache import file_cache
+from app.repositories.pending_object_delete_repository import PendingObjectDeleteRepository
+from app.repositories.upload_session_repository import UploadSessionRepository
+from app.storage.object_cache import object_cache
+from app.storage.s3_storage import MAX_DELETE_OBJECTS_KEYS, S3Storage
+
+logger = logging.getLogger(__name__)
+
+DELETE_RETRY_BACKOFF_SECONDS = 0.5
+
+
+class _DeletePipeline:
+    """S3 deletes of earlier batches run while the caller prepares the next one.
+
+    Up to CLEANUP_DELETE_CONCURRENCY batches are in flight, sharing one
+    semaphore of as many DeleteObjects calls; results are settled in batch
+    order on the caller's DB session (the tasks themselves only talk to S3).
+    """
+
+    def __init__(
+        self,
+        delete: Callable[[list[str], asyncio.Semaphore], Awaitable[set[str]]],
+        settle: Callable[[list[str], set[str]], Awaitable[None]],
+    ) -> None:
+        self._delete = delete
+        self._settle = settle
+        self._limit = max(1, settings.cleanup_delete_concurrency)
+        self._sem = asyncio.Semaphore(self._limit)
+        self._in_flight: deque[tuple[list[str], asyncio.Task[set[str]]]] = deque()
+        self.freed = 0
+        self.failed = 0
+
+    async def submit(self, s3_keys: list[str]) -> None:
+        while self._in_flight and (len(self._in_flight) >= self._limit or self._in_flight[0][1].done()):
+            await self._settle_oldest()
+        if s3_keys:
+            self._in_flight.append((s3_keys, asyncio.create_task(self._delete(s3_keys, self._sem))))
+
+    async def drain(self) -> None:
+        while self._in_flight:
+            await self._settle_oldest()
+
+    async def cancel(self) -> None:
+        # The keys are still queued in pending_object_deletes; the next run retries them.
+        tasks = [task for _, task in self._in_flight]
+        self._in_flight.clear()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _settle_oldest(self) -> None:
+        s3_keys, task = self._in_flight[0]
+        failed = await task
+        self._in_flight.popleft()
+        await self._settle(s3_keys, failed)
+        self.freed += len(s3_keys) - len(failed)
+        self.failed += len(failed)
 
 
 class MaintenanceService:
     def __init__(self, session: AsyncSession, storage: S3Storage) -> None:
         self._session = session
         self._storage = storage
+        self._blobs = BlobRepository(session)
+        self._rollups = DownloadDailyRepository(session)
+        self._upload_sessions = UploadSessionRepository(session)
+        self._pending_deletes = PendingObjectDeleteRepository(session)
 
     async def cleanup_expired_files(self) -> int:
+        """Delete every expired file, one batch (and one commit) at a time.
+
+        Rows are paged by (expire_at, id); each page is read from
+        ix_files_expire_at_id alone and only the expired rows are then loaded.
+        Rows are committed before their objects are deleted, so the write lock
+        is never held across S3 calls; objects S3 keeps refusing stay queued in
+        pending_object_deletes for retry_object_deletes().
+        """
+
         now = datetime.now(UTC)
-        result = await self._session.execute(select(File).where(File.expire_at < now).limit(200))
-        expired = list(result.scalars().all())
+        started = time.perf_counter()
+        batch_size = max(1, settings.cleanup_batch_size)
+        cursor: tuple[datetime, str] | None = None
+        deleted = 0
+        pipeline = _DeletePipeline(self._delete_objects, self._settle_deletes)
+
+        try:
+            while True:
+                stmt = select(File.expire_at, File.id).where(File.expire_at < now)
+                if cursor is not None:
+                    stmt = stmt.where(tuple_(File.expire_at, File.id) > tuple_(*cursor))
+                page = (await self._session.execute(stmt.order_by(File.expire_at, File.id).limit(batch_size))).all()
+                if not page:
+                    break
+                cursor = tuple(page[-1])
+
+                result = await self._session.execute(
+                    select(File).where(File.id.in_([file_id for _, file_id in page]))
+                )
+                batch = list(result.scalars().all())
+                if batch:
+                    deleted += len(batch)
+                    await pipeline.submit(await self._delete_batch(batch, now))
+                if len(page) < batch_size:
+                    break
+            await pipeline.drain()
+        except BaseException:
+            await pipeline.cancel()
+            raise
+        objects, queued = pipeline.freed, pipeline.failed
+
+        elapsed = time.perf_counter() - started
+        if deleted or queued:
+            logger.info(
+                "cleanup: deleted %s files / %s objects in %.2fs (%.1f files/s), %s objects queued after S3 errors",
+                deleted,
+                objects,
+                elapsed,
+                deleted / elapsed if elapsed > 0 else 0.0,
+                queued,
+            )
+        return deleted
+
+    async def _delete_batch(self, batch: list[File], now: datetime) -> list[str]:
+        """Delete the rows of `batch`; returns the object keys they no longer need (queued, not yet deleted)."""
 
-        for f in expired:
-            await self._storage.delete_object(f.s3_key)
+        slugs = [f.slug for f in batch]
+
+        # Shared blobs are only deleted with their last referencing file.
+        to_delete: dict[str, str] = {}
+        for f in batch:
+            if await self._blobs.release(f.sha1_hash, f.s3_key):
+                to_delete[f.s3_key] = f.sha1_hash
             await self._session.delete(f)
+        await self._pending_deletes.enqueue(list(to_delete), now)
+        await self._session.commit()
+        await file_cache.invalidate(*slugs)
+        for sha1 in to_delete.values():
+            object_cache.discard(sha1)
+        return list(to_delete)
+
+    async def retry_object_deletes(self) -> int:
+        """Delete the objects queued by earlier runs (or file deletes) whose S3 delete failed."""
+
+        batch_size = max(1, settings.cleanup_batch_size)
+        cursor: str | None = None
+        pipeline = _DeletePipeline(self._delete_objects, self._settle_deletes)
+        try:
+            while True:
+                keys = await self._pending_deletes.page(cursor, batch_size)
+                await self._session.commit()
+                if not keys:
+                    break
+                cursor = keys[-1]
+                await pipeline.submit(keys)
+                if len(keys) < batch_size:
+                    break
+            await pipeline.drain()
+        except BaseException:
+            await pipeline.cancel()
+            raise
+        if pipeline.freed:
+            logger.info("cleanup: deleted %s previously queued objects", pipeline.freed)
+        return pipeline.freed
+
+    async def _settle_deletes(self, s3_keys: list[str], failed: set[str]) -> None:
+        await self._pending_deletes.remove([k for k in s3_keys if k not in failed])
+        await self._pending_deletes.mark_failed(list(failed))
+        await self._session.commit()
+
+    async def _delete_objects(self, s3_keys: list[str], sem: asyncio.Semaphore) -> set[str]:
+        """DeleteObjects in MAX_DELETE_OBJECTS_KEYS chunks, `sem` bounding the calls in flight.
+
+        Returns the keys that never succeeded.
+        """
+
+        async def _delete_chunk(chunk: list[str]) -> list[str]:
+            async with sem:
+                return await self._storage.delete_objects(chunk)
+
+        pending = s3_keys
+        attempts = max(1, settings.cleanup_delete_max_attempts)
+        for attempt in range(1, attempts + 1):
+            if not pending:
+                break
+            if attempt > 1:
+                logger.warning("cleanup: retrying %s S3 deletes (attempt %s/%s)", len(pending), attempt, attempts)
+                await asyncio.sleep(DELETE_RETRY_BACKOFF_SECONDS * 2 ** (attempt - 2))
+            chunks = [pending[i : i + MAX_DELETE_OBJECTS_KEYS] for i in range(0, len(pending), MAX_DELETE_OBJECTS_KEYS)]
+            results = await asyncio.gather(*(_delete_chunk(c) for c in chunks))
+            pending = [k for failed in results for k in failed]
+        return set(pending)
+
+    async def cleanup_upload_sessions(self) -> int:
+        """Abort the multipart uploads of expired resumable sessions and drop the sessions."""
 
-        if expired:
+        now = datetime.now(UTC)
+        batch_size = max(1, settings.cleanup_batch_size)
+        removed = 0
+        while True:
+            expired = await self._upload_sessions.expired(now, batch_size)
+            if not expired:
+                break
+            # Only the multipart upload is aborted: a session that was finalized just before
+            # expiring may already be the stored object of a file.
+            for upload in expired:
+                multipart = await self._storage.resume_multipart_upload(upload.s3_key, upload.upload_id, {})
+                await multipart.abort()
+            await self._upload_sessions.delete([u.id for u in expired])
             await self._session.commit()
-        return len(expired)
+            removed += len(expired)
+            if len(expired) < batch_size:
+                break
+        if removed:
+            logger.info("cleanup: aborted %s abandoned upload sessions", removed)
+        return removed
 
     async def prune_download_logs(self) -> int:
+        """Delete download rows past retention in id-range chunks; returns the rows deleted.
+
+        With day partitioning, whole expired days are dropped first and only the
+        rows left in the boundary day go through the chunked delete.
+        """
+
         cutoff = datetime.now(UTC) - timedelta(days=settings.download_log_retention_days)
-        result = await self._session.execute(delete(Download).where(Download.timestamp < cutoff))
+
+        conn = await self._session.connection()
+        if partitions.partitioning_enabled(conn.dialect.name) and await conn.run_sync(partitions.is_partitioned):
+            await conn.run_sync(partitions.ensure_partitions)
+            dropped = await conn.run_sync(partitions.drop_partitions_before, cutoff)
+            await self._session.commit()
+            if dropped:
+                logger.info("prune: dropped %s download partitions", dropped)
+
+        bounds = await self._session.execute(
+            select(func.min(Download.id), func.max(Download.id)).where(Download.timestamp < cutoff)
+        )
+        low, high = bounds.one()
+        await self._session.commit()
+        if low is None:
+            return 0
+
+        chunk = max(1, settings.download_prune_chunk_rows)
+        total = 0
+        while low <= high:
+            result = await self._session.execute(
+                delete(Download).where(
+                    Download.id >= low,
+                    Download.id < low + chunk,
+                    Download.timestamp < cutoff,
+                )
+            )
+            await self._session.commit()
+            total += int(result.rowcount or 0)
+            low += chunk
+            if low <= high and settings.download_prune_pause_seconds > 0:
+                await asyncio.sleep(settings.download_prune_pause_seconds)
+        return total
+
+    async def prune_download_rollups(self) -> int:
+        cutoff = (datetime.now(UTC) - timedelta(days=settings.download_rollup_retention_days)).date()
+        result = await self._session.execute(delete(DownloadDaily).where(DownloadDaily.day < cutoff))
+        await self._session.execute(delete(DownloadSketch).where(DownloadSketch.day < cutoff))
         await self._session.commit()
         return int(result.rowcount or 0)
+
+    async def backfill_download_rollups(self, before: date | None = None) -> int:
+        """Seed rollups from the raw log for the days before `before` (default: today, UTC).
+
+        A one-shot step after deploying rollups (`python -m app.db.migrate
+        backfill-rollups`), not part of the scheduled cleanup. One day per
+        commit; days that already have rollups keep their counters, so it is
+        safe to re-run. Returns the counter rows created.
+        """
+
+        before = before or datetime.now(UTC).date()
+        day = await self._rollups.first_log_day()
+        await self._session.commit()
+        created = 0
+        while day is not None and day < before:
+            created += await self._rollups.backfill_day(day)
+            await self._session.commit()
+            day += timedelta(days=1)
+        if created:
+            logger.info("backfill: created %s daily download rollups", created)
+        return created
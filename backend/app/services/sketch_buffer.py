@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections.abc import Iterable
+from datetime import date
+
+from app.config.settings import settings
+from app.db import session as db_session
+from app.repositories.download_daily_repository import DownloadDailyRepository
+from app.utils.hll import HyperLogLog
+
+logger = logging.getLogger(__name__)
+
+
+class SketchBuffer:
+    """In-memory HyperLogLog registers per (file_id, day), merged into download_sketches periodically.
+
+    Recording a downloader is a few register updates in memory; every
+    DOWNLOAD_SKETCH_FLUSH_SECONDS (or once DOWNLOAD_SKETCH_BUFFER_MAX_KEYS
+    sketches are pending) each pending sketch is merged into its row with one
+    locked read-modify-write, off the request path. Merging is a register-wise
+    max, so a flush that is retried after a failure can't over-count.
+    Unique-visitor analytics lag by at most one flush.
+    """
+
+    def __init__(self) -> None:
+        self._sketches: dict[tuple[str, date], HyperLogLog] = {}
+        self._flush_lock: asyncio.Lock | None = None
+        self._wakeup: asyncio.Event | None = None
+        self._task: asyncio.Task[None] | None = None
+
+    @property
+    def pending(self) -> int:
+        return len(self._sketches)
+
+    def add(self, file_id: str, day: date, ip_hashes: Iterable[str]) -> None:
+        sketch = self._sketches.get((file_id, day))
+        if sketch is None:
+            sketch = self._sketches[(file_id, day)] = HyperLogLog()
+        sketch.update(ip_hashes)
+        if len(self._sketches) >= settings.download_sketch_buffer_max_keys and self._wakeup is not None:
+            self._wakeup.set()
+
+    def clear(self) -> None:
+        self._sketches.clear()
+
+    def start(self) -> None:
+        if self._task is not None:
+            return
+        self._flush_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        task = self._task
+        self._task = None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        try:
+            await self.flush()
+        except Exception:
+            logger.exception("sketch flush on shutdown failed")
+        self._wakeup = None
+        self._flush_lock = None
+
+    async def _run(self) -> None:
+        assert self._wakeup is not None
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=settings.download_sketch_flush_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("sketch flush failed")
+
+    async def flush(self) -> int:
+        if self._flush_lock is None:
+            return await self._flush()
+        async with self._flush_lock:
+            return await self._flush()
+
+    async def _flush(self) -> int:
+        sketches, self._sketches = self._sketches, {}
+        if not sketches:
+            return 0
+
+        db_session.init_engine()
+        assert db_session.SessionLocal is not None
+        try:
+            async with db_session.SessionLocal() as session:
+                rollups = DownloadDailyRepository(session)
+                for (file_id, day), sketch in sketches.items():
+                    await rollups.merge_sketch(file_id, day, sketch)
+                await session.commit()
+        except Exception:
+            # Registers only ever grow: merging the failed batch back loses nothing.
+            for key, sketch in sketches.items():
+                pending = self._sketches.get(key)
+                if pending is None:
+                    self._sketches[key] = sketch
+                else:
+                    pending.merge(sketch)
+            raise
+        return len(sketches)
+
+
+sketch_buffer = SketchBuffer()
@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import asyncio
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
+from fastapi import HTTPException, Request
+
+from app.config.settings import settings
+
+
+class UploadAdmission:
+    """Admission control for uploads, checked before the request body is read.
+
+    An upload holds a slot until its response is ready: one of
+    UPLOAD_MAX_CONCURRENT globally, one of UPLOAD_MAX_CONCURRENT_PER_IP for its
+    client, and its Content-Length (or MAX_UPLOAD_BYTES when unknown) against
+    UPLOAD_TEMP_BUDGET_BYTES of temp disk. A request that doesn't fit waits up
+    to UPLOAD_ADMISSION_WAIT_SECONDS for a slot, then gets 503 + Retry-After.
+    0 disables a limit.
+    """
+
+    def __init__(self) -> None:
+        self._per_client: dict[str, int] = {}
+        self._waiters: list[asyncio.Future[None]] = []
+        self.in_flight = 0
+        self.in_flight_bytes = 0
+        self.queued = 0
+        self.rejected = 0
+
+    def reservation(self, request: Request, max_files: int = 1) -> int:
+        limit = settings.max_upload_bytes * max(1, max_files)
+        try:
+            declared = int(request.headers.get("content-length", ""))
+        except ValueError:
+            return limit
+        return max(0, min(declared, limit))
+
+    @asynccontextmanager
+    async def admit(self, client: str, nbytes: int) -> AsyncIterator[None]:
+        await self._acquire(client, nbytes)
+        try:
+            yield
+        finally:
+            self._release(client, nbytes)
+
+    def _fits(self, client: str, nbytes: int) -> bool:
+        if 0 < settings.upload_max_concurrent <= self.in_flight:
+            return False
+        if 0 < settings.upload_max_concurrent_per_ip <= self._per_client.get(client, 0):
+            return False
+        budget = settings.upload_temp_budget_bytes
+        # An upload larger than the whole budget still runs, alone.
+        if budget > 0 and self.in_flight_bytes and self.in_flight_bytes + nbytes > budget:
+            return False
+        return True
+
+    async def _acquire(self, client: str, nbytes: int) -> None:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + max(0.0, settings.upload_admission_wait_seconds)
+        while not self._fits(client, nbytes):
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                self.rejected += 1
+                raise HTTPException(
+                    status_code=503,
+                    detail="Too many uploads in progress, try again shortly",
+                    headers={"Retry-After": str(settings.upload_retry_after_seconds)},
+                )
+            waiter: asyncio.Future[None] = loop.create_future()
+            self._waiters.append(waiter)
+            self.queued += 1
+            try:
+                await asyncio.wait_for(waiter, remaining)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                self.queued -= 1
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+
+        self.in_flight += 1
+        self.in_flight_bytes += nbytes
+        self._per_client[client] = self._per_client.get(client, 0) + 1
+
+    def _release(self, client: str, nbytes: int) -> None:
+        self.in_flight -= 1
+        self.in_flight_bytes -= nbytes
+        remaining = self._per_client.get(client, 0) - 1
+        if remaining > 0:
+            self._per_client[client] = remaining
+        else:
+            self._per_client.pop(client, None)
+        # Waiters re-check their own limits; the ones that still don't fit wait again.
+        waiters, self._waiters = self._waiters, []
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "in_flight": self.in_flight,
+            "in_flight_bytes": self.in_flight_bytes,
+            "queued": self.queued,
+            "rejected": self.rejected,
+            "budget_bytes": settings.upload_temp_budget_bytes,
+        }
+
+
+upload_admission = UploadAdmission()
@@ -1,32 +1,75 @@
 from __future__ import annotations
 
+import asyncio
 import os
 import tempfile
 import uuid
-from datetime import UTC, datetime, timedelta
+from collections.abc import AsyncIterator
+from dataclasses import dataclass
+from datetime import UTC, datetime
 import hashlib
 import hmac
+import logging
 
 from fastapi import Depends, HTTPException, Request, UploadFile
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 import aiofiles
 
 from app.config.settings import settings
+from app.models.blob import Blob
 from app.models.file import File
+from app.repositories.blob_repository import BlobRepository
+from app.repositories.file_cache import file_cache
 from app.repositories.file_repository import FileRepository
-from app.schemas.file import FileCreateResponse, ResourcePackGeneratorInfo
+from app.schemas.file import BatchUploadItem, BatchUploadResponse, FileCreateResponse, ResourcePackGeneratorInfo
 from app.services.deps import get_session
-from app.storage.s3_storage import S3Storage
-from app.utils.files import allowed_extension, detect_zip_file_type
+from app.storage.s3_storage import MultipartUpload, S3Storage
+from app.utils.executor import cpu_executor
+from app.utils.expiry import sliding_expire_at
+from app.utils.files import (
+    ZipTailBuffer,
+    allowed_extension,
+    detect_zip_file_type,
+    detect_zip_file_type_from_tail,
+    temp_upload_dir,
+)
 from app.utils.ip import client_ip_hash
+from app.utils.metrics import UPLOAD_BYTES, ZIP_INSPECT_SECONDS
 from app.utils.slug import generate_random_slug
 
+logger = logging.getLogger(__name__)
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+async def _read_chunks(upload: UploadFile) -> AsyncIterator[bytes]:
+    while chunk := await upload.read(UPLOAD_CHUNK_SIZE):
+        yield chunk
+
+
+@dataclass
+class StagedUpload:
+    """A hashed and validated upload that has not been committed to storage yet.
+
+    Spooled uploads sit in a temp file; streamed uploads are a multipart upload
+    whose parts are all sent but which is not completed yet.
+    """
+
+    size: int
+    sha1: str
+    file_type: str
+    tmp_path: str | None = None
+    multipart: MultipartUpload | None = None
+    stored_key: str | None = None
+
 
 class UploadService:
     def __init__(self, session: AsyncSession, storage: S3Storage, request: Request) -> None:
         self._session = session
         self._repo = FileRepository(session)
+        self._blobs = BlobRepository(session)
         self._storage = storage
         self._request = request
 
@@ -42,10 +85,41 @@ class UploadService:
         self,
         upload: UploadFile,
     ) -> FileCreateResponse:
-        if upload.filename is None:
+        try:
+            return await self.handle_upload_stream(upload.filename, _read_chunks(upload))
+        finally:
+            try:
+                await upload.close()
+            except Exception:
+                pass
+
+    async def handle_upload_stream(
+        self,
+        filename: str | None,
+        chunks: AsyncIterator[bytes],
+    ) -> FileCreateResponse:
+        """Store one upload read from `chunks` (a single pass over the request body)."""
+
+        filename, uploader_hash = await self.check_new_upload(filename)
+        now = datetime.now(UTC)
+        file_id = str(uuid.uuid4())
+
+        staged = await self._stage(chunks, file_id, filename, now)
+        return await self.store_staged(
+            staged,
+            file_id=file_id,
+            filename=filename,
+            uploader_hash=uploader_hash,
+            now=now,
+        )
+
+    async def check_new_upload(self, filename: str | None) -> tuple[str, str]:
+        """Validate the filename and the per-IP quota; returns (filename, uploader IP hash)."""
+
+        if filename is None:
             raise HTTPException(status_code=400, detail="Missing filename")
 
-        filename = os.path.basename(upload.filename)
+        filename = os.path.basename(filename)
         if not allowed_extension(filename):
             raise HTTPException(status_code=400, detail="Only .zip files are supported")
 
@@ -54,17 +128,288 @@ class UploadService:
         existing_count = await self._repo.count_by_uploader_ip_hash(uploader_hash)
         if existing_count >= 10:
             raise HTTPException(status_code=429, detail="Upload limit reached for this IP")
+        return filename, uploader_hash
+
+    async def store_staged(
+        self,
+        staged: StagedUpload,
+        file_id: str,
+        filename: str,
+        uploader_hash: str,
+        now: datetime,
+    ) -> FileCreateResponse:
+        """Commit a staged upload as a new File; the staged copy is always released."""
 
-        now = datetime.now(UTC)
-        file_id = str(uuid.uuid4())
         delete_token = uuid.uuid4().hex
+        committed_key: str | None = None
+        try:
+            slug = await self._allocate_slug()
+            # A concurrent upload of the same content may insert the blob row first;
+            # on that conflict, retry once and attach to the winner's blob.
+            for attempt in range(2):
+                s3_key = await self._store_blob(staged, file_id=file_id, filename=filename, now=now)
+                await self._repo.add(
+                    self._new_file(staged, file_id, filename, slug, s3_key, uploader_hash, delete_token, now)
+                )
+                try:
+                    await self._session.commit()
+                    committed_key = s3_key
+                    break
+                except IntegrityError:
+                    await self._session.rollback()
+                    if attempt == 1 or not settings.storage_dedup_enabled:
+                        raise
+        finally:
+            await self._discard(staged, keep=committed_key)
+        # Drop a negative entry in case this slug was probed before it existed.
+        await file_cache.invalidate(slug)
+        return self._response(staged, file_id, slug, delete_token)
+
+    async def handle_batch(self, files: AsyncIterator[tuple[str | None, AsyncIterator[bytes]]]) -> BatchUploadResponse:
+        """Store several uploads from one request and commit their File rows together.
+
+        `files` yields (filename, chunks) per file part, in body order; each part
+        is staged as it is read. Validation and the S3 write of staged parts run
+        in the background, UPLOAD_BATCH_CONCURRENCY at a time, while the next
+        parts are read. A part that fails gets its own error result and the
+        others go ahead; the DB work happens once at the end in one transaction.
+        """
+
+        uploader_hash = client_ip_hash(self._request)
+        quota = 10 - await self._repo.count_by_uploader_ip_hash(uploader_hash)
+        now = datetime.now(UTC)
+        sem = asyncio.Semaphore(max(1, settings.upload_batch_concurrency))
+        results: list[BatchUploadItem] = []
+        pending: list[tuple[BatchUploadItem, StagedUpload, str, str, asyncio.Task[None]]] = []
+        # (result, staged, file id, filename, delete token) for the parts that made it to S3.
+        ready: list[tuple[BatchUploadItem, StagedUpload, str, str, str]] = []
+
+        async def _prepare(staged: StagedUpload, file_id: str, filename: str, known: bool) -> None:
+            async with sem:
+                if staged.tmp_path is not None:
+                    with ZIP_INSPECT_SECONDS.time():
+                        staged.file_type = await cpu_executor.run(detect_zip_file_type, staged.tmp_path)
+                if not known:
+                    await self._put_staged(staged, file_id=file_id, filename=filename, now=now)
+
+        committed: dict[str, str] = {}
+        try:
+            async for filename, chunks in files:
+                item = BatchUploadItem(filename=filename, status_code=201)
+                results.append(item)
+                try:
+                    if len(results) > max(1, settings.upload_batch_max_files):
+                        raise HTTPException(status_code=413, detail="Too many files in one batch")
+                    if filename is None:
+                        raise HTTPException(status_code=400, detail="Missing filename")
+                    item.filename = filename = os.path.basename(filename)
+                    if not allowed_extension(filename):
+                        raise HTTPException(status_code=400, detail="Only .zip files are supported")
+                    if quota <= 0:
+                        raise HTTPException(status_code=429, detail="Upload limit reached for this IP")
+                    file_id = str(uuid.uuid4())
+                    staged = await self._stage(chunks, file_id, filename, now, inspect=False)
+                except HTTPException as e:
+                    item.status_code, item.error = e.status_code, str(e.detail)
+                    continue
+                quota -= 1
+                # Content that is already stored is only referenced; the lookup is done here
+                # because the background tasks must not share the DB session.
+                known = settings.storage_dedup_enabled and await self._blobs.get(staged.sha1) is not None
+                task = asyncio.create_task(_prepare(staged, file_id, filename, known))
+                pending.append((item, staged, file_id, filename, task))
+
+            await asyncio.gather(*(task for *_, task in pending), return_exceptions=True)
+            for item, staged, file_id, filename, task in pending:
+                error = task.exception()
+                if isinstance(error, HTTPException):
+                    item.status_code, item.error = error.status_code, str(error.detail)
+                elif error is not None:
+                    logger.error("batch upload: storing %s failed", filename, exc_info=error)
+                    item.status_code, item.error = 502, "Storage unavailable"
+                else:
+                    ready.append((item, staged, file_id, filename, uuid.uuid4().hex))
+
+            slugs = [await self._allocate_slug() for _ in ready]
+            for attempt in range(2):
+                keys: dict[str, str] = {}
+                for (item, staged, file_id, filename, delete_token), slug in zip(ready, slugs):
+                    keys[file_id] = await self._store_blob(staged, file_id=file_id, filename=filename, now=now)
+                    await self._repo.add(
+                        self._new_file(
+                            staged, file_id, filename, slug, keys[file_id], uploader_hash, delete_token, now
+                        )
+                    )
+                try:
+                    await self._session.commit()
+                    committed = keys
+                    break
+                except IntegrityError:
+                    await self._session.rollback()
+                    if attempt == 1 or not settings.storage_dedup_enabled:
+                        raise
+        finally:
+            for *_, task in pending:
+                task.cancel()
+            await asyncio.gather(*(task for *_, task in pending), return_exceptions=True)
+            for _, staged, file_id, _, _ in pending:
+                await self._discard(staged, keep=committed.get(file_id))
+
+        for (item, staged, file_id, _, delete_token), slug in zip(ready, slugs):
+            await file_cache.invalidate(slug)
+            item.file = self._response(staged, file_id, slug, delete_token)
+        return BatchUploadResponse(results=results)
+
+    async def _allocate_slug(self) -> str:
+        # Privacy/anti-abuse: do not embed filename in URL; use an unguessable random slug.
+        for _ in range(10):
+            slug = generate_random_slug(16)
+            if await self._repo.get_by_slug(slug) is None:
+                return slug
+        raise HTTPException(status_code=500, detail="Failed to allocate a unique slug")
+
+    @staticmethod
+    def _new_file(
+        staged: StagedUpload,
+        file_id: str,
+        filename: str,
+        slug: str,
+        s3_key: str,
+        uploader_hash: str,
+        delete_token: str,
+        now: datetime,
+    ) -> File:
         delete_token_hash = hmac.new(
             settings.ip_hash_secret.encode("utf-8"),
             delete_token.encode("utf-8"),
             hashlib.sha256,
         ).hexdigest()
+        return File(
+            id=file_id,
+            filename=filename,
+            slug=slug,
+            file_type=staged.file_type,
+            minecraft_version=None,
+            loader=None,
+            description=None,
+            tags=None,
+            file_size=staged.size,
+            s3_key=s3_key,
+            sha1_hash=staged.sha1,
+            download_count=0,
+            created_at=now,
+            last_download=None,
+            expire_at=sliding_expire_at(now),
+            uploader_ip_hash=uploader_hash,
+            delete_token_hash=delete_token_hash,
+        )
 
-        tmp_dir = os.path.join(os.getcwd(), ".temp_uploads")
+    @staticmethod
+    def _response(staged: StagedUpload, file_id: str, slug: str, delete_token: str) -> FileCreateResponse:
+        sha1 = staged.sha1
+        landing = f"https://{settings.domain}/files/{slug}"
+        resource_pack_info: ResourcePackGeneratorInfo | None = None
+        if staged.file_type == "resource_pack":
+            download_url = f"https://{settings.domain}/download/{slug}"
+            snippet = f"resource-pack={download_url}\nresource-pack-sha1={sha1}\n"
+            resource_pack_info = ResourcePackGeneratorInfo(
+                download_url=download_url,
+                sha1=sha1,
+                server_properties_snippet=snippet,
+            )
+
+        return FileCreateResponse(
+            id=file_id,
+            slug=slug,
+            landing_page_url=landing,
+            delete_token=delete_token,
+            resource_pack=resource_pack_info,
+        )
+
+    async def _stage(
+        self,
+        chunks: AsyncIterator[bytes],
+        file_id: str,
+        filename: str,
+        now: datetime,
+        inspect: bool = True,
+    ) -> StagedUpload:
+        """Read one upload into a temp file or an open multipart upload.
+
+        With `inspect=False` a spooled zip is not validated yet (file_type is
+        left empty); streamed uploads are always validated from their tail.
+        """
+
+        if self._streaming_enabled():
+            staging_key = self._storage.build_key(file_id=file_id, filename=filename, now=now)
+            return await self._stream_to_storage(chunks, staging_key)
+        return await self._spool_to_disk(chunks, inspect=inspect)
+
+    def _streaming_enabled(self) -> bool:
+        # Streaming needs multipart: parts are sent while the body is still being read.
+        return settings.upload_streaming_enabled and self._storage.multipart_enabled()
+
+    async def _store_blob(self, staged: StagedUpload, file_id: str, filename: str, now: datetime) -> str:
+        """Make the staged bytes durable in S3 and return the key the File should point at.
+
+        With STORAGE_DEDUP_ENABLED, content already stored under the same SHA-1 is
+        reused and the staged copy is never written.
+        """
+
+        if settings.storage_dedup_enabled:
+            blob = await self._blobs.acquire(staged.sha1)
+            if blob is not None:
+                return blob.s3_key
+
+        stored_key = await self._put_staged(staged, file_id=file_id, filename=filename, now=now)
+        if settings.storage_dedup_enabled:
+            await self._blobs.add(
+                Blob(
+                    sha1_hash=staged.sha1,
+                    s3_key=stored_key,
+                    file_size=staged.size,
+                    ref_count=1,
+                    created_at=now,
+                )
+            )
+        return stored_key
+
+    async def _put_staged(self, staged: StagedUpload, file_id: str, filename: str, now: datetime) -> str:
+        """Write the staged bytes to S3 (once) and return their key; no DB access."""
+
+        if staged.stored_key is None:
+            if staged.multipart is not None:
+                await staged.multipart.complete()
+                staged.stored_key = staged.multipart.s3_key
+            else:
+                assert staged.tmp_path is not None
+                # Always a key of this upload's own: the blob row records where the content lives,
+                # and a copy that ends up unreferenced can be deleted without touching anyone else's.
+                s3_key = self._storage.build_key(file_id=file_id, filename=filename, now=now)
+                await self._storage.upload_file(tmp_path=staged.tmp_path, s3_key=s3_key)
+                staged.stored_key = s3_key
+        return staged.stored_key
+
+    async def _discard(self, staged: StagedUpload, keep: str | None) -> None:
+        """Release temp files, in-flight multipart uploads and unreferenced copies."""
+
+        if staged.tmp_path is not None:
+            try:
+                os.remove(staged.tmp_path)
+            except Exception:
+                pass
+        if staged.multipart is not None and staged.stored_key is None:
+            await staged.multipart.abort()
+        # Lost a dedup race, or the DB commit failed: the copy we wrote (under this upload's
+        # own key) is unreferenced.
+        if staged.stored_key is not None and staged.stored_key != keep:
+            try:
+                await self._storage.delete_object(staged.stored_key)
+            except Exception:
+                pass
+
+    async def _spool_to_disk(self, chunks: AsyncIterator[bytes], inspect: bool = True) -> StagedUpload:
+        tmp_dir = temp_upload_dir()
         os.makedirs(tmp_dir, exist_ok=True)
 
         with tempfile.NamedTemporaryFile(delete=False, dir=tmp_dir) as tmp:
@@ -75,78 +420,81 @@ class UploadService:
         try:
             # Stream to disk to avoid RAM usage; enforce max size while streaming.
             async with aiofiles.open(tmp_path, "wb") as out:
-                while True:
-                    chunk = await upload.read(1024 * 1024)
-                    if not chunk:
-                        break
+                async for chunk in chunks:
                     size += len(chunk)
+                    UPLOAD_BYTES.inc(len(chunk))
                     if size > settings.max_upload_bytes:
                         raise HTTPException(status_code=413, detail="File too large (max 100MB)")
-                    sha1_hasher.update(chunk)
+                    await cpu_executor.run_thread(sha1_hasher.update, chunk)
                     await out.write(chunk)
 
-            sha1 = sha1_hasher.hexdigest()
-
-            file_type = detect_zip_file_type(tmp_path)
-
-            # Privacy/anti-abuse: do not embed filename in URL; use an unguessable random slug.
-            slug = generate_random_slug(16)
-            for _ in range(10):
-                if await self._repo.get_by_slug(slug) is None:
-                    break
-                slug = generate_random_slug(16)
-            else:
-                raise HTTPException(status_code=500, detail="Failed to allocate a unique slug")
-
-            s3_key = self._storage.build_key(file_id=file_id, filename=filename, now=now)
-            await self._storage.upload_file(tmp_path=tmp_path, s3_key=s3_key)
-
-            file = File(
-                id=file_id,
-                filename=filename,
-                slug=slug,
-                file_type=file_type,
-                minecraft_version=None,
-                loader=None,
-                description=None,
-                tags=None,
-                file_size=size,
-                s3_key=s3_key,
-                sha1_hash=sha1,
-                download_count=0,
-                created_at=now,
-                last_download=None,
-                expire_at=now + timedelta(days=settings.file_expire_days),
-                uploader_ip_hash=uploader_hash,
-                delete_token_hash=delete_token_hash,
-            )
-            await self._repo.add(file)
-            await self._session.commit()
-
-            landing = f"https://{settings.domain}/files/{slug}"
-            resource_pack_info: ResourcePackGeneratorInfo | None = None
-            if file_type == "resource_pack":
-                download_url = f"https://{settings.domain}/download/{slug}"
-                snippet = f"resource-pack={download_url}\nresource-pack-sha1={sha1}\n"
-                resource_pack_info = ResourcePackGeneratorInfo(
-                    download_url=download_url,
-                    sha1=sha1,
-                    server_properties_snippet=snippet,
-                )
-
-            return FileCreateResponse(
-                id=file_id,
-                slug=slug,
-                landing_page_url=landing,
-                delete_token=delete_token,
-                resource_pack=resource_pack_info,
-            )
-        finally:
-            try:
-                await upload.close()
-            except Exception:
-                pass
+            file_type = ""
+            if inspect:
+                with ZIP_INSPECT_SECONDS.time():
+                    file_type = await cpu_executor.run(detect_zip_file_type, tmp_path)
+        except BaseException:
             try:
                 os.remove(tmp_path)
             except Exception:
                 pass
+            raise
+
+        return StagedUpload(size=size, sha1=sha1_hasher.hexdigest(), file_type=file_type, tmp_path=tmp_path)
+
+    async def _stream_to_storage(self, chunks: AsyncIterator[bytes], s3_key: str) -> StagedUpload:
+        """Single pass: hash, keep the zip tail and send multipart parts as chunks arrive.
+
+        Part uploads run in the background while the next chunks are read, bounded by
+        S3_MULTIPART_CONCURRENCY. Only the last UPLOAD_ZIP_TAIL_BYTES are retained to read
+        the central directory; if validation fails the multipart upload is aborted.
+        The upload is left uncompleted so a duplicate can still be dropped.
+        """
+
+        part_size = self._storage.multipart_part_size()
+        sem = asyncio.Semaphore(max(1, settings.s3_multipart_concurrency))
+        tasks: list[asyncio.Task[None]] = []
+        multipart = await self._storage.create_multipart_upload(s3_key)
+
+        async def _send(part_number: int, data: bytes) -> None:
+            try:
+                await multipart.upload_part(part_number, data)
+            finally:
+                sem.release()
+
+        async def _submit(data: bytes) -> None:
+            await sem.acquire()
+            for t in tasks:
+                if t.done() and t.exception() is not None:
+                    sem.release()
+                    raise t.exception()  # type: ignore[misc]
+            tasks.append(asyncio.create_task(_send(len(tasks) + 1, data)))
+
+        sha1_hasher = hashlib.sha1()
+        tail = ZipTailBuffer(settings.upload_zip_tail_bytes)
+        pending = bytearray()
+        try:
+            async for chunk in chunks:
+                UPLOAD_BYTES.inc(len(chunk))
+                if tail.size + len(chunk) > settings.max_upload_bytes:
+                    raise HTTPException(status_code=413, detail="File too large (max 100MB)")
+                await cpu_executor.run_thread(sha1_hasher.update, chunk)
+                tail.feed(chunk)
+                pending += chunk
+                while len(pending) >= part_size:
+                    await _submit(bytes(pending[:part_size]))
+                    del pending[:part_size]
+            if pending or not tasks:
+                await _submit(bytes(pending))
+
+            # Validate while the last parts are still in flight.
+            with ZIP_INSPECT_SECONDS.time():
+                file_type = await cpu_executor.run(detect_zip_file_type_from_tail, tail.getvalue(), tail.size)
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for t in tasks:
+                t.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await multipart.abort()
+            raise
+
+        return StagedUpload(size=tail.size, sha1=sha1_hasher.hexdigest(), file_type=file_type, multipart=multipart)
@@ -0,0 +1,278 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import uuid
+from collections import OrderedDict
+from collections.abc import AsyncIterator
+from datetime import UTC, datetime, timedelta
+from typing import Any
+
+from fastapi import Depends, HTTPException, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config.settings import settings
+from app.models.upload_session import UploadSession
+from app.repositories.upload_session_repository import UploadSessionRepository, part_etags
+from app.schemas.file import FileCreateResponse
+from app.schemas.upload_session import UploadSessionStatus
+from app.services.deps import get_session
+from app.services.upload_service import StagedUpload, UploadService
+from app.storage.s3_storage import S3Storage
+from app.utils.executor import cpu_executor
+from app.utils.files import detect_zip_file_type_from_tail
+from app.utils.metrics import UPLOAD_BYTES, ZIP_INSPECT_SECONDS
+
+logger = logging.getLogger(__name__)
+
+_MAX_HASH_STATES = 256
+
+
+class _Sha1States:
+    """Running SHA-1 per session, kept by the worker that received the chunks.
+
+    hashlib state can't be persisted, so a session whose chunks were spread
+    over workers (or outlived a restart) is hashed from the stored object at
+    finalize instead.
+    """
+
+    def __init__(self) -> None:
+        self._states: OrderedDict[str, tuple[int, Any]] = OrderedDict()
+
+    def get(self, session_id: str, offset: int) -> Any | None:
+        """A copy of the hasher covering exactly the first `offset` bytes, if this worker has it."""
+
+        if offset == 0:
+            return hashlib.sha1()
+        state = self._states.get(session_id)
+        if state is None or state[0] != offset:
+            return None
+        return state[1].copy()
+
+    def set(self, session_id: str, offset: int, hasher: Any) -> None:
+        self._states[session_id] = (offset, hasher)
+        self._states.move_to_end(session_id)
+        while len(self._states) > _MAX_HASH_STATES:
+            self._states.popitem(last=False)
+
+    def pop(self, session_id: str) -> None:
+        self._states.pop(session_id, None)
+
+
+sha1_states = _Sha1States()
+
+
+def _status(upload: UploadSession) -> UploadSessionStatus:
+    return UploadSessionStatus(
+        id=upload.id,
+        filename=upload.filename,
+        total_size=upload.total_size,
+        chunk_size=upload.chunk_size,
+        received_bytes=upload.received_bytes,
+        expire_at=upload.expire_at,
+    )
+
+
+class UploadSessionService:
+    """Resumable uploads: create a session, PUT fixed-size chunks in order, finalize.
+
+    Chunk N of a session is part N of one S3 multipart upload, so a dropped
+    connection only costs the chunk in flight; the client asks for the
+    session status and continues from `received_bytes`. Finalize completes the
+    multipart upload, validates the zip from its tail and stores it through
+    UploadService like any other upload. Abandoned sessions expire after
+    UPLOAD_SESSION_TTL_SECONDS without a chunk and are aborted by maintenance.
+    """
+
+    def __init__(self, session: AsyncSession, storage: S3Storage, request: Request) -> None:
+        self._session = session
+        self._storage = storage
+        self._request = request
+        self._sessions = UploadSessionRepository(session)
+        self._uploads = UploadService(session=session, storage=storage, request=request)
+
+    @staticmethod
+    def from_depends(
+        request: Request,
+        session: AsyncSession = Depends(get_session),
+        storage: S3Storage = Depends(S3Storage.from_depends),
+    ) -> "UploadSessionService":
+        return UploadSessionService(session=session, storage=storage, request=request)
+
+    async def create(self, filename: str, size: int) -> UploadSessionStatus:
+        if not self._storage.multipart_enabled():
+            # Sessions are S3 multipart uploads; providers kept on S3_UPLOAD_MODE=put can't take them.
+            raise HTTPException(status_code=501, detail="Resumable uploads are not available")
+        filename, uploader_hash = await self._uploads.check_new_upload(filename)
+        if size > settings.max_upload_bytes:
+            raise HTTPException(status_code=413, detail="File too large (max 100MB)")
+
+        now = datetime.now(UTC)
+        active = await self._sessions.count_active_by_uploader_ip_hash(uploader_hash, now)
+        if active >= settings.upload_session_max_per_ip:
+            raise HTTPException(status_code=429, detail="Too many unfinished uploads for this IP")
+
+        file_id = str(uuid.uuid4())
+        s3_key = self._storage.build_key(file_id=file_id, filename=filename, now=now)
+        multipart = await self._storage.create_multipart_upload(s3_key)
+        upload = UploadSession(
+            id=str(uuid.uuid4()),
+            file_id=file_id,
+            filename=filename,
+            s3_key=s3_key,
+            upload_id=multipart.upload_id,
+            total_size=size,
+            chunk_size=self._storage.multipart_part_size(),
+            received_bytes=0,
+            part_etags="[]",
+            uploader_ip_hash=uploader_hash,
+            created_at=now,
+            expire_at=now + timedelta(seconds=settings.upload_session_ttl_seconds),
+        )
+        try:
+            await self._sessions.add(upload)
+            await self._session.commit()
+        except BaseException:
+            await multipart.abort()
+            raise
+        return _status(upload)
+
+    async def status(self, session_id: str) -> UploadSessionStatus:
+        return _status(await self._get_or_404(session_id))
+
+    async def put_chunk(self, session_id: str, offset: int, body: AsyncIterator[bytes]) -> UploadSessionStatus:
+        upload = await self._get_or_404(session_id)
+        received = upload.received_bytes
+        if offset != received:
+            # Lost response or a duplicate request: tell the client where to continue.
+            raise HTTPException(
+                status_code=409,
+                detail=f"Expected offset {received}",
+                headers={"Upload-Offset": str(received)},
+            )
+        expected = min(upload.chunk_size, upload.total_size - offset)
+        if expected <= 0:
+            raise HTTPException(status_code=409, detail="Upload already complete")
+
+        data = bytearray()
+        async for chunk in body:
+            data += chunk
+            if len(data) > expected:
+                raise HTTPException(status_code=413, detail=f"Chunk must be {expected} bytes")
+        if len(data) != expected:
+            raise HTTPException(status_code=400, detail=f"Chunk must be {expected} bytes")
+        UPLOAD_BYTES.inc(len(data))
+
+        part_number = offset // upload.chunk_size + 1
+        etags = part_etags(upload)
+        multipart = await self._storage.resume_multipart_upload(
+            upload.s3_key, upload.upload_id, {n: etag for n, etag in enumerate(etags, start=1)}
+        )
+        await multipart.upload_part(part_number, bytes(data))
+        etags.append(multipart.etags[part_number])
+
+        hasher = sha1_states.get(session_id, offset)
+        if hasher is not None:
+            await cpu_executor.run_thread(hasher.update, bytes(data))
+
+        end = offset + len(data)
+        expire_at = datetime.now(UTC) + timedelta(seconds=settings.upload_session_ttl_seconds)
+        if not await self._sessions.advance(session_id, offset, end, etags, expire_at):
+            await self._session.rollback()
+            raise HTTPException(status_code=409, detail="Chunk was uploaded concurrently")
+        await self._session.commit()
+        if hasher is not None:
+            sha1_states.set(session_id, end, hasher)
+        else:
+            sha1_states.pop(session_id)
+
+        status = _status(upload)
+        status.received_bytes = end
+        status.expire_at = expire_at
+        return status
+
+    async def finalize(self, session_id: str) -> FileCreateResponse:
+        upload = await self._get_or_404(session_id)
+        if upload.received_bytes != upload.total_size:
+            raise HTTPException(
+                status_code=409,
+                detail="Upload is incomplete",
+                headers={"Upload-Offset": str(upload.received_bytes)},
+            )
+        filename, uploader_hash = await self._uploads.check_new_upload(upload.filename)
+        # Plain copies: store_staged may roll the session back, which expires ORM objects.
+        file_id, s3_key, size, upload_id = upload.file_id, upload.s3_key, upload.total_size, upload.upload_id
+        etags = {n: etag for n, etag in enumerate(part_etags(upload), start=1)}
+
+        # Claim the session before completing: a repeated or concurrent finalize must not
+        # complete the multipart upload twice or create a second File from it.
+        if not await self._sessions.claim(session_id, size, datetime.now(UTC)):
+            await self._session.rollback()
+            raise HTTPException(status_code=409, detail="Upload is already being finalized")
+        await self._session.commit()
+        sha1_hasher = sha1_states.get(session_id, size)
+        sha1_states.pop(session_id)
+
+        multipart = await self._storage.resume_multipart_upload(s3_key, upload_id, etags)
+        try:
+            await multipart.complete()
+        except Exception:
+            logger.exception("upload session %s: complete_multipart_upload failed", session_id)
+            # The session is gone, so the parts can't be finalized later either.
+            try:
+                await multipart.abort()
+            except Exception:
+                logger.exception("upload session %s: abort_multipart_upload failed", session_id)
+            raise HTTPException(status_code=502, detail="Storage unavailable")
+
+        try:
+            with ZIP_INSPECT_SECONDS.time():
+                tail = await self._read_tail(s3_key, size)
+                file_type = await cpu_executor.run(detect_zip_file_type_from_tail, tail, size)
+            hasher = sha1_hasher or await self._hash_object(s3_key)
+        except BaseException:
+            # Invalid content can't be resumed: drop the object (the session is already gone).
+            try:
+                await self._storage.delete_object(s3_key)
+            except Exception:
+                logger.exception("upload session %s: failed to delete %s", session_id, s3_key)
+            raise
+
+        # store_staged deletes the object itself if it fails.
+        staged = StagedUpload(size=size, sha1=hasher.hexdigest(), file_type=file_type, stored_key=s3_key)
+        return await self._uploads.store_staged(
+            staged,
+            file_id=file_id,
+            filename=filename,
+            uploader_hash=uploader_hash,
+            now=datetime.now(UTC),
+        )
+
+    async def cancel(self, session_id: str) -> None:
+        upload = await self._get_or_404(session_id)
+        multipart = await self._storage.resume_multipart_upload(upload.s3_key, upload.upload_id, {})
+        await multipart.abort()
+        await self._forget(session_id)
+
+    async def _get_or_404(self, session_id: str) -> UploadSession:
+        upload = await self._sessions.get_active(session_id, datetime.now(UTC))
+        if upload is None:
+            raise HTTPException(status_code=404, detail="Upload session not found")
+        return upload
+
+    async def _forget(self, session_id: str) -> None:
+        sha1_states.pop(session_id)
+        await self._sessions.delete([session_id])
+        await self._session.commit()
+
+    async def _read_tail(self, s3_key: str, size: int) -> bytes:
+        length = min(settings.upload_zip_tail_bytes, size)
+        stream = await self._storage.open_object(s3_key, start=size - length, end=size - 1)
+        return b"".join([chunk async for chunk in stream.iter_chunks(settings.download_proxy_chunk_bytes)])
+
+    async def _hash_object(self, s3_key: str) -> Any:
+        hasher = hashlib.sha1()
+        stream = await self._storage.open_object(s3_key)
+        async for chunk in stream.iter_chunks(settings.download_proxy_chunk_bytes):
+            await cpu_executor.run_thread(hasher.update, chunk)
+        return hasher
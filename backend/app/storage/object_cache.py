@@ -0,0 +1,303 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import os
+import tempfile
+import time
+from collections.abc import AsyncIterator, Callable
+from dataclasses import dataclass
+
+import aiofiles
+
+from app.config.settings import settings
+from app.utils.executor import cpu_executor
+from app.utils.files import sha1_of_file
+
+logger = logging.getLogger(__name__)
+
+# A .part file untouched for this long belongs to a fill that died (restart, crash); live fills
+# of other workers sharing the directory are left alone.
+_STALE_PART_SECONDS = 3600
+# Other workers' fills are picked up by a rescan at least this often (or sooner, when this
+# worker's own count already says the budget is exceeded).
+_RESCAN_SECONDS = 60.0
+
+
+@dataclass
+class _Entry:
+    size: int
+    hits: float
+    last_access: float
+    # Copies this worker didn't write are re-hashed in the background before they are served.
+    verified: bool
+
+
+class DiskObjectCache:
+    """Size-bounded on-disk cache of hot download objects, keyed by SHA-1.
+
+    Filled by teeing the first full proxied download of an object to disk;
+    the copy is only admitted when its SHA-1 and size match File.sha1_hash.
+    When over DOWNLOAD_DISK_CACHE_MAX_BYTES the entry with the lowest decayed
+    hit count (hits halve every DOWNLOAD_DISK_CACHE_HALF_LIFE_SECONDS since the
+    last access) is evicted, so a pack that was hot last week gives way to
+    this week's.
+
+    Workers share the directory: the budget is checked against what is on
+    disk, not just this process's own fills (rescanned when this worker's
+    count says it's full, and at least every minute, so other workers' fills
+    can overshoot it only until the next rescan), and a copy evicted by another
+    worker between lookup and read falls back to S3. Copies found on disk
+    (written by another worker or before a restart) are served from S3 until
+    a background task has re-hashed them, so no request waits on the check.
+    """
+
+    def __init__(self, root: str | None = None, clock: Callable[[], float] = time.time) -> None:
+        self._root = root
+        self._clock = clock
+        self._entries: dict[str, _Entry] | None = None
+        self._filling: set[str] = set()
+        self._verifying: dict[str, asyncio.Task[None]] = {}
+        self._scanned_at = 0.0
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return settings.download_disk_cache_enabled and settings.download_disk_cache_max_bytes > 0
+
+    @property
+    def root(self) -> str:
+        return self._root or settings.download_disk_cache_dir or os.path.join(os.getcwd(), ".download_cache")
+
+    def path_for(self, sha1: str) -> str:
+        return os.path.join(self.root, sha1[:2], f"{sha1}.zip")
+
+    def _scan(self) -> dict[str, os.stat_result]:
+        """Cached objects on disk, from every worker (blocking; run on the thread pool)."""
+
+        found: dict[str, os.stat_result] = {}
+        if not os.path.isdir(self.root):
+            return found
+        stale_before = time.time() - _STALE_PART_SECONDS
+        for dirpath, _, names in os.walk(self.root):
+            for name in names:
+                sha1, ext = os.path.splitext(name)
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue  # evicted meanwhile
+                if ext == ".part":
+                    if st.st_mtime < stale_before:
+                        try:
+                            os.remove(path)
+                        except OSError:
+                            pass
+                    continue
+                if ext == ".zip" and len(sha1) == 40:
+                    found[sha1] = st
+        return found
+
+    async def _index(self) -> dict[str, _Entry]:
+        if self._entries is None:
+            found = await cpu_executor.run_thread(self._scan)
+            if self._entries is None:
+                self._entries = {}
+                self._sync(found)
+                self._scanned_at = time.monotonic()
+        return self._entries
+
+    def _sync(self, found: dict[str, os.stat_result]) -> None:
+        """Match the index to the directory: drop what others evicted, adopt what they added."""
+
+        entries = self._entries
+        assert entries is not None
+        for sha1 in [k for k in entries if k not in found]:
+            del entries[sha1]
+        for sha1, st in found.items():
+            if sha1 not in entries:
+                # Someone else's copy: one hit as of its write, re-hashed before it is served here.
+                entries[sha1] = _Entry(st.st_size, 1.0, st.st_mtime, verified=False)
+        self.bytes = sum(e.size for e in entries.values())
+
+    def _score(self, entry: _Entry, now: float) -> float:
+        half_life = max(1.0, settings.download_disk_cache_half_life_seconds)
+        return entry.hits * 0.5 ** ((now - entry.last_access) / half_life)
+
+    async def lookup(self, sha1: str) -> str | None:
+        """Return the cached path for `sha1`, or None on a miss."""
+
+        entries = await self._index()
+        path = self.path_for(sha1)
+        entry = entries.get(sha1)
+        if entry is None:
+            # Possibly filled by another worker since this one scanned the directory.
+            try:
+                st = await cpu_executor.run_thread(os.stat, path)
+            except OSError:
+                self.misses += 1
+                return None
+            entry = entries[sha1] = _Entry(st.st_size, 1.0, st.st_mtime, verified=False)
+            self.bytes += st.st_size
+        if not entry.verified:
+            self._verify_later(sha1)
+            self.misses += 1
+            return None
+        now = self._clock()
+        entry.hits = self._score(entry, now) + 1
+        entry.last_access = now
+        self.hits += 1
+        return path
+
+    def _verify_later(self, sha1: str) -> None:
+        if sha1 not in self._verifying:
+            task = asyncio.create_task(self._verify(sha1))
+            self._verifying[sha1] = task
+            task.add_done_callback(lambda _: self._verifying.pop(sha1, None))
+
+    async def _verify(self, sha1: str) -> None:
+        try:
+            digest = await cpu_executor.run(sha1_of_file, self.path_for(sha1))
+        except OSError:
+            digest = None
+        except Exception:
+            logger.exception("object cache: failed to verify %s", sha1)
+            return
+        entry = (self._entries or {}).get(sha1)
+        if entry is None:
+            return  # evicted meanwhile
+        if digest != sha1:
+            logger.warning("object cache: dropping corrupt entry %s", sha1)
+            self.discard(sha1)
+        else:
+            entry.verified = True
+
+    async def wait_verified(self) -> None:
+        """Wait for the background checks started so far."""
+
+        await asyncio.gather(*self._verifying.values(), return_exceptions=True)
+
+    async def open_range(self, sha1: str, start: int, end: int, chunk_size: int) -> AsyncIterator[bytes] | None:
+        """Bytes start..end (inclusive) of the cached copy, or None to fall back to S3.
+
+        The file is opened before this returns, so an eviction by another
+        worker afterwards can't break the response (the open handle survives
+        the unlink).
+        """
+
+        path = await self.lookup(sha1)
+        if path is None:
+            return None
+        try:
+            handle = await aiofiles.open(path, "rb")
+        except FileNotFoundError:
+            # Evicted by another worker since the lookup.
+            self.discard(sha1)
+            self.hits -= 1
+            self.misses += 1
+            return None
+        return self._read(handle, start, end, chunk_size)
+
+    @staticmethod
+    async def _read(handle, start: int, end: int, chunk_size: int) -> AsyncIterator[bytes]:  # noqa: ANN001
+        try:
+            await handle.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = await handle.read(min(chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+        finally:
+            await handle.close()
+
+    def should_fill(self, sha1: str, size: int) -> bool:
+        return (
+            self.enabled
+            and 0 < size <= settings.download_disk_cache_max_bytes
+            and sha1 not in (self._entries or {})
+            and sha1 not in self._filling
+        )
+
+    async def fill(self, sha1: str, size: int, chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+        """Pass `chunks` through unchanged while writing them to the cache."""
+
+        self._filling.add(sha1)
+        os.makedirs(self.root, exist_ok=True)
+        with tempfile.NamedTemporaryFile(delete=False, dir=self.root, suffix=".part") as tmp:
+            tmp_path = tmp.name
+
+        hasher = hashlib.sha1()
+        written = 0
+        admitted = False
+        try:
+            async with aiofiles.open(tmp_path, "wb") as out:
+                async for chunk in chunks:
+                    await out.write(chunk)
+                    await cpu_executor.run_thread(hasher.update, chunk)
+                    written += len(chunk)
+                    yield chunk
+            if written == size and hasher.hexdigest() == sha1:
+                await self._admit(sha1, tmp_path, size)
+                admitted = True
+            else:
+                logger.warning("object cache: %s failed verification (%s/%s bytes)", sha1, written, size)
+        finally:
+            aclose = getattr(chunks, "aclose", None)
+            if aclose is not None:
+                await aclose()
+            self._filling.discard(sha1)
+            if not admitted:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+
+    async def _admit(self, sha1: str, tmp_path: str, size: int) -> None:
+        await self._make_room(size)
+        entries = await self._index()
+        path = self.path_for(sha1)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(tmp_path, path)
+        previous = entries.get(sha1)
+        if previous is not None:
+            self.bytes -= previous.size
+        entries[sha1] = _Entry(size, 1.0, self._clock(), verified=True)
+        self.bytes += size
+
+    async def _make_room(self, size: int) -> None:
+        # The budget covers every worker's copies, but walking the directory costs O(entries):
+        # rescan only when this process's count says it's full, or the last scan is getting old.
+        entries = await self._index()
+        budget = settings.download_disk_cache_max_bytes
+        if self.bytes + size > budget or time.monotonic() - self._scanned_at >= _RESCAN_SECONDS:
+            self._sync(await cpu_executor.run_thread(self._scan))
+            self._scanned_at = time.monotonic()
+        now = self._clock()
+        while entries and self.bytes + size > budget:
+            victim = min(entries, key=lambda k: self._score(entries[k], now))
+            self.discard(victim)
+
+    def discard(self, sha1: str) -> None:
+        entry = (self._entries or {}).pop(sha1, None)
+        if entry is not None:
+            self.bytes -= entry.size
+        try:
+            os.remove(self.path_for(sha1))
+        except OSError:
+            pass
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "entries": len(self._entries or {}),
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+object_cache = DiskObjectCache()
@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+
+
+class PresignedUrlCache:
+    """Small in-process TTL cache of presigned GET URLs keyed by S3 key.
+
+    A cached URL is handed out until fewer than `refresh_margin_seconds` of its
+    validity remain, so every client still gets a URL that is good for at least
+    that long. Entries are evicted LRU-first once `max_entries` is reached.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: int,
+        refresh_margin_seconds: int,
+        max_entries: int,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._ttl = ttl_seconds
+        self._margin = refresh_margin_seconds
+        self._max_entries = max_entries
+        self._clock = clock
+        self._entries: OrderedDict[str, tuple[str, float]] = OrderedDict()
+
+    @property
+    def enabled(self) -> bool:
+        return self._max_entries > 0 and self._margin < self._ttl
+
+    def get_or_sign(self, key: str, sign: Callable[[], str]) -> str:
+        if not self.enabled:
+            return sign()
+
+        now = self._clock()
+        entry = self._entries.get(key)
+        if entry is not None:
+            url, expires_at = entry
+            if expires_at - now > self._margin:
+                self._entries.move_to_end(key)
+                return url
+            del self._entries[key]
+
+        url = sign()
+        self._entries[key] = (url, now + self._ttl)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+        return url
+
+    def invalidate(self, key: str) -> None:
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import asyncio
+from contextlib import AsyncExitStack
+from typing import Any
+
+import aioboto3
+from aiobotocore.config import AioConfig
+
+from app.config.settings import settings
+
+
+def signature_version() -> str:
+    """S3_SIGNATURE_VERSION, defaulting to SigV4; shared by the client and presigned URLs."""
+
+    return (settings.s3_signature_version or "").strip() or "s3v4"
+
+
+class S3ClientManager:
+    """Owns a single long-lived aiobotocore S3 client for the whole process.
+
+    Creating a client per operation costs botocore model loading plus a fresh
+    TLS handshake. The shared client keeps a bounded aiohttp connection pool
+    (S3_MAX_POOL_CONNECTIONS) so every storage call reuses warm connections.
+    """
+
+    def __init__(self) -> None:
+        self._session: aioboto3.Session | None = None
+        self._stack: AsyncExitStack | None = None
+        self._client: Any | None = None
+        self._lock: asyncio.Lock | None = None
+
+    def _build_config(self) -> AioConfig:
+        return AioConfig(
+            signature_version=signature_version(),
+            # Vietnix commonly prefers path-style; MinIO also works well with it.
+            s3={"addressing_style": "path"},
+            max_pool_connections=settings.s3_max_pool_connections,
+        )
+
+    async def start(self) -> None:
+        if self._client is not None:
+            return
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self._client is not None:
+                return
+            self._session = aioboto3.Session(
+                aws_access_key_id=settings.s3_access_key_id,
+                aws_secret_access_key=settings.s3_secret_access_key,
+                region_name=settings.s3_region or None,
+            )
+            stack = AsyncExitStack()
+            self._client = await stack.enter_async_context(
+                self._session.client(
+                    "s3",
+                    endpoint_url=str(settings.s3_endpoint_url) if settings.s3_endpoint_url else None,
+                    config=self._build_config(),
+                )
+            )
+            self._stack = stack
+
+    async def get_client(self) -> Any:
+        # Lazily start for callers outside the app lifecycle (scripts, scheduler jobs).
+        if self._client is None:
+            await self.start()
+        return self._client
+
+    async def close(self) -> None:
+        stack = self._stack
+        self._client = None
+        self._stack = None
+        self._session = None
+        self._lock = None
+        if stack is not None:
+            await stack.aclose()
+
+
+s3_clients = S3ClientManager()
@@ -1,29 +1,113 @@
 from __future__ import annotations
 
+import asyncio
+import logging
 import os
 from datetime import datetime
+from functools import lru_cache
+from collections.abc import AsyncIterator
+from typing import Any
+from urllib.parse import quote
 
-import aioboto3
 import boto3
 from botocore.config import Config
 
 from app.config.settings import settings
+from app.storage.presign_cache import PresignedUrlCache
+from app.storage.s3_client import S3ClientManager, s3_clients, signature_version
+from app.utils.metrics import S3_PRESIGN_SECONDS, S3_UPLOAD_SECONDS, timed
 
+logger = logging.getLogger(__name__)
 
-class S3Storage:
-    def __init__(self) -> None:
-        self._aiosession = aioboto3.Session(
-            aws_access_key_id=settings.s3_access_key_id,
-            aws_secret_access_key=settings.s3_secret_access_key,
-            region_name=settings.s3_region or None,
+# S3 rejects non-final parts smaller than 5 MiB.
+MIN_MULTIPART_PART_SIZE = 5 * 1024 * 1024
+# Upper bound on keys per DeleteObjects request.
+MAX_DELETE_OBJECTS_KEYS = 1000
+
+
+class MultipartUpload:
+    """One in-flight S3 multipart upload.
+
+    Parts may be uploaded concurrently and in any order; each part is retried
+    with exponential backoff. Callers must finish with complete() or abort().
+    """
+
+    def __init__(self, s3: Any, s3_key: str, upload_id: str, etags: dict[int, str] | None = None) -> None:
+        self._s3 = s3
+        self.s3_key = s3_key
+        self.upload_id = upload_id
+        self._etags: dict[int, str] = dict(etags or {})
+
+    @property
+    def etags(self) -> dict[int, str]:
+        return dict(self._etags)
+
+    async def upload_part(self, part_number: int, data: bytes) -> None:
+        attempts = max(1, settings.s3_multipart_max_attempts)
+        for attempt in range(1, attempts + 1):
+            try:
+                res = await self._s3.upload_part(
+                    Bucket=settings.s3_bucket,
+                    Key=self.s3_key,
+                    UploadId=self.upload_id,
+                    PartNumber=part_number,
+                    Body=data,
+                    ContentLength=len(data),
+                )
+            except Exception:
+                if attempt == attempts:
+                    raise
+                logger.warning("s3 upload_part %s failed (attempt %s/%s)", part_number, attempt, attempts)
+                await asyncio.sleep(0.5 * 2 ** (attempt - 1))
+            else:
+                self._etags[part_number] = res["ETag"]
+                return
+
+    async def complete(self) -> None:
+        parts = [{"PartNumber": n, "ETag": etag} for n, etag in sorted(self._etags.items())]
+        await self._s3.complete_multipart_upload(
+            Bucket=settings.s3_bucket,
+            Key=self.s3_key,
+            UploadId=self.upload_id,
+            MultipartUpload={"Parts": parts},
         )
-        signature_version = (settings.s3_signature_version or "").strip() or "s3v4"
-        # Vietnix commonly prefers path-style; MinIO also works well with it.
-        self._config = Config(signature_version=signature_version, s3={"addressing_style": "path"})
+
+    async def abort(self) -> None:
+        try:
+            await self._s3.abort_multipart_upload(Bucket=settings.s3_bucket, Key=self.s3_key, UploadId=self.upload_id)
+        except Exception:
+            # Best effort: a lifecycle rule on the bucket should reap anything left behind.
+            logger.exception("s3 abort_multipart_upload failed for %s", self.s3_key)
+
+
+class ObjectStream:
+    """Body of a GET object response, read incrementally from the pooled client."""
+
+    def __init__(self, body: Any, content_length: int) -> None:
+        self._body = body
+        self.content_length = content_length
+
+    async def iter_chunks(self, chunk_size: int) -> AsyncIterator[bytes]:
+        try:
+            while True:
+                chunk = await self._body.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        self._body.close()
+
+
+class S3Storage:
+    def __init__(self, clients: S3ClientManager | None = None) -> None:
+        self._clients = clients or s3_clients
 
     @staticmethod
     def from_depends() -> "S3Storage":
-        return S3Storage()
+        return _shared_storage()
 
     def build_key(self, file_id: str, filename: str, now: datetime) -> str:
         year = now.strftime("%Y")
@@ -31,55 +115,160 @@ class S3Storage:
         safe_name = os.path.basename(filename)
         return f"files/{year}/{month}/{file_id}/{safe_name}"
 
+    def multipart_enabled(self) -> bool:
+        # Providers flagged incompatible keep S3_UPLOAD_MODE=put.
+        return (settings.s3_upload_mode or "").strip().lower() == "multipart"
+
+    def multipart_part_size(self) -> int:
+        return max(MIN_MULTIPART_PART_SIZE, settings.s3_multipart_part_size_bytes)
+
+    async def create_multipart_upload(self, s3_key: str) -> MultipartUpload:
+        s3 = await self._clients.get_client()
+        res = await s3.create_multipart_upload(Bucket=settings.s3_bucket, Key=s3_key)
+        return MultipartUpload(s3, s3_key, res["UploadId"])
+
+    async def resume_multipart_upload(self, s3_key: str, upload_id: str, etags: dict[int, str]) -> MultipartUpload:
+        """Reattach to a multipart upload started by an earlier request (resumable uploads)."""
+
+        s3 = await self._clients.get_client()
+        return MultipartUpload(s3, s3_key, upload_id, etags)
+
+    @timed(S3_UPLOAD_SECONDS)
     async def upload_file(self, tmp_path: str, s3_key: str) -> None:
         file_size = os.path.getsize(tmp_path)
-        async with self._aiosession.client(
-            "s3",
-            endpoint_url=str(settings.s3_endpoint_url) if settings.s3_endpoint_url else None,
-            config=self._config,
-        ) as s3:
-            # Use PutObject streaming from disk.
-            # This avoids multipart compatibility issues and keeps memory usage low.
-            with open(tmp_path, "rb") as f:
-                await s3.put_object(
-                    Bucket=settings.s3_bucket,
-                    Key=s3_key,
-                    Body=f,
-                    ContentLength=file_size,
-                )
+        if self.multipart_enabled() and file_size > self.multipart_part_size():
+            await self._upload_file_multipart(tmp_path, s3_key, file_size)
+            return
+
+        s3 = await self._clients.get_client()
+        # Use PutObject streaming from disk.
+        # This avoids multipart compatibility issues and keeps memory usage low.
+        with open(tmp_path, "rb") as f:
+            await s3.put_object(
+                Bucket=settings.s3_bucket,
+                Key=s3_key,
+                Body=f,
+                ContentLength=file_size,
+            )
+
+    async def _upload_file_multipart(self, tmp_path: str, s3_key: str, file_size: int) -> None:
+        part_size = self.multipart_part_size()
+        # Bounds both in-flight requests and buffered part bytes (concurrency * part size).
+        sem = asyncio.Semaphore(max(1, settings.s3_multipart_concurrency))
+        upload = await self.create_multipart_upload(s3_key)
+
+        async def _send(part_number: int, offset: int) -> None:
+            async with sem:
+                data = await asyncio.to_thread(_read_range, tmp_path, offset, part_size)
+                await upload.upload_part(part_number, data)
+
+        tasks = [
+            asyncio.create_task(_send(i + 1, offset))
+            for i, offset in enumerate(range(0, file_size, part_size))
+        ]
+        try:
+            await asyncio.gather(*tasks)
+            await upload.complete()
+        except BaseException:
+            for t in tasks:
+                t.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await upload.abort()
+            raise
+
+    async def open_object(self, s3_key: str, start: int | None = None, end: int | None = None) -> ObjectStream:
+        """Start a GET for the object (or the inclusive byte range start..end) without reading the body."""
+
+        params: dict[str, Any] = {"Bucket": settings.s3_bucket, "Key": s3_key}
+        if start is not None:
+            params["Range"] = f"bytes={start}-{'' if end is None else end}"
+        s3 = await self._clients.get_client()
+        res = await s3.get_object(**params)
+        return ObjectStream(res["Body"], int(res.get("ContentLength") or 0))
 
     async def delete_object(self, s3_key: str) -> None:
-        async with self._aiosession.client(
-            "s3",
-            endpoint_url=str(settings.s3_endpoint_url) if settings.s3_endpoint_url else None,
-            config=self._config,
-        ) as s3:
-            await s3.delete_object(Bucket=settings.s3_bucket, Key=s3_key)
+        s3 = await self._clients.get_client()
+        await s3.delete_object(Bucket=settings.s3_bucket, Key=s3_key)
+
+    async def delete_objects(self, s3_keys: list[str]) -> list[str]:
+        """Delete up to MAX_DELETE_OBJECTS_KEYS keys in one request; returns the keys that failed."""
+
+        if not s3_keys:
+            return []
+        s3 = await self._clients.get_client()
+        try:
+            res = await s3.delete_objects(
+                Bucket=settings.s3_bucket,
+                Delete={"Objects": [{"Key": k} for k in s3_keys], "Quiet": True},
+            )
+        except Exception:
+            logger.warning("s3 delete_objects failed for %s keys", len(s3_keys), exc_info=True)
+            return list(s3_keys)
+        return [e["Key"] for e in res.get("Errors", []) if e.get("Key")]
 
     async def ensure_bucket(self) -> None:
-        async with self._aiosession.client(
-            "s3",
-            endpoint_url=str(settings.s3_endpoint_url) if settings.s3_endpoint_url else None,
-            config=self._config,
-        ) as s3:
-            try:
-                await s3.head_bucket(Bucket=settings.s3_bucket)
-            except Exception:
-                await s3.create_bucket(Bucket=settings.s3_bucket)
+        s3 = await self._clients.get_client()
+        try:
+            await s3.head_bucket(Bucket=settings.s3_bucket)
+        except Exception:
+            await s3.create_bucket(Bucket=settings.s3_bucket)
 
-    def create_presigned_download_url(self, s3_key: str) -> str:
+    @timed(S3_PRESIGN_SECONDS)
+    def create_presigned_download_url(self, s3_key: str, filename: str | None = None) -> str:
         # Presigned URLs cannot be infinite; /download/{slug} is the permanent URL.
-        presign_endpoint = settings.s3_presign_endpoint_url or settings.s3_endpoint_url
-        client = boto3.client(
-            "s3",
-            endpoint_url=str(presign_endpoint) if presign_endpoint else None,
-            aws_access_key_id=settings.s3_access_key_id,
-            aws_secret_access_key=settings.s3_secret_access_key,
-            region_name=settings.s3_region or None,
-            config=self._config,
-        )
-        return client.generate_presigned_url(
+        # Hot packs are served from the URL cache instead of being re-signed on every hit.
+        cache_key = f"{s3_key}\n{filename}" if filename else s3_key
+        return _presigned_urls().get_or_sign(cache_key, lambda: self._sign_download_url(s3_key, filename))
+
+    def _sign_download_url(self, s3_key: str, filename: str | None = None) -> str:
+        params = {"Bucket": settings.s3_bucket, "Key": s3_key}
+        if filename:
+            # Shared blobs are keyed by hash, so tell the browser the uploader's filename.
+            params["ResponseContentDisposition"] = content_disposition(filename)
+        return _presign_client().generate_presigned_url(
             ClientMethod="get_object",
-            Params={"Bucket": settings.s3_bucket, "Key": s3_key},
+            Params=params,
             ExpiresIn=settings.s3_presign_ttl_seconds,
         )
+
+
+def content_disposition(filename: str) -> str:
+    safe_name = os.path.basename(filename)
+    ascii_name = safe_name.encode("ascii", "replace").decode("ascii").replace('"', "").replace("?", "_")
+    return f"attachment; filename=\"{ascii_name}\"; filename*=UTF-8''{quote(safe_name)}"
+
+
+def _read_range(path: str, offset: int, length: int) -> bytes:
+    with open(path, "rb") as f:
+        f.seek(offset)
+        return f.read(length)
+
+
+@lru_cache(maxsize=1)
+def _presign_client():  # noqa: ANN202
+    # botocore loads the S3 service model on client construction; build it once per process.
+    presign_endpoint = settings.s3_presign_endpoint_url or settings.s3_endpoint_url
+    # Vietnix commonly prefers path-style; MinIO also works well with it.
+    return boto3.client(
+        "s3",
+        endpoint_url=str(presign_endpoint) if presign_endpoint else None,
+        aws_access_key_id=settings.s3_access_key_id,
+        aws_secret_access_key=settings.s3_secret_access_key,
+        region_name=settings.s3_region or None,
+        config=Config(signature_version=signature_version(), s3={"addressing_style": "path"}),
+    )
+
+
+@lru_cache(maxsize=1)
+def _presigned_urls() -> PresignedUrlCache:
+    return PresignedUrlCache(
+        ttl_seconds=settings.s3_presign_ttl_seconds,
+        refresh_margin_seconds=settings.s3_presign_cache_margin_seconds,
+        max_entries=settings.s3_presign_cache_max_entries,
+    )
+
+
+@lru_cache(maxsize=1)
+def _shared_storage() -> S3Storage:
+    # S3Storage is stateless apart from the shared client manager, so one instance serves all requests.
+    return S3Storage()
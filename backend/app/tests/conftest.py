@@ -10,12 +10,66 @@ from httpx import ASGITransport, AsyncClient
 
 from app.main import create_app
 from app.db.session import reset_engine
+from app.middleware.rate_limit import limiter
+from app.repositories.file_cache import file_cache
+from app.services.sketch_buffer import sketch_buffer
 from app.storage.s3_storage import S3Storage
 
 
+class FakeMultipartUpload:
+    def __init__(self, storage: "FakeS3Storage", s3_key: str) -> None:
+        self._storage = storage
+        self.s3_key = s3_key
+        self.upload_id = f"upload-{s3_key}"
+        self.parts: dict[int, bytes] = {}
+        self.aborted = False
+
+    @property
+    def etags(self) -> dict[int, str]:
+        return {n: f'"{n}-{len(data)}"' for n, data in self.parts.items()}
+
+    async def upload_part(self, part_number: int, data: bytes) -> None:
+        self.parts[part_number] = data
+
+    async def complete(self) -> None:
+        self._storage.objects[self.s3_key] = b"".join(self.parts[n] for n in sorted(self.parts))
+
+    async def abort(self) -> None:
+        self.aborted = True
+
+
+class FakeObjectStream:
+    def __init__(self, data: bytes) -> None:
+        self._data = data
+        self.content_length = len(data)
+
+    async def iter_chunks(self, chunk_size: int) -> AsyncIterator[bytes]:
+        for i in range(0, len(self._data), chunk_size):
+            yield self._data[i : i + chunk_size]
+
+
 class FakeS3Storage:
     def __init__(self) -> None:
         self.objects: dict[str, bytes] = {}
+        self.multipart = False
+        self.multipart_uploads: list[FakeMultipartUpload] = []
+        # key -> number of delete_objects calls that still report it as failed (-1: always)
+        self.failing_deletes: dict[str, int] = {}
+        self.delete_calls: list[list[str]] = []
+
+    def multipart_enabled(self) -> bool:
+        return self.multipart
+
+    def multipart_part_size(self) -> int:
+        return 5 * 1024 * 1024
+
+    async def create_multipart_upload(self, s3_key: str) -> FakeMultipartUpload:
+        upload = FakeMultipartUpload(self, s3_key)
+        self.multipart_uploads.append(upload)
+        return upload
+
+    async def resume_multipart_upload(self, s3_key: str, upload_id: str, etags: dict[int, str]) -> FakeMultipartUpload:
+        return next(u for u in self.multipart_uploads if u.upload_id == upload_id)
 
     def build_key(self, file_id: str, filename: str, now) -> str:  # noqa: ANN001
         return f"files/test/{file_id}/{filename}"
@@ -24,13 +78,31 @@ class FakeS3Storage:
         with open(tmp_path, "rb") as f:
             self.objects[s3_key] = f.read()
 
+    async def open_object(self, s3_key: str, start: int | None = None, end: int | None = None) -> FakeObjectStream:
+        data = self.objects[s3_key]
+        if start is not None:
+            data = data[start : None if end is None else end + 1]
+        return FakeObjectStream(data)
+
     async def delete_object(self, s3_key: str) -> None:
         self.objects.pop(s3_key, None)
 
+    async def delete_objects(self, s3_keys: list[str]) -> list[str]:
+        self.delete_calls.append(list(s3_keys))
+        failed = []
+        for key in s3_keys:
+            remaining = self.failing_deletes.get(key, 0)
+            if remaining:
+                self.failing_deletes[key] = remaining - 1 if remaining > 0 else remaining
+                failed.append(key)
+            else:
+                self.objects.pop(key, None)
+        return failed
+
     async def ensure_bucket(self) -> None:
         return
 
-    def create_presigned_download_url(self, s3_key: str) -> str:
+    def create_presigned_download_url(self, s3_key: str, filename: str | None = None) -> str:
         # Deterministic, not a real signed URL.
         return f"https://cdn.test.local/{s3_key}"
 
@@ -41,19 +113,25 @@ async def app() -> AsyncIterator:
     fd, path = tempfile.mkstemp(prefix="minecrox-test-", suffix=".db")
     os.close(fd)
     await reset_engine(f"sqlite+aiosqlite:///{path}")
+    # The limiter is module-global; don't let one test's uploads count against the next.
+    limiter.reset()
+    file_cache.clear()
+    sketch_buffer.clear()
 
     application = create_app()
 
     fake = FakeS3Storage()
     application.dependency_overrides[S3Storage.from_depends] = lambda: fake
+    application.state.fake_storage = fake
 
     async with LifespanManager(application):
         yield application
 
-    try:
-        os.remove(path)
-    except OSError:
-        pass
+    for suffix in ("", "-wal", "-shm"):
+        try:
+            os.remove(path + suffix)
+        except OSError:
+            pass
 
 
 @pytest.fixture
@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+from datetime import UTC, datetime
+
+from app.repositories.file_cache import FileSlugCache, _decode, _encode, payload_to_file
+
+
+def _payload(slug: str) -> dict:
+    now = datetime.now(UTC)
+    return {
+        "id": f"id-{slug}",
+        "slug": slug,
+        "filename": "pack.zip",
+        "download_count": 1,
+        "created_at": now,
+        "expire_at": now,
+        "last_download": None,
+    }
+
+
+async def test_cache_hit_miss_and_negative_entries(monkeypatch) -> None:
+    from app.config.settings import settings
+
+    monkeypatch.setattr(settings, "file_cache_ttl_seconds", 30)
+    monkeypatch.setattr(settings, "file_cache_negative_ttl_seconds", 5)
+    now = [0.0]
+    cache = FileSlugCache(clock=lambda: now[0])
+
+    assert await cache.get("a") == (False, None)
+    await cache.set("a", _payload("a"))
+    await cache.set("ghost", None)
+
+    found, payload = await cache.get("a")
+    assert found and payload["id"] == "id-a"
+    assert await cache.get("ghost") == (True, None)
+
+    now[0] = 6
+    assert await cache.get("ghost") == (False, None)
+    assert (await cache.get("a"))[0]
+
+    await cache.invalidate("a")
+    assert await cache.get("a") == (False, None)
+    assert cache.stats() == {"entries": 0, "hits": 2, "negative_hits": 1, "redis_hits": 0, "misses": 3}
+
+
+async def test_cache_is_lru_bounded(monkeypatch) -> None:
+    from app.config.settings import settings
+
+    monkeypatch.setattr(settings, "file_cache_max_entries", 2)
+    cache = FileSlugCache()
+    await cache.set("a", _payload("a"))
+    await cache.set("b", _payload("b"))
+    await cache.get("a")
+    await cache.set("c", _payload("c"))
+
+    assert (await cache.get("a"))[0]
+    assert not (await cache.get("b"))[0]
+
+
+def test_payload_round_trip() -> None:
+    payload = _payload("a")
+    assert _decode(_encode(payload)) == payload
+    assert _decode(_encode(None)) is None
+    assert payload_to_file(payload).slug == "a"
@@ -1,8 +1,11 @@
 from __future__ import annotations
 
+import hashlib
 import io
 import zipfile
 
+import pytest
+
 
 def _resource_pack_zip_bytes() -> bytes:
     buf = io.BytesIO()
@@ -65,3 +68,332 @@ async def test_upload_then_download_then_delete(client) -> None:
 
     r7 = await client.get(f"/api/v1/files/{slug}")
     assert r7.status_code == 404
+
+
+async def test_write_behind_download_counter(client, monkeypatch) -> None:
+    from app.config.settings import settings
+    from app.services.download_recorder import download_recorder
+
+    r = await client.post(
+        "/api/v1/uploads",
+        files={"upload": ("cool-pack.zip", _resource_pack_zip_bytes(), "application/zip")},
+    )
+    assert r.status_code == 200, r.text
+    slug = r.json()["slug"]
+
+    monkeypatch.setattr(settings, "download_write_behind_enabled", True)
+    for _ in range(3):
+        r2 = await client.get(f"/download/{slug}", follow_redirects=False)
+        assert r2.status_code == 302
+
+    # Nothing is committed until the buffer is flushed.
+    assert download_recorder.pending == 3
+    assert (await client.get(f"/api/v1/files/{slug}")).json()["download_count"] == 0
+
+    assert await download_recorder.flush() == 3
+    file_public = (await client.get(f"/api/v1/files/{slug}")).json()
+    assert file_public["download_count"] == 3
+    assert file_public["last_download"] is not None
+
+
+async def test_streaming_upload_to_multipart(app, client, monkeypatch) -> None:
+    from app.config.settings import settings
+
+    monkeypatch.setattr(settings, "upload_streaming_enabled", True)
+    fake = app.state.fake_storage
+    fake.multipart = True
+
+    zip_bytes = _resource_pack_zip_bytes()
+    r = await client.post("/api/v1/uploads", files={"upload": ("cool-pack.zip", zip_bytes, "application/zip")})
+    assert r.status_code == 200, r.text
+    assert r.json()["resource_pack"]["sha1"] == hashlib.sha1(zip_bytes).hexdigest()
+    assert list(fake.objects.values()) == [zip_bytes]
+
+    # A non-pack zip is rejected and its in-flight multipart upload aborted.
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as z:
+        z.writestr("readme.txt", "hi")
+    r2 = await client.post("/api/v1/uploads", files={"upload": ("x.zip", buf.getvalue(), "application/zip")})
+    assert r2.status_code == 400
+    assert fake.multipart_uploads[-1].aborted
+    assert len(fake.objects) == 1
+
+
+async def test_identical_uploads_share_one_object(app, client) -> None:
+    fake = app.state.fake_storage
+    zip_bytes = _resource_pack_zip_bytes()
+
+    uploads = []
+    for name in ("a.zip", "b.zip"):
+        r = await client.post("/api/v1/uploads", files={"upload": (name, zip_bytes, "application/zip")})
+        assert r.status_code == 200, r.text
+        uploads.append(r.json())
+    assert list(fake.objects.values()) == [zip_bytes]
+
+    first, second = uploads
+    r = await client.delete(f"/api/v1/files/{first['slug']}", headers={"X-Delete-Token": first["delete_token"]})
+    assert r.status_code == 204
+    assert len(fake.objects) == 1
+    assert (await client.get(f"/download/{second['slug']}", follow_redirects=False)).status_code == 302
+
+    r = await client.delete(f"/api/v1/files/{second['slug']}", headers={"X-Delete-Token": second["delete_token"]})
+    assert r.status_code == 204
+    assert fake.objects == {}
+
+
+async def test_streamed_duplicate_is_not_completed(app, client, monkeypatch) -> None:
+    from app.config.settings import settings
+
+    monkeypatch.setattr(settings, "upload_streaming_enabled", True)
+    fake = app.state.fake_storage
+    fake.multipart = True
+    zip_bytes = _resource_pack_zip_bytes()
+
+    for name in ("a.zip", "b.zip"):
+        r = await client.post("/api/v1/uploads", files={"upload": (name, zip_bytes, "application/zip")})
+        assert r.status_code == 200, r.text
+
+    assert len(fake.objects) == 1
+    assert [u.aborted for u in fake.multipart_uploads] == [False, True]
+
+
+async def test_failed_duplicate_keeps_the_shared_object(app, client, monkeypatch) -> None:
+    from sqlalchemy.exc import IntegrityError
+
+    from app.repositories.blob_repository import BlobRepository
+
+    fake = app.state.fake_storage
+    zip_bytes = _resource_pack_zip_bytes()
+    r = await client.post("/api/v1/uploads", files={"upload": ("a.zip", zip_bytes, "application/zip")})
+    assert r.status_code == 200, r.text
+    slug = r.json()["slug"]
+
+    # The second upload never sees the existing blob, so both of its commits conflict.
+    async def _no_blob(self, sha1_hash):  # noqa: ANN001, ANN202
+        return None
+
+    monkeypatch.setattr(BlobRepository, "acquire", _no_blob)
+    with pytest.raises(IntegrityError):
+        await client.post("/api/v1/uploads", files={"upload": ("b.zip", zip_bytes, "application/zip")})
+
+    assert list(fake.objects.values()) == [zip_bytes]
+    assert (await client.get(f"/download/{slug}", follow_redirects=False)).status_code == 302
+
+
+async def test_metrics_endpoint(client) -> None:
+    r = await client.post(
+        "/api/v1/uploads",
+        files={"upload": ("cool-pack.zip", _resource_pack_zip_bytes(), "application/zip")},
+    )
+    assert r.status_code == 200, r.text
+    await client.get(f"/download/{r.json()['slug']}", follow_redirects=False)
+
+    metrics = (await client.get("/metrics")).text
+    assert 'route="/download/{slug}"' in metrics
+    assert "minecrox_db_commit_duration_seconds_count" in metrics
+    assert "minecrox_zip_inspect_duration_seconds_count" in metrics
+    assert "minecrox_upload_bytes_total" in metrics
+    assert "minecrox_db_pool_connections" in metrics
+    assert "minecrox_temp_upload_dir_bytes" in metrics
+
+
+async def test_metrics_token(client, monkeypatch) -> None:
+    from app.config.settings import settings
+
+    monkeypatch.setattr(settings, "metrics_token", "s3cret")
+    assert (await client.get("/metrics")).status_code == 401
+    assert (await client.get("/metrics", headers={"Authorization": "Bearer wrong"})).status_code == 401
+    r = await client.get("/metrics", headers={"Authorization": "Bearer s3cret"})
+    assert r.status_code == 200
+    assert "minecrox_http_request" in r.text
+
+
+async def test_proxy_download_etag_range_and_head(client, monkeypatch) -> None:
+    from app.config.settings import settings
+
+    zip_bytes = _resource_pack_zip_bytes()
+    r = await client.post("/api/v1/uploads", files={"upload": ("cool-pack.zip", zip_bytes, "application/zip")})
+    assert r.status_code == 200, r.text
+    slug = r.json()["slug"]
+    monkeypatch.setattr(settings, "download_mode", "proxy")
+
+    full = await client.get(f"/download/{slug}")
+    assert full.status_code == 200
+    assert full.content == zip_bytes
+    etag = full.headers["etag"]
+    assert etag == f'"{hashlib.sha1(zip_bytes).hexdigest()}"'
+    assert full.headers["cache-control"] == settings.download_cache_control
+    assert full.headers["accept-ranges"] == "bytes"
+
+    cached = await client.get(f"/download/{slug}", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.content == b""
+
+    part = await client.get(f"/download/{slug}", headers={"Range": "bytes=10-19"})
+    assert part.status_code == 206
+    assert part.content == zip_bytes[10:20]
+    assert part.headers["content-range"] == f"bytes 10-19/{len(zip_bytes)}"
+
+    suffix = await client.get(f"/download/{slug}", headers={"Range": "bytes=-5"})
+    assert suffix.content == zip_bytes[-5:]
+
+    # A stale If-Range falls back to the full object.
+    stale = await client.get(f"/download/{slug}", headers={"Range": "bytes=0-3", "If-Range": '"old"'})
+    assert stale.status_code == 200 and stale.content == zip_bytes
+
+    bad = await client.get(f"/download/{slug}", headers={"Range": f"bytes={len(zip_bytes)}-"})
+    assert bad.status_code == 416
+    assert bad.headers["content-range"] == f"bytes */{len(zip_bytes)}"
+
+    head = await client.head(f"/download/{slug}")
+    assert head.status_code == 200
+    assert head.headers["content-length"] == str(len(zip_bytes))
+    assert head.content == b""
+
+    # full GET, 304 and the stale If-Range GET count; mid-file ranges, 416 and HEAD don't.
+    assert (await client.get(f"/api/v1/files/{slug}")).json()["download_count"] == 3
+
+
+async def test_proxy_download_served_from_disk_cache(app, client, tmp_path, monkeypatch) -> None:
+    from app.config.settings import settings
+    from app.storage.object_cache import object_cache
+
+    zip_bytes = _resource_pack_zip_bytes()
+    r = await client.post("/api/v1/uploads", files={"upload": ("cool-pack.zip", zip_bytes, "application/zip")})
+    assert r.status_code == 200, r.text
+    slug = r.json()["slug"]
+    monkeypatch.setattr(settings, "download_mode", "proxy")
+    monkeypatch.setattr(settings, "download_disk_cache_enabled", True)
+    monkeypatch.setattr(object_cache, "_root", str(tmp_path))
+    monkeypatch.setattr(object_cache, "_entries", None)
+
+    first = await client.get(f"/download/{slug}")
+    assert first.content == zip_bytes
+
+    # Served without touching S3 from now on.
+    app.state.fake_storage.objects.clear()
+    second = await client.get(f"/download/{slug}")
+    assert second.status_code == 200
+    assert second.content == zip_bytes
+    assert second.headers["etag"] == first.headers["etag"]
+
+    part = await client.get(f"/download/{slug}", headers={"Range": "bytes=4-7"})
+    assert part.status_code == 206
+    assert part.content == zip_bytes[4:8]
+
+
+async def test_daily_download_rollups(client, monkeypatch) -> None:
+    from app.config.settings import settings
+    from app.services.download_recorder import download_recorder
+    from app.services.sketch_buffer import sketch_buffer
+
+    r = await client.post(
+        "/api/v1/uploads",
+        files={"upload": ("cool-pack.zip", _resource_pack_zip_bytes(), "application/zip")},
+    )
+    assert r.status_code == 200, r.text
+    slug = r.json()["slug"]
+
+    await client.get(f"/download/{slug}", follow_redirects=False)
+    await client.get(f"/download/{slug}", follow_redirects=False, headers={"X-Forwarded-For": "203.0.113.9"})
+    # Write-behind flushes update the same rollup row.
+    monkeypatch.setattr(settings, "download_write_behind_enabled", True)
+    await client.get(f"/download/{slug}", follow_redirects=False)
+    await client.get(f"/download/{slug}", follow_redirects=False, headers={"X-Forwarded-For": "198.51.100.7"})
+    await download_recorder.flush()
+
+    assert (await client.get(f"/api/v1/analytics/files/{slug}")).json()["today_downloads"] == 4
+
+    # Unique visitors are buffered in memory until the sketch flush.
+    r2 = await client.get(f"/api/v1/analytics/files/{slug}/daily", params={"days": 7})
+    assert r2.json()["unique_visitors_estimate"] == 0
+    assert sketch_buffer.pending == 1
+    await sketch_buffer.flush()
+
+    r2 = await client.get(f"/api/v1/analytics/files/{slug}/daily", params={"days": 7})
+    assert r2.status_code == 200
+    days = r2.json()["days"]
+    assert len(days) == 7
+    assert [d["downloads"] for d in days] == [0, 0, 0, 0, 0, 0, 4]
+    assert days[-1]["unique_visitors"] == 3
+    assert r2.json()["unique_visitors_estimate"] == 3
+
+    assert (await client.get(f"/api/v1/analytics/files/{slug}/daily", params={"days": 0})).status_code == 422
+
+
+async def test_downloads_bump_expiry_once_per_bucket(client, monkeypatch) -> None:
+    from app.config.settings import settings
+    from app.services.download_recorder import download_recorder
+
+    # A full day per bucket: both download paths land in the bucket the upload already set.
+    monkeypatch.setattr(settings, "file_expire_granularity_seconds", 86400)
+    r = await client.post(
+        "/api/v1/uploads",
+        files={"upload": ("cool-pack.zip", _resource_pack_zip_bytes(), "application/zip")},
+    )
+    assert r.status_code == 200, r.text
+    slug = r.json()["slug"]
+    expire_at = (await client.get(f"/api/v1/files/{slug}")).json()["expire_at"]
+    assert "T00:00:00" in expire_at
+
+    assert (await client.get(f"/download/{slug}", follow_redirects=False)).status_code == 302
+    monkeypatch.setattr(settings, "download_write_behind_enabled", True)
+    assert (await client.get(f"/download/{slug}", follow_redirects=False)).status_code == 302
+    await download_recorder.flush()
+
+    file_public = (await client.get(f"/api/v1/files/{slug}")).json()
+    assert file_public["download_count"] == 2
+    assert file_public["expire_at"] == expire_at
+
+
+async def test_batch_upload_reports_each_file(app, client) -> None:
+    fake = app.state.fake_storage
+    zip_bytes = _resource_pack_zip_bytes()
+    files = [
+        ("upload", ("a.zip", zip_bytes, "application/zip")),
+        ("upload", ("notes.txt", b"hello", "text/plain")),
+        ("upload", ("b.zip", zip_bytes, "application/zip")),
+        ("upload", ("broken.zip", b"not a zip", "application/zip")),
+    ]
+    r = await client.post("/api/v1/uploads/batch", files=files)
+    assert r.status_code == 200, r.text
+
+    results = r.json()["results"]
+    assert [(x["filename"], x["status_code"]) for x in results] == [
+        ("a.zip", 201),
+        ("notes.txt", 400),
+        ("b.zip", 201),
+        ("broken.zip", 400),
+    ]
+    assert results[1]["file"] is None and results[1]["error"]
+    # Both copies of the same pack share one stored object.
+    assert list(fake.objects.values()) == [zip_bytes]
+    for item in (results[0], results[2]):
+        assert item["file"]["resource_pack"]["sha1"] == hashlib.sha1(zip_bytes).hexdigest()
+        slug = item["file"]["slug"]
+        assert (await client.get(f"/download/{slug}", follow_redirects=False)).status_code == 302
+
+
+async def test_batch_body_is_capped_without_content_length(app, client, monkeypatch) -> None:
+    from app.config.settings import settings
+
+    monkeypatch.setattr(settings, "max_upload_bytes", 64 * 1024)
+    monkeypatch.setattr(settings, "upload_batch_max_files", 1)
+    zip_bytes = _resource_pack_zip_bytes()
+
+    async def body():  # noqa: ANN202
+        yield (
+            b'--b\r\nContent-Disposition: form-data; name="upload"; filename="a.zip"\r\n\r\n'
+            + zip_bytes
+            + b'\r\n--b\r\nContent-Disposition: form-data; name="upload"; filename="b.zip"\r\n\r\n'
+        )
+        # The extra part is past UPLOAD_BATCH_MAX_FILES and only skipped, but still counts.
+        for _ in range(16):
+            yield b"x" * 8192
+        yield b"\r\n--b--\r\n"
+
+    r = await client.post(
+        "/api/v1/uploads/batch", content=body(), headers={"content-type": "multipart/form-data; boundary=b"}
+    )
+    assert r.status_code == 413
+    assert app.state.fake_storage.objects == {}
@@ -0,0 +1,206 @@
+from __future__ import annotations
+
+import asyncio
+from datetime import UTC, datetime, timedelta
+
+from sqlalchemy import func, select
+
+from app.db import session as db_session
+from app.models.file import File
+from app.models.pending_object_delete import PendingObjectDelete
+from app.services.maintenance_service import MaintenanceService
+
+
+def _file(i: int, expire_at: datetime) -> File:
+    return File(
+        id=f"file-{i:03d}",
+        filename=f"{i}.zip",
+        slug=f"slug-{i:03d}",
+        file_type="resource_pack",
+        file_size=3,
+        s3_key=f"files/test/{i}.zip",
+        sha1_hash=f"{i:040d}",
+        download_count=0,
+        created_at=expire_at,
+        expire_at=expire_at,
+        uploader_ip_hash="ip",
+        delete_token_hash="x",
+    )
+
+
+async def test_cleanup_pages_through_backlog_and_queues_failed_keys(app, monkeypatch) -> None:
+    from app.config.settings import settings
+
+    fake = app.state.fake_storage
+    monkeypatch.setattr(settings, "cleanup_batch_size", 4)
+    monkeypatch.setattr(settings, "cleanup_delete_max_attempts", 2)
+    monkeypatch.setattr("app.services.maintenance_service.DELETE_RETRY_BACKOFF_SECONDS", 0)
+
+    past = datetime.now(UTC) - timedelta(days=1)
+    assert db_session.SessionLocal is not None
+    async with db_session.SessionLocal() as session:
+        for i in range(10):
+            session.add(_file(i, past + timedelta(seconds=i)))
+            fake.objects[f"files/test/{i}.zip"] = b"zip"
+        session.add(_file(99, datetime.now(UTC) + timedelta(days=1)))
+        fake.objects["files/test/99.zip"] = b"zip"
+        await session.commit()
+
+    fake.failing_deletes["files/test/2.zip"] = 1  # transient: succeeds on retry
+    fake.failing_deletes["files/test/5.zip"] = -1  # keeps failing
+
+    async with db_session.SessionLocal() as session:
+        deleted = await MaintenanceService(session=session, storage=fake).cleanup_expired_files()
+
+    assert deleted == 10
+    # 3 batches (4 + 4 + 2 rows), plus one retry each for the failing keys.
+    assert len(fake.delete_calls) == 5
+    assert sorted(fake.objects) == ["files/test/5.zip", "files/test/99.zip"]
+    async with db_session.SessionLocal() as session:
+        ids = (await session.execute(select(File.id).order_by(File.id))).scalars().all()
+        assert ids == ["file-099"]
+        # The row is gone; its object waits for the next run.
+        pending = (await session.execute(select(PendingObjectDelete))).scalars().all()
+        assert [(p.s3_key, p.attempts) for p in pending] == [("files/test/5.zip", 1)]
+
+    fake.failing_deletes.clear()
+    async with db_session.SessionLocal() as session:
+        assert await MaintenanceService(session=session, storage=fake).retry_object_deletes() == 1
+        assert (await session.execute(select(func.count()).select_from(PendingObjectDelete))).scalar_one() == 0
+    assert sorted(fake.objects) == ["files/test/99.zip"]
+
+
+async def test_prune_download_logs_in_chunks(app, monkeypatch) -> None:
+    from app.config.settings import settings
+    from app.models.download import Download
+
+    monkeypatch.setattr(settings, "download_log_retention_days", 30)
+    monkeypatch.setattr(settings, "download_prune_chunk_rows", 3)
+    monkeypatch.setattr(settings, "download_prune_pause_seconds", 0)
+
+    now = datetime.now(UTC)
+    assert db_session.SessionLocal is not None
+    async with db_session.SessionLocal() as session:
+        session.add(_file(1, now + timedelta(days=1)))
+        for i in range(10):
+            # Mostly old rows, with recent ones interleaved inside the id range.
+            ts = now - timedelta(days=60 if i % 4 else 1)
+            session.add(Download(file_id="file-001", ip_hash="ip", timestamp=ts))
+        await session.commit()
+
+    async with db_session.SessionLocal() as session:
+        pruned = await MaintenanceService(session=session, storage=app.state.fake_storage).prune_download_logs()
+
+    assert pruned == 7
+    async with db_session.SessionLocal() as session:
+        remaining = (await session.execute(select(func.count()).select_from(Download))).scalar_one()
+        assert remaining == 3
+
+
+def test_partition_names_round_trip() -> None:
+    from datetime import date
+
+    from app.db.partitions import partition_day, partition_name, partitioning_enabled
+
+    assert partition_name(date(2026, 3, 7)) == "downloads_p20260307"
+    assert partition_day("downloads_p20260307") == date(2026, 3, 7)
+    assert partition_day("downloads_default") is None
+    assert not partitioning_enabled("sqlite")
+
+
+async def test_backfill_download_rollups_from_log(app) -> None:
+    from app.models.download import Download
+    from app.repositories.download_daily_repository import DownloadDailyRepository
+    from app.utils.hll import HyperLogLog
+
+    now = datetime.now(UTC)
+    yesterday, earlier = now - timedelta(days=1), now - timedelta(days=2)
+    assert db_session.SessionLocal is not None
+    async with db_session.SessionLocal() as session:
+        session.add(_file(1, now + timedelta(days=5)))
+        for ip, ts in (("a", yesterday), ("a", yesterday), ("b", yesterday), ("c", earlier), ("d", now)):
+            session.add(Download(file_id="file-001", ip_hash=ip, timestamp=ts))
+        await session.commit()
+        # Live downloads already counted part of "earlier" and sketched one of yesterday's visitors.
+        rollups = DownloadDailyRepository(session)
+        await rollups.increment("file-001", earlier.date(), 5)
+        live = HyperLogLog()
+        live.add("z")
+        await rollups.merge_sketch("file-001", yesterday.date(), live)
+        await session.commit()
+
+    async with db_session.SessionLocal() as session:
+        svc = MaintenanceService(session=session, storage=app.state.fake_storage)
+        assert await svc.backfill_download_rollups() == 1
+        # Safe to re-run.
+        assert await svc.backfill_download_rollups() == 0
+        rollups = DownloadDailyRepository(session)
+        assert (await rollups.get("file-001", yesterday.date())).count == 3
+        assert (await rollups.get("file-001", earlier.date())).count == 5
+        # Today is counted live, not backfilled.
+        assert await rollups.get("file-001", now.date()) is None
+        daily, _ = await rollups.unique_estimates("file-001", earlier.date(), yesterday.date())
+        assert daily == {earlier.date(): 1, yesterday.date(): 3}
+
+
+async def test_merge_sketch_is_idempotent(app) -> None:
+    from app.repositories.download_daily_repository import DownloadDailyRepository
+    from app.utils.hll import HyperLogLog
+
+    today = datetime.now(UTC).date()
+    assert db_session.SessionLocal is not None
+    async with db_session.SessionLocal() as session:
+        session.add(_file(1, datetime.now(UTC) + timedelta(days=1)))
+        await session.commit()
+
+    first, second = HyperLogLog(), HyperLogLog()
+    first.update(["a", "b"])
+    second.update(["b", "c"])
+    async with db_session.SessionLocal() as session:
+        rollups = DownloadDailyRepository(session)
+        # A retried flush merges the same registers twice.
+        for sketch in (first, second, second):
+            await rollups.merge_sketch("file-001", today, sketch)
+        await session.commit()
+        _, unique = await rollups.unique_estimates("file-001", today, today)
+        assert unique == 3
+
+
+async def test_cleanup_overlaps_delete_objects_calls(app, monkeypatch) -> None:
+    from app.config.settings import settings
+
+    fake = app.state.fake_storage
+    monkeypatch.setattr(settings, "cleanup_batch_size", 2)
+    monkeypatch.setattr(settings, "cleanup_delete_concurrency", 3)
+
+    past = datetime.now(UTC) - timedelta(days=1)
+    assert db_session.SessionLocal is not None
+    async with db_session.SessionLocal() as session:
+        for i in range(8):
+            session.add(_file(i, past + timedelta(seconds=i)))
+            fake.objects[f"files/test/{i}.zip"] = b"zip"
+        await session.commit()
+
+    in_flight = peak = 0
+    delete_objects = fake.delete_objects
+
+    async def slow_delete_objects(s3_keys: list[str]) -> list[str]:
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        try:
+            await asyncio.sleep(0.05)
+            return await delete_objects(s3_keys)
+        finally:
+            in_flight -= 1
+
+    monkeypatch.setattr(fake, "delete_objects", slow_delete_objects)
+    async with db_session.SessionLocal() as session:
+        assert await MaintenanceService(session=session, storage=fake).cleanup_expired_files() == 8
+
+    # One DeleteObjects per 2-row batch, with the next batches' rows deleted meanwhile.
+    assert len(fake.delete_calls) == 4
+    assert 1 < peak <= 3
+    assert fake.objects == {}
+    async with db_session.SessionLocal() as session:
+        assert (await session.execute(select(func.count()).select_from(PendingObjectDelete))).scalar_one() == 0
@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from app.utils.multipart import MultipartUploadReader
+
+_BOUNDARY = "testboundary"
+
+
+def _body(*parts: tuple[str, str | None, bytes]) -> bytes:
+    out = b""
+    for name, filename, data in parts:
+        disposition = f'form-data; name="{name}"' + (f'; filename="{filename}"' if filename else "")
+        out += f"--{_BOUNDARY}\r\nContent-Disposition: {disposition}\r\n\r\n".encode() + data + b"\r\n"
+    return out + f"--{_BOUNDARY}--\r\n".encode()
+
+
+def _request(body: bytes, piece: int = 7) -> Request:
+    chunks = [body[i : i + piece] for i in range(0, len(body), piece)]
+
+    async def receive() -> dict:
+        chunk = chunks.pop(0) if chunks else b""
+        return {"type": "http.request", "body": chunk, "more_body": bool(chunks)}
+
+    scope = {
+        "type": "http",
+        "method": "POST",
+        "path": "/",
+        "headers": [(b"content-type", f"multipart/form-data; boundary={_BOUNDARY}".encode())],
+    }
+    return Request(scope, receive)
+
+
+async def test_fields_before_file_then_streamed_file() -> None:
+    payload = bytes(range(256)) * 40
+    body = _body(("captcha_token", None, b"tok"), ("upload", "pack.zip", payload), ("note", None, b"after"))
+    reader = MultipartUploadReader(_request(body), file_field="upload", max_file_bytes=len(payload))
+
+    assert await reader.read_until_file()
+    assert reader.fields == {"captcha_token": "tok"}
+    assert reader.filename == "pack.zip"
+
+    chunks = [c async for c in reader.file_chunks(1024)]
+    assert b"".join(chunks) == payload
+    assert all(len(c) >= 1024 for c in chunks[:-1])
+    assert not await reader.read_until_file()
+    assert reader.fields == {"captcha_token": "tok", "note": "after"}
+
+
+async def test_several_file_parts() -> None:
+    body = _body(("upload", "a.zip", b"a" * 30), ("upload", "b.zip", b"b" * 30), ("upload", "c.zip", b"c"))
+    reader = MultipartUploadReader(_request(body), file_field="upload", max_file_bytes=100)
+
+    assert await reader.read_until_file()
+    assert reader.filename == "a.zip"
+    # Only part of the first file is read; the rest is skipped.
+    async for _ in reader.file_chunks(8):
+        break
+    assert await reader.read_until_file()
+    assert reader.filename == "b.zip"
+    assert b"".join([c async for c in reader.file_chunks(8)]) == b"b" * 30
+    assert await reader.read_until_file()
+    assert b"".join([c async for c in reader.file_chunks(8)]) == b"c"
+    assert not await reader.read_until_file()
+
+
+async def test_file_size_is_enforced_while_reading() -> None:
+    reader = MultipartUploadReader(
+        _request(_body(("upload", "pack.zip", b"x" * 100))), file_field="upload", max_file_bytes=50
+    )
+    assert await reader.read_until_file()
+    with pytest.raises(HTTPException) as exc:
+        async for _ in reader.file_chunks(16):
+            pass
+    assert exc.value.status_code == 413
+
+
+async def test_missing_file_part() -> None:
+    body = _body(("captcha_token", None, b"tok"))
+    reader = MultipartUploadReader(_request(body), file_field="upload", max_file_bytes=10)
+    assert not await reader.read_until_file()
+
+
+async def test_upload_requires_captcha_before_the_file(app, client, monkeypatch) -> None:
+    from app.config.settings import settings
+    from app.utils import turnstile
+    from app.utils.turnstile import TurnstileVerifier
+
+    monkeypatch.setattr(settings, "turnstile_enabled", True)
+    monkeypatch.setattr(settings, "turnstile_secret_key", None)
+    monkeypatch.setattr(settings, "turnstile_expected_hostname", None)
+    monkeypatch.setattr(settings, "turnstile_stub_enabled", True)
+    verifier = TurnstileVerifier()
+    monkeypatch.setattr(turnstile, "turnstile_verifier", verifier)
+    zip_bytes = _zip()
+
+    content_type = {"content-type": f"multipart/form-data; boundary={_BOUNDARY}"}
+    first = _body(("captcha_token", None, b"fail-bot"), ("upload", "pack.zip", zip_bytes))
+    r = await client.post("/api/v1/uploads", content=first, headers=content_type)
+    assert r.status_code == 400
+
+    last = _body(("upload", "pack.zip", zip_bytes), ("captcha_token", None, b"human"))
+    r = await client.post("/api/v1/uploads", content=last, headers=content_type)
+    assert r.status_code == 400
+    assert r.json()["detail"] == "Missing captcha_token"
+    assert app.state.fake_storage.objects == {}
+
+    ok = _body(("captcha_token", None, b"human"), ("upload", "pack.zip", zip_bytes))
+    r = await client.post("/api/v1/uploads", content=ok, headers=content_type)
+    assert r.status_code == 200, r.text
+    await verifier.close()
+
+
+def _zip() -> bytes:
+    import io
+    import zipfile
+
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as z:
+        z.writestr("pack.mcmeta", "{}")
+        z.writestr("assets/minecraft/lang/en_us.json", "{}")
+    return buf.getvalue()
@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+from limits import parse
+from limits.storage import MemoryStorage
+
+from app.config.settings import settings
+from app.middleware.rate_limit import LeasedFixedWindowRateLimiter
+from app.utils.metrics import RATE_LIMIT_CHECKS
+
+
+def _shared_checks() -> float:
+    return RATE_LIMIT_CHECKS.labels("shared")._value.get()
+
+
+def test_leases_never_exceed_the_shared_limit(monkeypatch) -> None:
+    monkeypatch.setattr(settings, "rate_limit_workers", 2)
+    storage = MemoryStorage()
+    # Two workers on one counter store.
+    workers = [LeasedFixedWindowRateLimiter(storage), LeasedFixedWindowRateLimiter(storage)]
+    item = parse("30/minute")
+
+    allowed = sum(workers[i % 2].hit(item, "client", "/download") for i in range(100))
+    assert allowed <= 30
+    # Leases only go out while the counter is at most half used.
+    assert allowed >= 30 - 2 * int(30 * 0.1)
+
+
+def test_unused_leases_refuse_at_most_workers_x_lease_early(monkeypatch) -> None:
+    monkeypatch.setattr(settings, "rate_limit_workers", 4)
+    storage = MemoryStorage()
+    # Four workers behind round-robin, each holding part of a lease when the client stops.
+    workers = [LeasedFixedWindowRateLimiter(storage) for _ in range(4)]
+    item = parse("30/minute")
+
+    allowed = [workers[i % 4].hit(item, "client", "/download") for i in range(30)]
+    assert sum(allowed) <= 30
+    assert sum(allowed) >= 30 - 4 * (int(30 * 0.1) - 1)
+
+
+def test_limits_too_small_for_the_worker_count_are_not_leased(monkeypatch) -> None:
+    # 30 < 2 x 8 workers x 3-token lease: every hit is counted on the shared counter.
+    monkeypatch.setattr(settings, "rate_limit_workers", 8)
+    storage = MemoryStorage()
+    workers = [LeasedFixedWindowRateLimiter(storage) for _ in range(8)]
+    item = parse("30/minute")
+
+    allowed = [workers[i % 8].hit(item, "client", "/download") for i in range(31)]
+    assert allowed == [True] * 30 + [False]
+    assert storage.get(item.key_for("client", "/download")) == 31
+
+
+def test_under_limit_hits_skip_the_shared_counter() -> None:
+    limiter = LeasedFixedWindowRateLimiter(MemoryStorage())
+    item = parse("30/minute")
+
+    before = _shared_checks()
+    assert all(limiter.hit(item, "client", "/download") for _ in range(3))
+    # One reservation of 3 tokens serves all three hits.
+    assert _shared_checks() - before == 1
+    assert limiter.storage.get(item.key_for("client", "/download")) == 3
+
+
+def test_small_limits_are_counted_exactly() -> None:
+    limiter = LeasedFixedWindowRateLimiter(MemoryStorage())
+    item = parse("3/hour")
+
+    assert [limiter.hit(item, "client", "/uploads") for _ in range(4)] == [True, True, True, False]
+    assert limiter.storage.get(item.key_for("client", "/uploads")) == 4
+
+
+async def test_limits_follow_forwarded_client(client, monkeypatch) -> None:
+    from app.middleware.rate_limit import limiter
+
+    monkeypatch.setattr(limiter, "enabled", True)
+    for _ in range(30):
+        r = await client.get("/download/missing", headers={"X-Forwarded-For": "203.0.113.7"})
+        assert r.status_code == 404
+    r = await client.get("/download/missing", headers={"X-Forwarded-For": "203.0.113.7"})
+    assert r.status_code == 429
+
+    # Same proxy peer, different client.
+    r = await client.get("/download/missing", headers={"X-Forwarded-For": "203.0.113.8"})
+    assert r.status_code == 404
@@ -0,0 +1,237 @@
+from __future__ import annotations
+
+import hashlib
+import os
+
+import pytest
+
+from app.storage import object_cache as object_cache_module
+from app.storage.object_cache import DiskObjectCache
+from app.storage.presign_cache import PresignedUrlCache
+from app.storage.s3_client import S3ClientManager
+from app.storage.s3_storage import S3Storage
+
+
+async def test_s3_client_manager_reuses_single_client() -> None:
+    manager = S3ClientManager()
+    first = await manager.get_client()
+    second = await manager.get_client()
+    assert first is second
+
+    await manager.close()
+    third = await manager.get_client()
+    assert third is not first
+    await manager.close()
+
+
+def test_storage_dependency_is_shared() -> None:
+    assert S3Storage.from_depends() is S3Storage.from_depends()
+
+
+def test_presigned_url_cache_reuses_until_margin() -> None:
+    now = [0.0]
+    signed: list[str] = []
+
+    def sign() -> str:
+        signed.append("x")
+        return f"url-{len(signed)}"
+
+    cache = PresignedUrlCache(ttl_seconds=600, refresh_margin_seconds=300, max_entries=10, clock=lambda: now[0])
+    assert cache.get_or_sign("k", sign) == "url-1"
+    now[0] = 299
+    assert cache.get_or_sign("k", sign) == "url-1"
+    now[0] = 300
+    assert cache.get_or_sign("k", sign) == "url-2"
+
+
+def test_presigned_url_cache_is_bounded() -> None:
+    cache = PresignedUrlCache(ttl_seconds=600, refresh_margin_seconds=60, max_entries=2)
+    for key in ("a", "b", "c"):
+        cache.get_or_sign(key, lambda key=key: key)
+    assert len(cache) == 2
+    assert cache.get_or_sign("a", lambda: "a2") == "a2"
+
+
+class _FakeMultipartS3:
+    def __init__(self, fail_parts: dict[int, int] | None = None) -> None:
+        self.fail_parts = dict(fail_parts or {})
+        self.parts: dict[int, bytes] = {}
+        self.completed: list[int] | None = None
+        self.aborted = False
+
+    async def create_multipart_upload(self, **kwargs):  # noqa: ANN003, ANN201
+        return {"UploadId": "u1"}
+
+    async def upload_part(self, PartNumber: int, Body: bytes, **kwargs):  # noqa: ANN003, ANN201, N803
+        if self.fail_parts.get(PartNumber, 0) > 0:
+            self.fail_parts[PartNumber] -= 1
+            raise ConnectionError("flaky")
+        self.parts[PartNumber] = Body
+        return {"ETag": f"etag-{PartNumber}"}
+
+    async def complete_multipart_upload(self, MultipartUpload: dict, **kwargs) -> None:  # noqa: ANN003, N803
+        self.completed = [p["PartNumber"] for p in MultipartUpload["Parts"]]
+
+    async def abort_multipart_upload(self, **kwargs) -> None:  # noqa: ANN003
+        self.aborted = True
+
+
+class _FakeClients:
+    def __init__(self, s3: _FakeMultipartS3) -> None:
+        self._s3 = s3
+
+    async def get_client(self) -> _FakeMultipartS3:
+        return self._s3
+
+
+def _multipart_settings(monkeypatch, attempts: int) -> None:  # noqa: ANN001
+    from app.config.settings import settings
+
+    monkeypatch.setattr(settings, "s3_upload_mode", "multipart")
+    monkeypatch.setattr(settings, "s3_multipart_part_size_bytes", 5 * 1024 * 1024)
+    monkeypatch.setattr(settings, "s3_multipart_max_attempts", attempts)
+
+
+async def test_multipart_upload_retries_parts(tmp_path, monkeypatch) -> None:
+    _multipart_settings(monkeypatch, attempts=2)
+    data = bytes(range(256)) * (12 * 1024 * 1024 // 256)
+    path = tmp_path / "big.zip"
+    path.write_bytes(data)
+
+    s3 = _FakeMultipartS3(fail_parts={2: 1})
+    await S3Storage(clients=_FakeClients(s3)).upload_file(str(path), "files/big.zip")  # type: ignore[arg-type]
+
+    assert s3.completed == [1, 2, 3]
+    assert b"".join(s3.parts[n] for n in s3.completed) == data
+    assert not s3.aborted
+
+
+async def test_multipart_upload_aborts_on_failure(tmp_path, monkeypatch) -> None:
+    _multipart_settings(monkeypatch, attempts=1)
+    path = tmp_path / "big.zip"
+    path.write_bytes(b"x" * (11 * 1024 * 1024))
+
+    s3 = _FakeMultipartS3(fail_parts={3: 1})
+    with pytest.raises(ConnectionError):
+        await S3Storage(clients=_FakeClients(s3)).upload_file(str(path), "files/big.zip")  # type: ignore[arg-type]
+
+    assert s3.aborted
+    assert s3.completed is None
+
+
+async def _fill(cache: DiskObjectCache, sha1: str, data: bytes) -> bytes:
+    async def chunks():
+        for i in range(0, len(data), 4):
+            yield data[i : i + 4]
+
+    return b"".join([c async for c in cache.fill(sha1, len(data), chunks())])
+
+
+async def test_object_cache_verifies_and_evicts_cold_entries(tmp_path, monkeypatch) -> None:
+    from app.config.settings import settings
+
+    monkeypatch.setattr(settings, "download_disk_cache_enabled", True)
+    monkeypatch.setattr(settings, "download_disk_cache_max_bytes", 20)
+    monkeypatch.setattr(settings, "download_disk_cache_half_life_seconds", 10)
+    now = [0.0]
+    cache = DiskObjectCache(root=str(tmp_path), clock=lambda: now[0])
+    blobs = {name: name.encode() * 8 for name in ("a", "b", "c")}
+    sha = {name: hashlib.sha1(data).hexdigest() for name, data in blobs.items()}
+
+    # A copy that doesn't match the expected SHA-1 is passed through but never admitted.
+    assert await _fill(cache, sha["a"], blobs["b"]) == blobs["b"]
+    assert await cache.lookup(sha["a"]) is None
+
+    assert await _fill(cache, sha["a"], blobs["a"]) == blobs["a"]
+    assert await _fill(cache, sha["b"], blobs["b"]) == blobs["b"]
+    for _ in range(3):
+        assert await cache.lookup(sha["a"]) is not None
+
+    # Over budget: "b" (1 hit) goes before "a" (4 hits).
+    now[0] = 1
+    await _fill(cache, sha["c"], blobs["c"])
+    assert await cache.lookup(sha["b"]) is None
+    assert await cache.lookup(sha["a"]) is not None
+
+    # Much later, a's hits have decayed below the fresh entry's.
+    now[0] = 100
+    await cache.lookup(sha["c"])
+    await _fill(cache, sha["b"], blobs["b"])
+    assert await cache.lookup(sha["a"]) is None
+    assert cache.bytes <= 20
+
+    # Reloaded from disk, entries are served from S3 until re-hashed in the background,
+    # and corrupt copies are dropped.
+    with open(cache.path_for(sha["c"]), "wb") as f:
+        f.write(b"tampered")
+    reloaded = DiskObjectCache(root=str(tmp_path))
+    assert await reloaded.lookup(sha["c"]) is None
+    assert await reloaded.lookup(sha["b"]) is None
+    await reloaded.wait_verified()
+    assert await reloaded.lookup(sha["c"]) is None
+    assert not os.path.exists(cache.path_for(sha["c"]))
+    assert await reloaded.lookup(sha["b"]) == cache.path_for(sha["b"])
+
+
+async def test_object_cache_rescans_only_when_full_or_stale(tmp_path, monkeypatch) -> None:
+    from app.config.settings import settings
+
+    monkeypatch.setattr(settings, "download_disk_cache_enabled", True)
+    monkeypatch.setattr(settings, "download_disk_cache_max_bytes", 20)
+    cache = DiskObjectCache(root=str(tmp_path))
+    scans = 0
+    scan = cache._scan
+
+    def counting_scan():  # noqa: ANN202
+        nonlocal scans
+        scans += 1
+        return scan()
+
+    monkeypatch.setattr(cache, "_scan", counting_scan)
+    blobs = {name: name.encode() * 8 for name in ("a", "b", "c")}
+    sha = {name: hashlib.sha1(data).hexdigest() for name, data in blobs.items()}
+
+    # Under budget: only the initial scan, however many fills.
+    await _fill(cache, sha["a"], blobs["a"])
+    await _fill(cache, sha["b"], blobs["b"])
+    assert scans == 1
+    # Full by this worker's own count: rescan before evicting.
+    await _fill(cache, sha["c"], blobs["c"])
+    assert scans == 2
+    assert cache.bytes <= 20
+
+
+async def test_object_cache_budget_is_shared_by_workers(tmp_path, monkeypatch) -> None:
+    from app.config.settings import settings
+
+    monkeypatch.setattr(settings, "download_disk_cache_enabled", True)
+    monkeypatch.setattr(settings, "download_disk_cache_max_bytes", 20)
+    # Rescan on every admit, so each worker sees the other's fills right away.
+    monkeypatch.setattr(object_cache_module, "_RESCAN_SECONDS", 0)
+    # Two workers on one directory.
+    first, second = DiskObjectCache(root=str(tmp_path)), DiskObjectCache(root=str(tmp_path))
+    blobs = {name: name.encode() * 8 for name in ("a", "b", "c")}
+    sha = {name: hashlib.sha1(data).hexdigest() for name, data in blobs.items()}
+
+    await first.lookup(sha["a"])
+    await second.lookup(sha["a"])
+    await _fill(first, sha["a"], blobs["a"])
+    await _fill(second, sha["b"], blobs["b"])
+    await _fill(first, sha["c"], blobs["c"])
+    on_disk = [p for p in tmp_path.rglob("*.zip")]
+    assert sum(p.stat().st_size for p in on_disk) <= 20
+
+    # A copy filled by the other worker is served here too, once checked.
+    assert await second.lookup(sha["c"]) is None
+    await second.wait_verified()
+    assert await second.lookup(sha["c"]) == first.path_for(sha["c"])
+
+    # Evicted by the other worker after the lookup: the reader falls back to S3.
+    assert await first.lookup(sha["c"]) is not None
+    second.discard(sha["c"])
+    assert await first.open_range(sha["c"], 0, 7, 4) is None
+
+    stream = await second.open_range(sha["b"], 2, 9, 4)
+    assert stream is not None
+    first.discard(sha["b"])  # the open handle survives the unlink
+    assert b"".join([c async for c in stream]) == blobs["b"][2:10]
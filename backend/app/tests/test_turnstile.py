@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import asyncio
+
+import httpx
+import pytest
+
+from app.config.settings import settings
+from app.utils import turnstile
+from app.utils.turnstile import TurnstileUnavailable, TurnstileVerifier
+
+
+@pytest.fixture
+def enabled(monkeypatch):
+    monkeypatch.setattr(settings, "turnstile_enabled", True)
+    monkeypatch.setattr(settings, "turnstile_secret_key", "secret")
+    monkeypatch.setattr(settings, "turnstile_expected_hostname", None)
+
+
+async def test_concurrent_checks_share_one_request_but_tokens_pass_once(monkeypatch) -> None:
+    monkeypatch.setattr(settings, "turnstile_cache_ttl_seconds", 30)
+    calls = 0
+    seen: set[str] = set()
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        token = dict(httpx.QueryParams(request.content.decode("utf-8")))["response"]
+        if token in seen:
+            return httpx.Response(200, json={"success": False, "error-codes": ["timeout-or-duplicate"]})
+        seen.add(token)
+        return httpx.Response(200, json={"success": True})
+
+    verifier = TurnstileVerifier(transport=httpx.MockTransport(handler))
+    results = await asyncio.gather(*(verifier.siteverify("tok", "1.2.3.4") for _ in range(5)))
+    assert all(r["success"] for r in results)
+    assert calls == 1
+
+    # A solved captcha is not reused: the next check goes back to siteverify and is refused.
+    assert not (await verifier.siteverify("tok", "1.2.3.4"))["success"]
+    assert calls == 2
+    # The rejection is remembered.
+    assert not (await verifier.siteverify("tok", "1.2.3.4"))["success"]
+    assert calls == 2
+    await verifier.close()
+
+
+async def test_breaker_opens_and_fail_open_or_closed(monkeypatch, enabled) -> None:
+    monkeypatch.setattr(settings, "turnstile_breaker_threshold", 2)
+    monkeypatch.setattr(settings, "turnstile_breaker_reset_seconds", 60)
+    calls = 0
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal calls
+        calls += 1
+        raise httpx.ReadTimeout("slow", request=request)
+
+    verifier = TurnstileVerifier(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(turnstile, "turnstile_verifier", verifier)
+
+    for token in ("a", "b"):
+        with pytest.raises(TurnstileUnavailable):
+            await verifier.siteverify(token, None)
+    assert verifier.breaker_open
+
+    # Open circuit: no further calls to siteverify.
+    with pytest.raises(ValueError, match="unavailable"):
+        await turnstile.verify_turnstile("c", None, None)
+    monkeypatch.setattr(settings, "turnstile_fail_open", True)
+    await turnstile.verify_turnstile("d", None, None)
+    assert calls == 2
+    await verifier.close()
+
+
+async def test_stub_verifier(monkeypatch, enabled) -> None:
+    monkeypatch.setattr(settings, "turnstile_secret_key", None)
+    monkeypatch.setattr(settings, "turnstile_stub_enabled", True)
+    verifier = TurnstileVerifier()
+    monkeypatch.setattr(turnstile, "turnstile_verifier", verifier)
+
+    await turnstile.verify_turnstile("anything", "1.2.3.4", None)
+    with pytest.raises(ValueError, match="failed"):
+        await turnstile.verify_turnstile("fail-token", "1.2.3.4", None)
+    await verifier.close()
@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app.config.settings import settings
+from app.services.upload_admission import UploadAdmission
+
+
+@pytest.fixture
+def limits(monkeypatch) -> None:
+    monkeypatch.setattr(settings, "upload_max_concurrent", 2)
+    monkeypatch.setattr(settings, "upload_max_concurrent_per_ip", 1)
+    monkeypatch.setattr(settings, "upload_temp_budget_bytes", 100)
+    monkeypatch.setattr(settings, "upload_admission_wait_seconds", 0)
+    monkeypatch.setattr(settings, "upload_retry_after_seconds", 7)
+
+
+async def test_rejects_with_retry_after_when_full(limits) -> None:
+    admission = UploadAdmission()
+    async with admission.admit("a", 10):
+        # Same client: per-IP limit.
+        with pytest.raises(HTTPException) as exc:
+            async with admission.admit("a", 10):
+                pass
+        assert exc.value.status_code == 503
+        assert exc.value.headers == {"Retry-After": "7"}
+
+        # Other client, but over the temp-disk budget.
+        with pytest.raises(HTTPException):
+            async with admission.admit("b", 95):
+                pass
+
+        async with admission.admit("b", 90):
+            assert admission.stats()["in_flight_bytes"] == 100
+            with pytest.raises(HTTPException):
+                async with admission.admit("c", 0):
+                    pass
+    assert admission.stats() == {
+        "in_flight": 0,
+        "in_flight_bytes": 0,
+        "queued": 0,
+        "rejected": 3,
+        "budget_bytes": 100,
+    }
+
+
+async def test_oversized_upload_runs_alone(limits) -> None:
+    admission = UploadAdmission()
+    async with admission.admit("a", 500):
+        assert admission.in_flight == 1
+
+
+async def test_waits_for_a_slot(limits, monkeypatch) -> None:
+    monkeypatch.setattr(settings, "upload_admission_wait_seconds", 5)
+    admission = UploadAdmission()
+    release = asyncio.Event()
+
+    async def first() -> None:
+        async with admission.admit("a", 10):
+            await release.wait()
+
+    task = asyncio.create_task(first())
+    await asyncio.sleep(0)
+    pending = admission.admit("a", 10)
+    second = asyncio.create_task(pending.__aenter__())
+    await asyncio.sleep(0)
+    assert admission.queued == 1
+
+    release.set()
+    await task
+    await asyncio.wait_for(second, 1)
+    assert admission.in_flight == 1 and admission.queued == 0
+    await pending.__aexit__(None, None, None)
+
+
+async def test_upload_endpoint_returns_503_when_full(client, monkeypatch) -> None:
+    from app.services.upload_admission import upload_admission
+
+    monkeypatch.setattr(settings, "upload_max_concurrent", 1)
+    monkeypatch.setattr(settings, "upload_admission_wait_seconds", 0)
+    async with upload_admission.admit("someone-else", 0):
+        r = await client.post("/api/v1/uploads", files={"upload": ("a.zip", b"PK", "application/zip")})
+    assert r.status_code == 503
+    assert r.headers["retry-after"] == str(settings.upload_retry_after_seconds)
@@ -0,0 +1,174 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import io
+import zipfile
+from datetime import UTC, datetime, timedelta
+
+from fastapi import HTTPException
+from sqlalchemy import func, select, update
+
+from app.db import session as db_session
+from app.models.file import File
+from app.models.upload_session import UploadSession
+from app.services.maintenance_service import MaintenanceService
+from app.services.upload_service import UploadService
+from app.services.upload_session_service import sha1_states
+
+_CHUNK = 1024
+
+
+def _pack(padding: int) -> bytes:
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", compression=zipfile.ZIP_STORED) as z:
+        z.writestr("pack.mcmeta", "{}")
+        z.writestr("assets/minecraft/lang/en_us.json", "{}")
+        z.writestr("assets/minecraft/textures/noise.bin", bytes(i % 251 for i in range(padding)))
+    return buf.getvalue()
+
+
+async def _create(client, app, data: bytes) -> dict:
+    app.state.fake_storage.multipart = True
+    app.state.fake_storage.multipart_part_size = lambda: _CHUNK
+    r = await client.post("/api/v1/uploads/sessions", json={"filename": "big-pack.zip", "size": len(data)})
+    assert r.status_code == 201, r.text
+    assert r.json()["chunk_size"] == _CHUNK
+    return r.json()
+
+
+async def _put(client, session_id: str, data: bytes, offset: int):  # noqa: ANN202
+    return await client.put(
+        f"/api/v1/uploads/sessions/{session_id}",
+        params={"offset": offset},
+        content=data[offset : offset + _CHUNK],
+    )
+
+
+async def test_sessions_need_multipart_storage(app, client) -> None:
+    r = await client.post("/api/v1/uploads/sessions", json={"filename": "big-pack.zip", "size": 4096})
+    assert r.status_code == 501
+    assert app.state.fake_storage.multipart_uploads == []
+
+
+async def test_resumable_upload_round_trip(app, client) -> None:
+    data = _pack(3000)
+    session = await _create(client, app, data)
+    sid = session["id"]
+
+    assert (await _put(client, sid, data, 0)).json()["received_bytes"] == _CHUNK
+    # A retried chunk (lost response) is refused with the offset to continue from.
+    r = await _put(client, sid, data, 0)
+    assert r.status_code == 409
+    assert r.headers["upload-offset"] == str(_CHUNK)
+    # Finalizing early is refused too.
+    assert (await client.post(f"/api/v1/uploads/sessions/{sid}/finalize")).status_code == 409
+
+    offset = (await client.get(f"/api/v1/uploads/sessions/{sid}")).json()["received_bytes"]
+    while offset < len(data):
+        r = await _put(client, sid, data, offset)
+        assert r.status_code == 200, r.text
+        offset = r.json()["received_bytes"]
+
+    r = await client.post(f"/api/v1/uploads/sessions/{sid}/finalize")
+    assert r.status_code == 200, r.text
+    assert r.json()["resource_pack"]["sha1"] == hashlib.sha1(data).hexdigest()
+    assert list(app.state.fake_storage.objects.values()) == [data]
+    # The session is gone once the file exists.
+    assert (await client.get(f"/api/v1/uploads/sessions/{sid}")).status_code == 404
+
+
+async def test_finalize_rehashes_when_chunks_came_through_another_worker(app, client) -> None:
+    data = _pack(2500)
+    sid = (await _create(client, app, data))["id"]
+    for offset in range(0, len(data), _CHUNK):
+        assert (await _put(client, sid, data, offset)).status_code == 200
+        # Simulate the next chunk landing on a worker without this session's hash state.
+        sha1_states.pop(sid)
+
+    r = await client.post(f"/api/v1/uploads/sessions/{sid}/finalize")
+    assert r.status_code == 200, r.text
+    assert r.json()["resource_pack"]["sha1"] == hashlib.sha1(data).hexdigest()
+
+
+async def test_invalid_zip_is_rejected_at_finalize(app, client) -> None:
+    data = b"not a zip" * 300
+    sid = (await _create(client, app, data))["id"]
+    for offset in range(0, len(data), _CHUNK):
+        assert (await _put(client, sid, data, offset)).status_code == 200
+
+    assert (await client.post(f"/api/v1/uploads/sessions/{sid}/finalize")).status_code == 400
+    assert app.state.fake_storage.objects == {}
+    assert (await client.get(f"/api/v1/uploads/sessions/{sid}")).status_code == 404
+
+
+async def test_abandoned_sessions_are_aborted(app, client) -> None:
+    data = _pack(2000)
+    sid = (await _create(client, app, data))["id"]
+    assert (await _put(client, sid, data, 0)).status_code == 200
+
+    assert db_session.SessionLocal is not None
+    async with db_session.SessionLocal() as session:
+        await session.execute(
+            update(UploadSession).values(expire_at=datetime.now(UTC) - timedelta(seconds=1))
+        )
+        await session.commit()
+        assert await MaintenanceService(session, app.state.fake_storage).cleanup_upload_sessions() == 1
+
+    assert [u.aborted for u in app.state.fake_storage.multipart_uploads] == [True]
+    assert (await client.get(f"/api/v1/uploads/sessions/{sid}")).status_code == 404
+
+
+async def test_concurrent_finalize_creates_one_file(app, client, monkeypatch) -> None:
+    data = _pack(2000)
+    sid = (await _create(client, app, data))["id"]
+    for offset in range(0, len(data), _CHUNK):
+        assert (await _put(client, sid, data, offset)).status_code == 200
+
+    # Hold both requests after they've loaded the session so they race for the claim.
+    check_new_upload = UploadService.check_new_upload
+
+    async def slow_check(self, filename):  # noqa: ANN001, ANN202
+        await asyncio.sleep(0.05)
+        return await check_new_upload(self, filename)
+
+    monkeypatch.setattr(UploadService, "check_new_upload", slow_check)
+    url = f"/api/v1/uploads/sessions/{sid}/finalize"
+    first, second = await asyncio.gather(client.post(url), client.post(url))
+    assert sorted([first.status_code, second.status_code]) == [200, 409]
+    assert (await client.post(url)).status_code == 404
+
+    assert db_session.SessionLocal is not None
+    async with db_session.SessionLocal() as session:
+        assert (await session.execute(select(func.count()).select_from(File))).scalar_one() == 1
+
+
+async def test_failed_store_after_complete_forgets_the_session(app, client, monkeypatch) -> None:
+    data = _pack(2000)
+    sid = (await _create(client, app, data))["id"]
+    for offset in range(0, len(data), _CHUNK):
+        assert (await _put(client, sid, data, offset)).status_code == 200
+
+    async def no_slug(self) -> str:  # noqa: ANN001
+        raise HTTPException(status_code=503, detail="No slug")
+
+    monkeypatch.setattr(UploadService, "_allocate_slug", no_slug)
+    assert (await client.post(f"/api/v1/uploads/sessions/{sid}/finalize")).status_code == 503
+    assert app.state.fake_storage.objects == {}
+    assert (await client.get(f"/api/v1/uploads/sessions/{sid}")).status_code == 404
+
+
+
+async def test_chunk_and_finalize_calls_are_rate_limited(app, client) -> None:
+    data = _pack(2000)
+    sid = (await _create(client, app, data))["id"]
+
+    # 60 chunk PUTs a minute per IP (repeats of a chunk are refused with 409, but still count).
+    for _ in range(60):
+        assert (await _put(client, sid, data, 0)).status_code in (200, 409)
+    assert (await _put(client, sid, data, 0)).status_code == 429
+
+    # 10 finalize calls an hour per IP.
+    for _ in range(10):
+        assert (await client.post(f"/api/v1/uploads/sessions/{sid}/finalize")).status_code == 409
+    assert (await client.post(f"/api/v1/uploads/sessions/{sid}/finalize")).status_code == 429
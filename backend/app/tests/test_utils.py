@@ -1,11 +1,19 @@
 from __future__ import annotations
 
 import io
+import secrets
 import zipfile
 
 import pytest
-
-from app.utils.files import allowed_extension, detect_zip_file_type
+from fastapi import HTTPException
+
+from app.utils.expiry import sliding_expire_at
+from app.utils.files import (
+    ZipTailBuffer,
+    allowed_extension,
+    detect_zip_file_type,
+    detect_zip_file_type_from_tail,
+)
 from app.utils.slug import generate_random_slug, make_slug_base
 
 
@@ -76,3 +84,131 @@ def test_reject_executable_in_zip(tmp_path) -> None:
     )
     with pytest.raises(Exception):
         detect_zip_file_type(str(p))
+
+
+def test_detect_from_tail_only() -> None:
+    payload = _zip_bytes(
+        {
+            "pack.mcmeta": "{}",
+            "data/minecraft/tags/functions/load.json": "{}",
+            "data/big.bin": secrets.token_hex(30000),
+        }
+    )
+    tail = ZipTailBuffer(limit=4096)
+    for i in range(0, len(payload), 1000):
+        tail.feed(payload[i : i + 1000])
+    assert tail.size == len(payload)
+    assert len(tail.getvalue()) == 4096
+    assert detect_zip_file_type_from_tail(tail.getvalue(), tail.size) == "datapack"
+
+    with pytest.raises(Exception):
+        detect_zip_file_type_from_tail(payload[-10:], len(payload))
+
+
+def test_detect_zip_with_archive_comment(tmp_path) -> None:
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as z:
+        z.writestr("pack.mcmeta", "{}")
+        z.writestr("assets/minecraft/lang/en_us.json", "{}")
+        z.comment = b"made with love" * 100
+    p = tmp_path / "commented.zip"
+    p.write_bytes(buf.getvalue())
+    assert detect_zip_file_type(str(p)) == "resource_pack"
+
+
+@pytest.mark.parametrize("name", ["../evil.json", "C:/evil.json", "assets/../../x.png", "assets/run.SH"])
+def test_reject_unsafe_entries(tmp_path, name: str) -> None:
+    p = tmp_path / "bad.zip"
+    p.write_bytes(_zip_bytes({"pack.mcmeta": "{}", "assets/a.png": "x", name: "x"}))
+    with pytest.raises(HTTPException):
+        detect_zip_file_type(str(p))
+
+
+def test_reject_zip_bomb_ratio(tmp_path) -> None:
+    p = tmp_path / "bomb.zip"
+    p.write_bytes(_zip_bytes({"pack.mcmeta": "{}", "assets/zeros.bin": "\0" * (8 * 1024 * 1024)}))
+    with pytest.raises(HTTPException, match="compression ratio"):
+        detect_zip_file_type(str(p))
+
+
+def test_reject_limits(tmp_path, monkeypatch) -> None:
+    from app.config.settings import settings
+
+    p = tmp_path / "many.zip"
+    p.write_bytes(_zip_bytes({"pack.mcmeta": "{}", **{f"assets/{i}.json": "{}" for i in range(20)}}))
+
+    monkeypatch.setattr(settings, "zip_max_entries", 10)
+    with pytest.raises(HTTPException, match="too many entries"):
+        detect_zip_file_type(str(p))
+
+    monkeypatch.setattr(settings, "zip_max_entries", 100)
+    monkeypatch.setattr(settings, "zip_max_uncompressed_bytes", 20)
+    with pytest.raises(HTTPException, match="uncompressed size"):
+        detect_zip_file_type(str(p))
+
+
+def test_reject_non_zip(tmp_path) -> None:
+    p = tmp_path / "not.zip"
+    p.write_bytes(b"definitely not a zip file" * 10)
+    with pytest.raises(HTTPException, match="Invalid zip"):
+        detect_zip_file_type(str(p))
+
+
+@pytest.mark.parametrize("kind", ["thread", "process"])
+async def test_cpu_executor_runs_zip_analysis(tmp_path, monkeypatch, kind: str) -> None:
+    from app.config.settings import settings
+    from app.utils.executor import CpuExecutor
+
+    monkeypatch.setattr(settings, "cpu_executor_kind", kind)
+    good = tmp_path / "rp.zip"
+    good.write_bytes(_zip_bytes({"pack.mcmeta": "{}", "assets/a.json": "{}"}))
+    bad = tmp_path / "bad.zip"
+    bad.write_bytes(_zip_bytes({"pack.mcmeta": "{}", "assets/a.exe": "x"}))
+
+    executor = CpuExecutor()
+    try:
+        assert await executor.run(detect_zip_file_type, str(good)) == "resource_pack"
+        with pytest.raises(HTTPException) as exc:
+            await executor.run(detect_zip_file_type, str(bad))
+        assert exc.value.status_code == 400
+        assert executor.stats()["completed"] == 2
+        assert executor.stats()["in_flight"] == 0
+    finally:
+        await executor.close()
+
+
+def test_hyperloglog_estimates_merges_and_round_trips() -> None:
+    from app.utils.hll import HyperLogLog
+
+    a, b = HyperLogLog(), HyperLogLog()
+    a.update(f"ip-{i}" for i in range(20000))
+    b.update(f"ip-{i}" for i in range(10000, 30000))
+    assert abs(a.estimate() - 20000) / 20000 < 0.05
+
+    a.merge(b)
+    assert abs(a.estimate() - 30000) / 30000 < 0.05
+
+    small = HyperLogLog()
+    assert small.update(["x", "y", "x"])
+    assert not small.add("x")
+    assert small.estimate() == 2
+    data = small.to_bytes()
+    assert len(data) < 100
+    assert HyperLogLog.from_bytes(data).registers == small.registers
+
+
+def test_sliding_expire_at_rounds_up_to_bucket(monkeypatch) -> None:
+    from datetime import UTC, datetime, timedelta
+
+    from app.config.settings import settings
+
+    monkeypatch.setattr(settings, "file_expire_days", 3)
+    monkeypatch.setattr(settings, "file_expire_granularity_seconds", 3600)
+    early = datetime(2026, 1, 1, 10, 5, tzinfo=UTC)
+    late = datetime(2026, 1, 1, 10, 55, tzinfo=UTC)
+    # Same bucket, never earlier than the exact expiry.
+    assert sliding_expire_at(early) == sliding_expire_at(late) == datetime(2026, 1, 4, 11, 0, tzinfo=UTC)
+    assert sliding_expire_at(late) >= late + timedelta(days=3)
+
+    monkeypatch.setattr(settings, "file_expire_granularity_seconds", 0)
+    assert sliding_expire_at(early) == early + timedelta(days=3)
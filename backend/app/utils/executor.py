@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import asyncio
+import os
+from collections.abc import Callable
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, TypeVar
+
+from fastapi import HTTPException
+
+from app.config.settings import settings
+
+T = TypeVar("T")
+
+
+def _portable_call(fn: Callable[..., Any], args: tuple[Any, ...]) -> tuple[str, Any, Any]:
+    # HTTPException does not survive pickling, so ship it back as plain values.
+    try:
+        return "ok", fn(*args), None
+    except HTTPException as e:
+        return "http", e.status_code, e.detail
+
+
+class CpuExecutor:
+    """App-owned pool for CPU-bound upload work (SHA-1, zip inspection).
+
+    Keeps that work off the event loop so download redirects stay responsive
+    while large uploads are processed. At most CPU_EXECUTOR_MAX_CONCURRENCY
+    jobs are submitted at once; the rest wait in `queued`.
+
+    CPU_EXECUTOR_KIND=process moves zip analysis to worker processes. Hashing
+    always uses threads: hashlib releases the GIL for large buffers and hasher
+    state cannot cross a process boundary.
+    """
+
+    def __init__(self) -> None:
+        self._threads: ThreadPoolExecutor | None = None
+        self._processes: ProcessPoolExecutor | None = None
+        self._sem: asyncio.Semaphore | None = None
+        self.queued = 0
+        self.in_flight = 0
+        self.completed = 0
+
+    def _workers(self) -> int:
+        return settings.cpu_executor_workers or min(4, os.cpu_count() or 1)
+
+    def start(self) -> None:
+        if self._threads is not None:
+            return
+        workers = self._workers()
+        self._threads = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="cpu")
+        if (settings.cpu_executor_kind or "").strip().lower() == "process":
+            self._processes = ProcessPoolExecutor(max_workers=workers)
+        self._sem = asyncio.Semaphore(settings.cpu_executor_max_concurrency or workers)
+
+    async def close(self) -> None:
+        threads, processes = self._threads, self._processes
+        self._threads = None
+        self._processes = None
+        self._sem = None
+        if threads is not None:
+            threads.shutdown(wait=False, cancel_futures=True)
+        if processes is not None:
+            processes.shutdown(wait=False, cancel_futures=True)
+
+    async def run(self, fn: Callable[..., T], *args: Any) -> T:
+        """Run `fn(*args)` on the configured pool (threads or processes)."""
+
+        self.start()
+        if self._processes is None:
+            return await self._submit(self._threads, fn, *args)
+
+        kind, value, detail = await self._submit(self._processes, _portable_call, fn, args)
+        if kind == "http":
+            raise HTTPException(status_code=value, detail=detail)
+        return value
+
+    async def run_thread(self, fn: Callable[..., T], *args: Any) -> T:
+        """Run `fn(*args)` on the thread pool; for work that shares in-process state."""
+
+        self.start()
+        return await self._submit(self._threads, fn, *args)
+
+    async def _submit(self, pool: Executor | None, fn: Callable[..., Any], *args: Any) -> Any:
+        sem = self._sem
+        assert pool is not None and sem is not None
+        self.queued += 1
+        try:
+            await sem.acquire()
+        finally:
+            self.queued -= 1
+        self.in_flight += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(pool, fn, *args)
+        finally:
+            self.in_flight -= 1
+            self.completed += 1
+            sem.release()
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "workers": self._workers(),
+            "queued": self.queued,
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+        }
+
+
+cpu_executor = CpuExecutor()
@@ -0,0 +1,26 @@
+from __future__ import annotations
+
+import math
+from datetime import UTC, datetime, timedelta
+
+from app.config.settings import settings
+
+
+def sliding_expire_at(now: datetime) -> datetime:
+    """`now + FILE_EXPIRE_DAYS`, rounded up to the next FILE_EXPIRE_GRANULARITY_SECONDS boundary.
+
+    Rounding up means a file never expires earlier than FILE_EXPIRE_DAYS after
+    its last download, and every download inside the same bucket computes the
+    same value, so only the first one has to rewrite `expire_at`.
+    """
+
+    target = now + timedelta(days=settings.file_expire_days)
+    step = settings.file_expire_granularity_seconds
+    if step <= 0:
+        return target
+    return datetime.fromtimestamp(math.ceil(target.timestamp() / step) * step, UTC)
+
+
+def as_utc(value: datetime) -> datetime:
+    # SQLite hands timestamps back naive; they are stored in UTC.
+    return value if value.tzinfo is not None else value.replace(tzinfo=UTC)
@@ -1,11 +1,16 @@
 from __future__ import annotations
 
 import hashlib
+import io
 import os
-import zipfile
+import struct
+from collections import deque
+from typing import BinaryIO
 
 from fastapi import HTTPException
 
+from app.config.settings import settings
+
 
 ALLOWED_EXTENSIONS = {".zip"}
 
@@ -21,6 +26,10 @@ BLOCKED_IN_ZIP_EXTENSIONS = {
 }
 
 
+def temp_upload_dir() -> str:
+    return os.path.join(os.getcwd(), ".temp_uploads")
+
+
 def allowed_extension(filename: str) -> bool:
     ext = os.path.splitext(filename)[1].lower()
     return ext in ALLOWED_EXTENSIONS
@@ -35,18 +44,159 @@ def sha1_of_file(path: str) -> str:
 
 
 def detect_zip_file_type(path: str) -> str:
+    with open(path, "rb") as f:
+        return scan_zip_central_directory(f, os.fstat(f.fileno()).st_size)
+
+
+class ZipTailBuffer:
+    """Keeps only the last `limit` bytes of a stream plus its total size.
+
+    The zip central directory lives at the end of the archive, so this is
+    enough to list entries without spooling the whole upload to disk.
+    """
+
+    def __init__(self, limit: int) -> None:
+        self._limit = limit
+        self._chunks: deque[bytes] = deque()
+        self._kept = 0
+        self.size = 0
+
+    def feed(self, chunk: bytes) -> None:
+        self.size += len(chunk)
+        self._chunks.append(chunk)
+        self._kept += len(chunk)
+        while self._chunks and self._kept - len(self._chunks[0]) >= self._limit:
+            self._kept -= len(self._chunks.popleft())
+
+    def getvalue(self) -> bytes:
+        data = b"".join(self._chunks)
+        return data[-self._limit :] if len(data) > self._limit else data
+
+
+class _OutsideTail(Exception):
+    pass
+
+
+class _TailFile(io.RawIOBase):
+    """Read-only view of a file of `size` bytes of which only the tail is known."""
+
+    def __init__(self, tail: bytes, size: int) -> None:
+        self._tail = tail
+        self._size = size
+        self._base = size - len(tail)
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            pos = offset
+        elif whence == io.SEEK_CUR:
+            pos = self._pos + offset
+        else:
+            pos = self._size + offset
+        if pos < 0:
+            raise OSError("negative seek position")
+        self._pos = pos
+        return pos
+
+    def readinto(self, b) -> int:  # noqa: ANN001
+        if self._pos >= self._size:
+            return 0
+        if self._pos < self._base:
+            raise _OutsideTail()
+        start = self._pos - self._base
+        data = self._tail[start : start + len(b)]
+        b[: len(data)] = data
+        self._pos += len(data)
+        return len(data)
+
+
+def detect_zip_file_type_from_tail(tail: bytes, size: int) -> str:
+    """Classify a zip given only its trailing bytes (see ZipTailBuffer)."""
+
     try:
-        with zipfile.ZipFile(path, "r") as z:
-            names = z.namelist()
-    except zipfile.BadZipFile as e:
-        raise HTTPException(status_code=400, detail="Invalid zip file") from e
+        return scan_zip_central_directory(_TailFile(tail, size), size)
+    except _OutsideTail as e:
+        raise HTTPException(status_code=400, detail="Zip central directory is too large") from e
+
 
-    norm = [_normalize_zip_name(n) for n in names]
-    _validate_zip_safe(norm)
+_EOCD_SIG = b"PK\x05\x06"
+_EOCD64_LOCATOR_SIG = b"PK\x06\x07"
+_EOCD64_SIG = b"PK\x06\x06"
+_CDIR_SIG = b"PK\x01\x02"
+_EOCD = struct.Struct("<4s4H2LH")
+_EOCD64_LOCATOR = struct.Struct("<4sLQL")
+_EOCD64 = struct.Struct("<4sQ2H2L4Q")
+_CDIR = struct.Struct("<4s6H3L5H2L")
+_MAX_COMMENT = 0xFFFF
+_UTF8_FLAG = 0x800
+# Entries this small are exempt from the compression-ratio check (tiny JSON compresses very well).
+_RATIO_MIN_UNCOMPRESSED = 1024 * 1024
 
-    has_pack_mcmeta = any(n.endswith("pack.mcmeta") for n in norm)
-    has_data = any(n.startswith("data/") for n in norm)
-    has_assets = any(n.startswith("assets/") for n in norm)
+
+def scan_zip_central_directory(fp: BinaryIO, size: int) -> str:
+    """Classify and safety-check a zip by reading only its central directory.
+
+    One pass over the directory records, with O(1) state: no name lists are
+    built. Raises HTTPException(400) as soon as an entry is unsafe or one of
+    the ZIP_MAX_ENTRIES / ZIP_MAX_UNCOMPRESSED_BYTES / ZIP_MAX_COMPRESSION_RATIO
+    limits is crossed; local headers and file data are never read.
+    """
+
+    entries, cd_size, cd_offset = _read_end_of_central_directory(fp, size)
+    if entries > settings.zip_max_entries:
+        raise HTTPException(status_code=400, detail="Zip has too many entries")
+    if cd_offset + cd_size > size:
+        raise HTTPException(status_code=400, detail="Invalid zip file")
+
+    fp.seek(cd_offset)
+    reader = _BlockReader(fp, cd_size)
+    total_uncompressed = 0
+    has_pack_mcmeta = has_data = has_assets = False
+
+    for _ in range(entries):
+        header = reader.read(_CDIR.size)
+        if len(header) != _CDIR.size or header[:4] != _CDIR_SIG:
+            raise HTTPException(status_code=400, detail="Invalid zip file")
+        (
+            _sig, _made_by, _needed, flags, _method, _time, _date, _crc,
+            compressed, uncompressed, name_len, extra_len, comment_len, _disk, _iattr, _eattr, _offset,
+        ) = _CDIR.unpack(header)
+        raw_name = reader.read(name_len)
+        extra = reader.read(extra_len)
+        reader.skip(comment_len)
+        if len(raw_name) != name_len or len(extra) != extra_len:
+            raise HTTPException(status_code=400, detail="Invalid zip file")
+
+        if uncompressed == 0xFFFFFFFF or compressed == 0xFFFFFFFF:
+            uncompressed, compressed = _zip64_sizes(extra, uncompressed, compressed)
+
+        name = _normalize_zip_name(raw_name.decode("utf-8" if flags & _UTF8_FLAG else "cp437", "replace"))
+        _validate_zip_entry(name)
+
+        total_uncompressed += uncompressed
+        if total_uncompressed > settings.zip_max_uncompressed_bytes:
+            raise HTTPException(status_code=400, detail="Zip uncompressed size exceeds limit")
+        if (
+            uncompressed >= _RATIO_MIN_UNCOMPRESSED
+            and uncompressed > settings.zip_max_compression_ratio * max(compressed, 1)
+        ):
+            raise HTTPException(status_code=400, detail="Zip compression ratio exceeds limit")
+
+        if not has_pack_mcmeta and name.endswith("pack.mcmeta"):
+            has_pack_mcmeta = True
+        if not has_data and name.startswith("data/"):
+            has_data = True
+        if not has_assets and name.startswith("assets/"):
+            has_assets = True
 
     # Datapack: pack.mcmeta + data/
     if has_pack_mcmeta and has_data:
@@ -59,24 +209,109 @@ def detect_zip_file_type(path: str) -> str:
     raise HTTPException(status_code=400, detail="Zip must be a resource pack or datapack")
 
 
+def _read_end_of_central_directory(fp: BinaryIO, size: int) -> tuple[int, int, int]:
+    if size < _EOCD.size:
+        raise HTTPException(status_code=400, detail="Invalid zip file")
+
+    # Common case: no archive comment, so the EOCD record is the last 22 bytes.
+    fp.seek(size - _EOCD.size)
+    data = fp.read(_EOCD.size)
+    window = _EOCD.size
+    pos = 0
+    if not (data[:4] == _EOCD_SIG and data[-2:] == b"\x00\x00"):
+        # Otherwise it is followed by a comment of at most 64 KiB.
+        window = min(size, _EOCD.size + _MAX_COMMENT)
+        fp.seek(size - window)
+        data = fp.read(window)
+        pos = data.rfind(_EOCD_SIG)
+        while pos >= 0 and pos + _EOCD.size > len(data):
+            pos = data.rfind(_EOCD_SIG, 0, pos)
+        if pos < 0:
+            raise HTTPException(status_code=400, detail="Invalid zip file")
+
+    _sig, disk, cd_disk, _disk_entries, entries, cd_size, cd_offset, _comment_len = _EOCD.unpack_from(data, pos)
+    if disk != 0 or cd_disk != 0:
+        raise HTTPException(status_code=400, detail="Multi-volume zip files are not supported")
+
+    if entries == 0xFFFF or cd_size == 0xFFFFFFFF or cd_offset == 0xFFFFFFFF:
+        eocd_offset = size - window + pos
+        if eocd_offset < _EOCD64_LOCATOR.size:
+            raise HTTPException(status_code=400, detail="Invalid zip file")
+        fp.seek(eocd_offset - _EOCD64_LOCATOR.size)
+        locator = fp.read(_EOCD64_LOCATOR.size)
+        if len(locator) == _EOCD64_LOCATOR.size and locator[:4] == _EOCD64_LOCATOR_SIG:
+            _lsig, _ldisk, eocd64_offset, _ndisks = _EOCD64_LOCATOR.unpack(locator)
+            if eocd64_offset + _EOCD64.size > size:
+                raise HTTPException(status_code=400, detail="Invalid zip file")
+            fp.seek(eocd64_offset)
+            rec = fp.read(_EOCD64.size)
+            if len(rec) != _EOCD64.size or rec[:4] != _EOCD64_SIG:
+                raise HTTPException(status_code=400, detail="Invalid zip file")
+            _s, _rsize, _made, _need, _d, _cdd, _de, entries, cd_size, cd_offset = _EOCD64.unpack(rec)
+
+    return entries, cd_size, cd_offset
+
+
+def _zip64_sizes(extra: bytes, uncompressed: int, compressed: int) -> tuple[int, int]:
+    pos = 0
+    while pos + 4 <= len(extra):
+        tag, length = struct.unpack_from("<2H", extra, pos)
+        body = extra[pos + 4 : pos + 4 + length]
+        if tag == 0x0001:
+            idx = 0
+            if uncompressed == 0xFFFFFFFF and idx + 8 <= len(body):
+                (uncompressed,) = struct.unpack_from("<Q", body, idx)
+                idx += 8
+            if compressed == 0xFFFFFFFF and idx + 8 <= len(body):
+                (compressed,) = struct.unpack_from("<Q", body, idx)
+            break
+        pos += 4 + length
+    return uncompressed, compressed
+
+
+class _BlockReader:
+    """Sequential reader over a bounded region that fetches in large blocks."""
+
+    _BLOCK = 64 * 1024
+
+    def __init__(self, fp: BinaryIO, length: int) -> None:
+        self._fp = fp
+        self._remaining = length
+        self._buf = b""
+        self._pos = 0
+
+    def read(self, n: int) -> bytes:
+        while len(self._buf) - self._pos < n and self._remaining > 0:
+            block = self._fp.read(min(self._BLOCK, self._remaining))
+            if not block:
+                break
+            self._remaining -= len(block)
+            self._buf = self._buf[self._pos :] + block
+            self._pos = 0
+        out = self._buf[self._pos : self._pos + n]
+        self._pos += len(out)
+        return out
+
+    def skip(self, n: int) -> None:
+        self.read(n)
+
+
 def _normalize_zip_name(name: str) -> str:
     # Normalize slashes and remove any leading slashes.
     name = name.replace("\\", "/").lstrip("/")
     return name
 
 
-def _validate_zip_safe(names: list[str]) -> None:
-    for n in names:
-        # Block absolute paths, drive letters, traversal.
-        if not n:
-            continue
-        if n.startswith("/"):
-            raise HTTPException(status_code=400, detail="Unsafe zip entry")
-        if ":" in n.split("/")[0]:
-            raise HTTPException(status_code=400, detail="Unsafe zip entry")
-        if ".." in n.split("/"):
-            raise HTTPException(status_code=400, detail="Unsafe zip entry")
-
-        _, ext = os.path.splitext(n.lower())
-        if ext in BLOCKED_IN_ZIP_EXTENSIONS:
-            raise HTTPException(status_code=400, detail="Zip contains blocked executable content")
+def _validate_zip_entry(n: str) -> None:
+    # Block absolute paths, drive letters, traversal.
+    if not n:
+        return
+    parts = n.split("/")
+    if ":" in parts[0]:
+        raise HTTPException(status_code=400, detail="Unsafe zip entry")
+    if ".." in parts:
+        raise HTTPException(status_code=400, detail="Unsafe zip entry")
+
+    _, ext = os.path.splitext(n.lower())
+    if ext in BLOCKED_IN_ZIP_EXTENSIONS:
+        raise HTTPException(status_code=400, detail="Zip contains blocked executable content")
@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import hashlib
+import math
+import zlib
+from collections.abc import Iterable
+
+# 2^12 registers: ~1.6% standard error, 4 KiB uncompressed. Daily sketches of
+# small packs are mostly zero registers and compress to a few dozen bytes.
+DEFAULT_PRECISION = 12
+_FORMAT_VERSION = 1
+
+
+class HyperLogLog:
+    """HyperLogLog cardinality sketch (one byte per register, 64-bit hashes).
+
+    Sketches with the same precision merge by taking the register-wise max,
+    so per-day sketches combine into "unique over N days" without keeping
+    the underlying values.
+    """
+
+    __slots__ = ("precision", "registers")
+
+    def __init__(self, precision: int = DEFAULT_PRECISION, registers: bytearray | None = None) -> None:
+        if not 4 <= precision <= 16:
+            raise ValueError("precision must be between 4 and 16")
+        self.precision = precision
+        self.registers = registers if registers is not None else bytearray(1 << precision)
+
+    def add(self, value: str) -> bool:
+        """Add a value; returns True if the sketch changed."""
+
+        x = int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+        p = self.precision
+        index = x >> (64 - p)
+        rest = x & ((1 << (64 - p)) - 1)
+        rank = (64 - p) - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+            return True
+        return False
+
+    def update(self, values: Iterable[str]) -> bool:
+        changed = False
+        for value in values:
+            changed = self.add(value) or changed
+        return changed
+
+    def merge(self, other: HyperLogLog) -> None:
+        if other.precision != self.precision:
+            raise ValueError("cannot merge sketches with different precision")
+        self.registers = bytearray(map(max, self.registers, other.registers))
+
+    def estimate(self) -> int:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / sum(2.0**-r for r in self.registers)
+        zeros = self.registers.count(0)
+        if raw <= 2.5 * m and zeros:
+            # Small-range correction (linear counting).
+            return round(m * math.log(m / zeros))
+        return round(raw)
+
+    def to_bytes(self) -> bytes:
+        return bytes((_FORMAT_VERSION, self.precision)) + zlib.compress(bytes(self.registers))
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> HyperLogLog:
+        if len(data) < 2 or data[0] != _FORMAT_VERSION:
+            raise ValueError("unsupported sketch format")
+        precision = data[1]
+        registers = bytearray(zlib.decompress(data[2:]))
+        if len(registers) != 1 << precision:
+            raise ValueError("corrupt sketch")
+        return cls(precision, registers)
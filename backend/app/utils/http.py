@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+from fastapi import HTTPException
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """If-None-Match uses weak comparison: W/ prefixes are ignored and "*" matches anything."""
+
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def parse_range(header: str | None, size: int) -> tuple[int, int] | None:
+    """Parse a single-range "bytes=" header into an inclusive (start, end).
+
+    Returns None when the whole object should be served (no header, a
+    multi-range request, or a syntax we don't understand — all allowed by
+    RFC 9110). Raises 416 when the range cannot be satisfied.
+    """
+
+    if not header:
+        return None
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, sep, last = spec.strip().partition("-")
+    if not sep:
+        return None
+    try:
+        if first:
+            start = int(first)
+            end = int(last) if last else size - 1
+        else:
+            # Suffix range: the last N bytes.
+            length = int(last)
+            if length <= 0:
+                raise _unsatisfiable(size)
+            start = max(0, size - length)
+            end = size - 1
+    except ValueError:
+        return None
+    if start >= size:
+        raise _unsatisfiable(size)
+    if end < start:
+        return None
+    return start, min(end, size - 1)
+
+
+def _unsatisfiable(size: int) -> HTTPException:
+    return HTTPException(
+        status_code=416,
+        detail="Requested range not satisfiable",
+        headers={"Content-Range": f"bytes */{size}"},
+    )
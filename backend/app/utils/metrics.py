@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+import functools
+import inspect
+import os
+import shutil
+import time
+from collections.abc import Callable, Iterator
+from typing import Any, TypeVar
+
+from prometheus_client import REGISTRY, Counter, Histogram
+from prometheus_client.core import GaugeMetricFamily
+from prometheus_client.registry import Collector
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "minecrox_http_request_duration_seconds",
+    "HTTP request latency by route template.",
+    ["method", "route", "status"],
+    buckets=_LATENCY_BUCKETS,
+)
+S3_UPLOAD_SECONDS = Histogram(
+    "minecrox_s3_upload_duration_seconds",
+    "Time spent in S3Storage.upload_file.",
+    buckets=_LATENCY_BUCKETS,
+)
+S3_PRESIGN_SECONDS = Histogram(
+    "minecrox_s3_presign_duration_seconds",
+    "Time to produce a presigned download URL (including cache hits).",
+    buckets=(0.00001, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1),
+)
+ZIP_INSPECT_SECONDS = Histogram(
+    "minecrox_zip_inspect_duration_seconds",
+    "Zip validation time, including any wait for a worker.",
+    buckets=_LATENCY_BUCKETS,
+)
+TURNSTILE_VERIFY_SECONDS = Histogram(
+    "minecrox_turnstile_verify_duration_seconds",
+    "Time spent in verify_turnstile.",
+    buckets=_LATENCY_BUCKETS,
+)
+DB_COMMIT_SECONDS = Histogram(
+    "minecrox_db_commit_duration_seconds",
+    "Session commit time (flush + COMMIT).",
+    buckets=_LATENCY_BUCKETS,
+)
+RATE_LIMIT_CHECKS = Counter(
+    "minecrox_rate_limit_checks",
+    "Rate limit hits by where they were decided: local lease or shared counter.",
+    ["path"],
+)
+UPLOAD_BYTES = Counter(
+    "minecrox_upload_bytes",
+    "Upload body bytes received; rate() gives upload bytes/sec.",
+)
+
+
+def timed(histogram: Histogram) -> Callable[[F], F]:
+    """Observe the wall time of a sync or async function in `histogram`."""
+
+    def decorator(fn: F) -> F:
+        if inspect.iscoroutinefunction(fn):
+
+            @functools.wraps(fn)
+            async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+                start = time.perf_counter()
+                try:
+                    return await fn(*args, **kwargs)
+                finally:
+                    histogram.observe(time.perf_counter() - start)
+
+            return async_wrapper  # type: ignore[return-value]
+
+        @functools.wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - start)
+
+        return wrapper  # type: ignore[return-value]
+
+    return decorator
+
+
+@event.listens_for(Session, "before_commit")
+def _before_commit(session: Session) -> None:
+    session.info["_commit_started"] = time.perf_counter()
+
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(session: Session) -> None:
+    started = session.info.pop("_commit_started", None)
+    if started is not None:
+        DB_COMMIT_SECONDS.observe(time.perf_counter() - started)
+
+
+@event.listens_for(Session, "after_rollback")
+def _after_rollback(session: Session) -> None:
+    session.info.pop("_commit_started", None)
+
+
+def _dir_size(path: str) -> int:
+    total = 0
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                try:
+                    if entry.is_file(follow_symlinks=False):
+                        total += entry.stat(follow_symlinks=False).st_size
+                except OSError:
+                    continue
+    except OSError:
+        return 0
+    return total
+
+
+class _StateCollector(Collector):
+    """Gauges read at scrape time from in-process state (pools, caches, temp dir)."""
+
+    def collect(self) -> Iterator[GaugeMetricFamily]:
+        # Imported lazily: these modules import settings/DB state this module must not depend on.
+        from app.db import session as db_session
+        from app.repositories.file_cache import file_cache
+        from app.services.download_recorder import download_recorder
+        from app.services.upload_admission import upload_admission
+        from app.storage.object_cache import object_cache
+        from app.utils.executor import cpu_executor
+        from app.utils.files import temp_upload_dir
+
+        pool = db_session.engine.pool if db_session.engine is not None else None
+        db = GaugeMetricFamily("minecrox_db_pool_connections", "DB connection pool state.", labels=["state"])
+        for state in ("size", "checkedin", "checkedout", "overflow"):
+            fn = getattr(pool, state, None)
+            if callable(fn):
+                db.add_metric([state], float(fn()))
+        yield db
+
+        cpu = GaugeMetricFamily("minecrox_cpu_executor_jobs", "CPU worker pool jobs.", labels=["state"])
+        for state, value in cpu_executor.stats().items():
+            cpu.add_metric([state], float(value))
+        yield cpu
+
+        cache = GaugeMetricFamily("minecrox_file_cache", "Slug cache entries and lookup counters.", labels=["kind"])
+        for kind, value in file_cache.stats().items():
+            cache.add_metric([kind], float(value))
+        yield cache
+
+        objects = GaugeMetricFamily(
+            "minecrox_object_cache", "On-disk download cache size and lookup counters.", labels=["kind"]
+        )
+        for kind, value in object_cache.stats().items():
+            objects.add_metric([kind], float(value))
+        yield objects
+
+        uploads = GaugeMetricFamily(
+            "minecrox_upload_admission", "Admitted uploads, their reserved temp bytes and waiters.", labels=["kind"]
+        )
+        for kind, value in upload_admission.stats().items():
+            uploads.add_metric([kind], float(value))
+        yield uploads
+
+        yield GaugeMetricFamily(
+            "minecrox_download_buffer_events",
+            "Download events waiting for the next write-behind flush.",
+            value=float(download_recorder.pending),
+        )
+
+        tmp_dir = temp_upload_dir()
+        yield GaugeMetricFamily(
+            "minecrox_temp_upload_dir_bytes",
+            "Bytes currently spooled in .temp_uploads.",
+            value=float(_dir_size(tmp_dir)),
+        )
+        try:
+            free = shutil.disk_usage(tmp_dir if os.path.isdir(tmp_dir) else os.getcwd()).free
+        except OSError:
+            free = 0
+        yield GaugeMetricFamily(
+            "minecrox_temp_upload_disk_free_bytes",
+            "Free bytes on the filesystem holding .temp_uploads.",
+            value=float(free),
+        )
+
+
+REGISTRY.register(_StateCollector())
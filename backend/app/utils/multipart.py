@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+from collections import deque
+from collections.abc import AsyncIterator
+from dataclasses import dataclass, field
+
+from fastapi import HTTPException, Request
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:  # python-multipart < 0.0.13
+    from multipart.multipart import MultipartParser, parse_options_header
+
+# Small form fields (captcha token etc.) are held in memory; anything bigger is a client error.
+MAX_FIELD_BYTES = 64 * 1024
+MAX_FIELDS = 16
+
+
+@dataclass
+class _Part:
+    name: str
+    filename: str | None
+    content_type: str | None
+    data: bytearray = field(default_factory=bytearray)
+
+
+class MultipartUploadReader:
+    """Single-pass multipart/form-data reader for streamed file fields.
+
+    Small fields sent before a file are available from read_until_file(),
+    so they can be checked before any file bytes are read. The file part is
+    then consumed with file_chunks(), straight from the request body with no
+    spooling; `max_file_bytes` is enforced per file as bytes arrive, and
+    `max_total_bytes` (if given) on the whole body, skipped parts included. Call
+    read_until_file() again for the next file part (the unread rest of the
+    current one is skipped) or to collect the fields sent after the file.
+    """
+
+    def __init__(
+        self, request: Request, file_field: str, max_file_bytes: int, max_total_bytes: int | None = None
+    ) -> None:
+        content_type, params = parse_options_header(request.headers.get("content-type", ""))
+        boundary = params.get(b"boundary")
+        if content_type != b"multipart/form-data" or not boundary:
+            raise HTTPException(status_code=400, detail="Expected multipart/form-data")
+
+        self.fields: dict[str, str] = {}
+        self.filename: str | None = None
+        self.content_type: str | None = None
+        self._file_field = file_field
+        self._max_file_bytes = max_file_bytes
+        self._max_total_bytes = max_total_bytes
+        self._body_bytes = 0
+        self._body = request.stream().__aiter__()
+        self._eof = False
+        self._events: deque[tuple[str, object]] = deque()
+        self._part: _Part | None = None
+        self._in_file = False
+        self._header_field = bytearray()
+        self._header_value = bytearray()
+        self._headers: dict[bytes, bytes] = {}
+        self._parser = MultipartParser(
+            boundary,
+            {
+                "on_part_begin": self._on_part_begin,
+                "on_header_field": lambda d, s, e: self._header_field.extend(d[s:e]),
+                "on_header_value": lambda d, s, e: self._header_value.extend(d[s:e]),
+                "on_header_end": self._on_header_end,
+                "on_headers_finished": self._on_headers_finished,
+                "on_part_data": lambda d, s, e: self._events.append(("data", bytes(d[s:e]))),
+                "on_part_end": lambda: self._events.append(("end", None)),
+            },
+        )
+
+    # Parser callbacks (sync, called from parser.write).
+
+    def _on_part_begin(self) -> None:
+        self._headers = {}
+
+    def _on_header_end(self) -> None:
+        self._headers[bytes(self._header_field).lower()] = bytes(self._header_value)
+        self._header_field.clear()
+        self._header_value.clear()
+
+    def _on_headers_finished(self) -> None:
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        name = options.get(b"name", b"").decode("utf-8", "replace")
+        filename = options.get(b"filename")
+        content_type = self._headers.get(b"content-type")
+        self._events.append(
+            (
+                "part",
+                _Part(
+                    name=name,
+                    filename=filename.decode("utf-8", "replace") if filename is not None else None,
+                    content_type=content_type.decode("latin-1") if content_type is not None else None,
+                ),
+            )
+        )
+
+    async def _next_event(self) -> tuple[str, object] | None:
+        while not self._events:
+            if self._eof:
+                return None
+            # Checked before every read, so once over the limit the reader stays failed.
+            if self._max_total_bytes is not None and self._body_bytes > self._max_total_bytes:
+                raise HTTPException(status_code=413, detail="Request body too large")
+            try:
+                chunk = await self._body.__anext__()
+            except StopAsyncIteration:
+                self._eof = True
+                self._parser.finalize()
+                continue
+            self._body_bytes += len(chunk)
+            if chunk and (self._max_total_bytes is None or self._body_bytes <= self._max_total_bytes):
+                self._parser.write(chunk)
+        return self._events.popleft()
+
+    def _field_event(self, kind: str, value: object) -> None:
+        if kind == "part":
+            assert isinstance(value, _Part)
+            if len(self.fields) >= MAX_FIELDS:
+                raise HTTPException(status_code=400, detail="Too many form fields")
+            self._part = value
+        elif kind == "data" and self._part is not None:
+            assert isinstance(value, bytes)
+            self._part.data += value
+            if len(self._part.data) > MAX_FIELD_BYTES:
+                raise HTTPException(status_code=413, detail=f"Form field '{self._part.name}' too large")
+        elif kind == "end" and self._part is not None:
+            self.fields[self._part.name] = self._part.data.decode("utf-8", "replace")
+            self._part = None
+
+    async def read_until_file(self) -> bool:
+        """Collect fields up to the next file part; False once the body has no more."""
+
+        while (event := await self._next_event()) is not None:
+            kind, value = event
+            if self._in_file:
+                self._in_file = kind != "end"
+                continue
+            if kind == "part" and isinstance(value, _Part) and value.name == self._file_field:
+                self.filename = value.filename
+                self.content_type = value.content_type
+                self._in_file = True
+                return True
+            self._field_event(kind, value)
+        return False
+
+    async def file_chunks(self, chunk_size: int) -> AsyncIterator[bytes]:
+        """Bytes of the current file part, coalesced into chunks of about `chunk_size`."""
+
+        size = 0
+        buffer = bytearray()
+        while self._in_file and (event := await self._next_event()) is not None:
+            kind, value = event
+            if kind == "end":
+                self._in_file = False
+                break
+            assert isinstance(value, bytes)
+            size += len(value)
+            if size > self._max_file_bytes:
+                raise HTTPException(status_code=413, detail="File too large (max 100MB)")
+            buffer += value
+            if len(buffer) >= chunk_size:
+                yield bytes(buffer)
+                buffer.clear()
+        if buffer:
+            yield bytes(buffer)
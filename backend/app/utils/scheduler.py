@@ -18,15 +18,27 @@ def start_scheduler() -> AsyncIOScheduler | None:
         return None
 
     scheduler = AsyncIOScheduler(timezone="UTC")
+    # The job only schedules a task, so max_instances can't stop a long cleanup from overlapping the next one.
+    running = asyncio.Lock()
 
     async def _run_cleanup() -> None:
+        if running.locked():
+            logger.info("maintenance: previous run still in progress, skipping")
+            return
+        async with running:
+            await _cleanup()
+
+    async def _cleanup() -> None:
         db_session.init_engine()
         assert db_session.SessionLocal is not None
         async with db_session.SessionLocal() as session:
             svc = MaintenanceService(session=session, storage=S3Storage())
             try:
                 deleted = await svc.cleanup_expired_files()
+                await svc.retry_object_deletes()
+                await svc.cleanup_upload_sessions()
                 pruned = await svc.prune_download_logs()
+                pruned += await svc.prune_download_rollups()
                 if deleted or pruned:
                     logger.info("maintenance: deleted=%s pruned=%s", deleted, pruned)
             except Exception:
@@ -1,10 +1,19 @@
 from __future__ import annotations
 
+import asyncio
+import logging
+import time
+from collections import OrderedDict
 from typing import Any
 
 import httpx
 
 from app.config.settings import settings
+from app.utils.metrics import TURNSTILE_VERIFY_SECONDS, timed
+
+logger = logging.getLogger(__name__)
+
+SITEVERIFY_URL = "https://challenges.cloudflare.com/turnstile/v0/siteverify"
 
 
 def get_request_ip(request_headers: dict[str, str], fallback: str | None) -> str | None:
@@ -19,31 +28,162 @@ def get_request_ip(request_headers: dict[str, str], fallback: str | None) -> str
     return fallback
 
 
+async def _stub_siteverify(request: httpx.Request) -> httpx.Response:
+    """Offline stand-in for siteverify (TURNSTILE_STUB_ENABLED=true), for load tests.
+
+    Every token passes except ones starting with "fail".
+    """
+
+    if settings.turnstile_stub_latency_ms > 0:
+        await asyncio.sleep(settings.turnstile_stub_latency_ms / 1000)
+    form = dict(httpx.QueryParams(request.content.decode("utf-8")))
+    token = form.get("response", "")
+    if token.startswith("fail"):
+        return httpx.Response(200, json={"success": False, "error-codes": ["invalid-input-response"]})
+    hostname = (settings.turnstile_expected_hostname or "").strip() or "localhost"
+    return httpx.Response(200, json={"success": True, "hostname": hostname})
+
+
+class TurnstileUnavailable(Exception):
+    pass
+
+
+class TurnstileVerifier:
+    """App-scoped siteverify client.
+
+    - One pooled keep-alive httpx client instead of a TLS handshake per call.
+    - Concurrent checks of the same (token, ip) share one request. Only
+      rejections are reused (for TURNSTILE_CACHE_TTL_SECONDS): a token is
+      single-use, so a later check of a token that passed goes to siteverify
+      again, which refuses the duplicate.
+    - A circuit breaker opens after TURNSTILE_BREAKER_THRESHOLD consecutive
+      timeouts/errors and skips siteverify for TURNSTILE_BREAKER_RESET_SECONDS;
+      while siteverify is unavailable, TURNSTILE_FAIL_OPEN decides whether
+      requests are let through or rejected.
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport | None = None) -> None:
+        self._transport = transport
+        self._client: httpx.AsyncClient | None = None
+        self._inflight: dict[tuple[str, str | None], asyncio.Future[dict[str, Any]]] = {}
+        self._results: OrderedDict[tuple[str, str | None], tuple[float, dict[str, Any]]] = OrderedDict()
+        self._failures = 0
+        self._open_until = 0.0
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            transport = self._transport
+            if transport is None and settings.turnstile_stub_enabled:
+                transport = httpx.MockTransport(_stub_siteverify)
+            self._client = httpx.AsyncClient(
+                timeout=settings.turnstile_timeout_seconds,
+                limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+                transport=transport,
+            )
+        return self._client
+
+    async def close(self) -> None:
+        client, self._client = self._client, None
+        self._inflight.clear()
+        self._results.clear()
+        if client is not None:
+            await client.aclose()
+
+    @property
+    def breaker_open(self) -> bool:
+        return time.monotonic() < self._open_until
+
+    async def siteverify(self, token: str, request_ip: str | None) -> dict[str, Any]:
+        key = (token, request_ip)
+        now = time.monotonic()
+        cached = self._results.get(key)
+        if cached is not None:
+            if cached[0] > now:
+                return cached[1]
+            del self._results[key]
+
+        pending = self._inflight.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        if self.breaker_open:
+            raise TurnstileUnavailable("circuit open")
+
+        future: asyncio.Future[dict[str, Any]] = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            data = await self._post(token, request_ip)
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark retrieved so a future nobody else awaited doesn't log a warning.
+            future.exception()
+            raise
+        else:
+            future.set_result(data)
+            self._remember(key, data)
+            return data
+        finally:
+            self._inflight.pop(key, None)
+
+    async def _post(self, token: str, request_ip: str | None) -> dict[str, Any]:
+        payload: dict[str, Any] = {
+            "secret": settings.turnstile_secret_key,
+            "response": token,
+        }
+        if request_ip:
+            payload["remoteip"] = request_ip
+
+        try:
+            res = await self._get_client().post(SITEVERIFY_URL, data=payload)
+            if res.status_code >= 500:
+                raise httpx.HTTPStatusError("siteverify error", request=res.request, response=res)
+        except httpx.HTTPError as e:
+            self._record_failure()
+            raise TurnstileUnavailable(str(e) or type(e).__name__) from e
+
+        self._failures = 0
+        return res.json() if res.headers.get("content-type", "").startswith("application/json") else {}
+
+    def _record_failure(self) -> None:
+        self._failures += 1
+        if self._failures >= settings.turnstile_breaker_threshold:
+            self._open_until = time.monotonic() + settings.turnstile_breaker_reset_seconds
+            self._failures = 0
+            logger.warning("turnstile: circuit opened for %ss", settings.turnstile_breaker_reset_seconds)
+
+    def _remember(self, key: tuple[str, str | None], data: dict[str, Any]) -> None:
+        ttl = settings.turnstile_cache_ttl_seconds
+        # Caching a success would let one solved captcha through again and again.
+        if ttl <= 0 or data.get("success"):
+            return
+        self._results[key] = (time.monotonic() + ttl, data)
+        while len(self._results) > 1024:
+            self._results.popitem(last=False)
+
+
+turnstile_verifier = TurnstileVerifier()
+
+
+@timed(TURNSTILE_VERIFY_SECONDS)
 async def verify_turnstile(token: str, request_ip: str | None, request_hostname: str | None) -> None:
     """Raises ValueError when invalid."""
 
     if not settings.turnstile_enabled:
         return
 
-    if not settings.turnstile_secret_key:
+    if not settings.turnstile_secret_key and not settings.turnstile_stub_enabled:
         raise ValueError("Turnstile is enabled but TURNSTILE_SECRET_KEY is not set")
 
     if not token or not token.strip():
         raise ValueError("Missing captcha token")
 
-    payload: dict[str, Any] = {
-        "secret": settings.turnstile_secret_key,
-        "response": token.strip(),
-    }
-    if request_ip:
-        payload["remoteip"] = request_ip
-
-    async with httpx.AsyncClient(timeout=5.0) as client:
-        res = await client.post(
-            "https://challenges.cloudflare.com/turnstile/v0/siteverify",
-            data=payload,
-        )
-        data = res.json() if res.headers.get("content-type", "").startswith("application/json") else {}
+    try:
+        data = await turnstile_verifier.siteverify(token.strip(), request_ip)
+    except TurnstileUnavailable as e:
+        if settings.turnstile_fail_open:
+            logger.warning("turnstile unavailable, failing open: %s", e)
+            return
+        raise ValueError("Captcha verification unavailable, please retry") from e
 
     if not data or not bool(data.get("success")):
         raise ValueError("Captcha verification failed")
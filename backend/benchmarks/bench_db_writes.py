@@ -0,0 +1,128 @@
+"""Download write-path throughput: default engine vs the tuned engine factory.
+
+Run from backend/:  python -m benchmarks.bench_db_writes [--concurrency 32] [--seconds 3]
+
+Each worker repeats the synchronous /download/{slug} accounting (counter
+update, download log row, daily rollup and sketch, commit) against a fresh
+SQLite file. Pass --database-url to point at another database instead; its
+tables are created if missing and the benchmark rows are left behind.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+import uuid
+from datetime import UTC, datetime, timedelta
+
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+
+from app.db.base import Base
+from app.db.engine import create_engine
+from app.models import blob, download, download_daily, download_sketch, report  # noqa: F401
+from app.models.download import Download
+from app.models.file import File
+from app.repositories.download_daily_repository import DownloadDailyRepository
+
+_FILES = 20
+
+
+async def _setup(engine: AsyncEngine) -> list[str]:
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    now = datetime.now(UTC)
+    ids = [str(uuid.uuid4()) for _ in range(_FILES)]
+    async with async_sessionmaker(engine, expire_on_commit=False)() as session:
+        for file_id in ids:
+            session.add(
+                File(
+                    id=file_id,
+                    filename="pack.zip",
+                    slug=file_id,
+                    file_type="resource_pack",
+                    file_size=1,
+                    s3_key=f"bench/{file_id}",
+                    sha1_hash="0" * 40,
+                    download_count=0,
+                    created_at=now,
+                    expire_at=now + timedelta(days=3),
+                    uploader_ip_hash="bench",
+                    delete_token_hash="bench",
+                )
+            )
+        await session.commit()
+    return ids
+
+
+async def _record(session: AsyncSession, file_id: str, ip_hash: str) -> None:
+    now = datetime.now(UTC)
+    file = await session.get(File, file_id)
+    assert file is not None
+    file.download_count += 1
+    file.last_download = now
+    file.expire_at = now + timedelta(days=3)
+    rollups = DownloadDailyRepository(session)
+    first_today = await rollups.new_ip_hashes(file_id, now.date(), [ip_hash])
+    await rollups.increment(file_id, now.date(), count=1, unique_ip_hashes=len(first_today))
+    await rollups.add_to_sketch(file_id, now.date(), [ip_hash])
+    session.add(Download(file_id=file_id, ip_hash=ip_hash, timestamp=now))
+    await session.commit()
+
+
+async def _run(name: str, engine: AsyncEngine, concurrency: int, seconds: float) -> float:
+    ids = await _setup(engine)
+    sessions = async_sessionmaker(engine, expire_on_commit=False)
+    done = errors = 0
+    deadline = time.perf_counter() + seconds
+
+    async def worker(n: int) -> None:
+        nonlocal done, errors
+        i = 0
+        while time.perf_counter() < deadline:
+            i += 1
+            try:
+                async with sessions() as session:
+                    await _record(session, ids[(n + i) % len(ids)], f"ip-{n}-{i % 50}")
+                done += 1
+            except OperationalError:
+                # "database is locked" once the busy timeout runs out.
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(n) for n in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    await engine.dispose()
+    rate = done / elapsed
+    print(f"{name:<16} {rate:>10,.0f} downloads/s  ({done} committed, {errors} lock errors, {elapsed:.2f}s)")
+    return rate
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+
+        def url(name: str) -> str:
+            return args.database_url or f"sqlite+aiosqlite:///{os.path.join(tmp, name)}"
+
+        # The pre-factory engine: library defaults plus pre-ping.
+        before = await _run(
+            "default engine",
+            create_async_engine(url("default.db"), pool_pre_ping=True),
+            args.concurrency,
+            args.seconds,
+        )
+        after = await _run("tuned engine", create_engine(url("tuned.db")), args.concurrency, args.seconds)
+    print(f"speedup: {after / before:.1f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
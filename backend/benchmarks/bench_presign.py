@@ -0,0 +1,74 @@
+"""Microbenchmark for the /download/{slug} presign step.
+
+Run from backend/:  python -m benchmarks.bench_presign [--keys 5] [--seconds 2]
+
+Signing is local (no network), so the numbers isolate the client construction
+and signing cost that sits on the redirect hot path.
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+from collections.abc import Callable
+
+import boto3
+from botocore.config import Config
+
+from app.config.settings import settings
+from app.storage import s3_storage
+from app.storage.s3_storage import S3Storage
+
+
+def _legacy_presign(s3_key: str) -> str:
+    # The pre-cache implementation: a fresh boto3 client per redirect.
+    presign_endpoint = settings.s3_presign_endpoint_url or settings.s3_endpoint_url
+    client = boto3.client(
+        "s3",
+        endpoint_url=str(presign_endpoint) if presign_endpoint else None,
+        aws_access_key_id=settings.s3_access_key_id,
+        aws_secret_access_key=settings.s3_secret_access_key,
+        region_name=settings.s3_region or None,
+        config=Config(signature_version="s3v4", s3={"addressing_style": "path"}),
+    )
+    return client.generate_presigned_url(
+        ClientMethod="get_object",
+        Params={"Bucket": settings.s3_bucket, "Key": s3_key},
+        ExpiresIn=settings.s3_presign_ttl_seconds,
+    )
+
+
+def _measure(name: str, fn: Callable[[str], str], keys: list[str], seconds: float) -> float:
+    n = 0
+    start = time.perf_counter()
+    deadline = start + seconds
+    while time.perf_counter() < deadline:
+        fn(keys[n % len(keys)])
+        n += 1
+    elapsed = time.perf_counter() - start
+    rate = n / elapsed
+    print(f"{name:<28} {rate:>12,.0f} redirects/s  ({n} in {elapsed:.2f}s)")
+    return rate
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--keys", type=int, default=5, help="distinct hot packs")
+    parser.add_argument("--seconds", type=float, default=2.0)
+    args = parser.parse_args()
+
+    if settings.s3_endpoint_url is None and settings.s3_presign_endpoint_url is None:
+        settings.s3_endpoint_url = "http://localhost:9000"  # type: ignore[assignment]
+
+    keys = [f"files/2026/01/pack-{i}/server-pack.zip" for i in range(args.keys)]
+    storage = S3Storage()
+
+    before = _measure("new client per request", _legacy_presign, keys, args.seconds)
+    _measure("cached client, no URL cache", storage._sign_download_url, keys, args.seconds)
+    s3_storage._presigned_urls().clear()
+    after = _measure("cached client + URL cache", storage.create_presigned_download_url, keys, args.seconds)
+    print(f"speedup: {after / before:,.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -57,8 +57,9 @@ export default function UploadPage() {
                   setSubmitting(true)
                   try {
                     const form = new FormData()
-                    form.append('upload', file)
+                    // Token first: the backend checks it before reading the file.
                     if (captchaToken.trim()) form.append('captcha_token', captchaToken.trim())
+                    form.append('upload', file)
 
                     const res = await fetch(`${base}/api/v1/uploads`, {
                       method: 'POST',